@@ -23,9 +23,25 @@ from dotenv import load_dotenv
 from evaluation.opik_integration import TrackedAISuiteClient, track
 
 # ======== GRAPHITI MCP MEMORY ========
-from memory.patient_memory import PatientMemory, run_async, run_async_readonly
+from memory.patient_memory import MEMORY_BACKEND, PatientMemory, run_async, run_async_readonly
 from memory.graphiti_client import close_graphiti
+from memory.neo4j_pool import pool_stats as neo4j_pool_stats
+from memory.direct_neo4j_writer import writer_stats, close as close_direct_writer
+from memory.neo4j_schema import ensure_schema, migrate_layer1_keys, verify_schema
+from memory.activity_rollup import ROLLUPS
+from memory.ingest_queue import GRAPHITI_QUEUE, INGEST_QUEUE
+from memory.read_cache import READ_CACHE
+from memory.retention import RETENTION_ENGINE
+from memory.embedding_cache import stats as embedding_cache_stats
+from memory.incidents import INCIDENTS, INCIDENT_SWEEP_SEC, IncidentTracker
+from memory.async_lanes import lane_stats
+from memory.loop_monitor import LOOP_MONITOR
+from memory.sessionizer import SESSIONIZER, SESSIONIZERS, Sessionizer
 # =====================================
+from utils.model_warmpool import start_warm_pool, warm_pool_stats, record_latency
+from utils.context_builder import ContextBuilder, compact_json, count_tokens, fit_history, prompt_budget
+from insights.insight_cache import InsightCardStore, InsightRefresher, staleness
+from insights.stat_insights import build_stat_insights
 
 # Note: report_crew import is handled gracefully in report_generator.py
 import os
@@ -149,6 +165,9 @@ class AgentConfig:
     ]
     COLLECTION_NAME = os.getenv('MONGO_COLLECTION', 'posture_data')
 
+    # Local Ollama native API (model warm pool, report fallbacks)
+    OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
+
 # ======================
 # DATA STRUCTURES
 # ======================
@@ -183,6 +202,12 @@ class PatientState:
         self._HEARTBEAT_INTERVAL = 100        # Send 1 snapshot per 100 readings regardless
         self._last_heartbeat_count = 0        # Last reading_count when heartbeat was sent
         
+        # Incident coalescing: a run of critical readings is ONE incident
+        self.incidents = IncidentTracker(device_id)
+
+        # Posture / area segments (run-length, same debounce) → Segment nodes
+        self.sessions = Sessionizer(device_id, self._DEBOUNCE_THRESHOLD)
+
         # Memory Layer (Graphiti)
         self.memory = PatientMemory(device_id)
         
@@ -204,6 +229,16 @@ class PatientState:
         spo2 = int(data.get('Blood_oxygen', 0))
         posture = int(data.get('Posture_state', 0))
         area = int(data.get('Area', data.get('Lokasi', 0)))
+
+        # Every reading extends / closes the posture and area segments
+        if SESSIONIZER:
+            rows = self.sessions.observe(
+                "Device Taken Off" if hr == 0 else POSTURE_MAP.get(posture, "Unknown"),
+                AREA_MAP.get(area, "Unknown"),
+                data['timestamp'],
+            )
+            if rows:
+                run_async(self.memory.store_segments(rows), wait_result=False)
         
         # Classify HR zone for smart tracking
         if hr == 0:
@@ -222,9 +257,23 @@ class PatientState:
             (0 < spo2 < 90)            # Hypoxia
         )
         
-        if is_critical or is_startup:
-            reason_txt = f"CRITICAL: posture={posture} hr={hr}" if is_critical else "STARTUP_INITIAL"
-            self._trigger_snapshot(data, reason=reason_txt)
+        # Open / escalate / update / close the running incident. Only its
+        # decisions write — not every critical reading.
+        incident_closed = False
+        if INCIDENTS:
+            for decision in self.incidents.observe(hr, spo2, posture, data['timestamp']):
+                incident_closed |= decision["action"] == "close"
+                if decision["write"]:
+                    self._trigger_snapshot(
+                        data,
+                        reason=f"INCIDENT {decision['action'].upper()}: {', '.join(decision['incident']['kinds'])}",
+                        incident=decision,
+                    )
+
+        if is_critical or is_startup or incident_closed:
+            if not (INCIDENTS and (is_critical or incident_closed)):
+                reason_txt = f"CRITICAL: posture={posture} hr={hr}" if is_critical else "STARTUP_INITIAL"
+                self._trigger_snapshot(data, reason=reason_txt)
             
             # Update confirmed state after write
             self._last_confirmed_posture = posture
@@ -293,17 +342,24 @@ class PatientState:
             self._trigger_snapshot(data, reason=f"HEARTBEAT: stable for {since_last_heartbeat} readings")
             self._last_heartbeat_count = self.reading_count
     
-    def _trigger_snapshot(self, data, reason=""):
+    def _trigger_snapshot(self, data, reason="", incident=None):
         """Send snapshot to Graphiti memory graph."""
         print(f"\n🚀 [GRAPH-MEMORY] {reason} | {self.device_id} (count: {self.reading_count})")
         print(f"   |- HR: {data.get('HR', 0)} | Steps: {data.get('Step', 0)} | Posture: {data.get('Posture_state', 0)}")
-        run_async(self.memory.store_sensor_snapshot(data), wait_result=False)
+        run_async(self.memory.store_sensor_snapshot(data, incident=incident), wait_result=False)
         
         # Update numerical metric history for delta comparisons
         self._last_confirmed_hr = int(data.get('HR', 0))
         self._last_confirmed_spo2 = int(data.get('Blood_oxygen', 0))
 
         
+    def sweep_incidents(self, now=None):
+        """Close an incident whose device stopped sending (no reading → no observe())."""
+        for decision in self.incidents.sweep(now):
+            print(f"\n🚀 [GRAPH-MEMORY] INCIDENT CLOSE (no readings): "
+                  f"{', '.join(decision['incident']['kinds'])} | {self.device_id}")
+            run_async(self.memory.close_stale_incident(decision), wait_result=False)
+
     def get_recent(self, n=10):
         """Get N most recent readings"""
         return list(self.history)[-n:]
@@ -429,6 +485,22 @@ MODEL_PREFERENCES = {
 
 }
 
+# ── Warm pool: keep agent / extraction / embedding models resident ──
+def _warm_pool_models():
+    """(model, role) pairs the warm pool should keep loaded."""
+    from memory.graphiti_client import (
+        GRAPHITI_LOCAL_MODEL, GRAPHITI_USE_CLOUD, OLLAMA_EMBED_MODEL,
+        OLLAMA_CLOUD_API_KEY as _GRAPHITI_CLOUD_KEY,
+    )
+    models = [(m, 'agent') for m in MODEL_PREFERENCES.values()]
+    # Local extraction model only matters when Graphiti is not on Ollama Cloud
+    if not (_GRAPHITI_CLOUD_KEY and GRAPHITI_USE_CLOUD):
+        models.append((GRAPHITI_LOCAL_MODEL, 'extraction'))
+    models.append((OLLAMA_EMBED_MODEL, 'embedding'))
+    return models
+
+start_warm_pool(_warm_pool_models())
+
 # AI Client and Chat History
 # AI Client and Chat History
 # AI_CLIENT = Client()  # Replaced with tracked client
@@ -630,7 +702,7 @@ class MonitorAgent:
         # =========================================================
         anomaly_str = ", ".join(anomalies)
         query = f"Did the patient have these anomalies before, or is this their normal baseline: {anomaly_str}?"
-        memory_context = run_async(patient_state.memory.get_patient_context(query, limit=3))
+        memory_context = run_async(patient_state.memory.get_patient_context(query, limit=3), lane="search")
         
         log_agent_activity(
             "Monitor Agent",
@@ -1039,23 +1111,22 @@ class CoordinatorAgent:
         if not results:
             return "No data available for analysis."
             
-        # Prepare context
-        context = f"""
-        AUTONOMOUS ANALYSIS REPORT
-        Device: {results['device_id']}
-        Time: {results['timestamp']}
-        
-        REAL-TIME MONITORING:
-        {json.dumps(results.get('monitoring'), indent=2)}
-        
-        PATTERN ANALYSIS:
-        {json.dumps(results.get('patterns'), indent=2)}
-        
-        PREDICTIVE INSIGHTS:
-        {json.dumps(results.get('prediction'), indent=2)}
-        
-        Overall Risk Score: {results['overall_risk']}
-        """
+        # Prepare context — compact JSON; the memory context is budgeted separately
+        monitoring = dict(results.get('monitoring') or {})
+        memory_context = monitoring.pop('memory_context', '') or ''
+        memory_context = ContextBuilder(
+            AgentConfig.COORDINATOR_AGENT, max_tokens=prompt_budget(AgentConfig.COORDINATOR_AGENT) // 2
+        ).add('memory', memory_context, dedupe=True).build()['memory']
+
+        context = (
+            f"AUTONOMOUS ANALYSIS REPORT\n"
+            f"Device: {results['device_id']} | Time: {results['timestamp']}\n"
+            f"REAL-TIME MONITORING: {compact_json(monitoring)}\n"
+            f"PATIENT MEMORY:\n{memory_context or 'none'}\n"
+            f"PATTERN ANALYSIS: {compact_json(results.get('patterns'))}\n"
+            f"PREDICTIVE INSIGHTS: {compact_json(results.get('prediction'))}\n"
+            f"Overall Risk Score: {results['overall_risk']}"
+        )
         
         try:
             response = AI_CLIENT.chat.completions.create(
@@ -1063,7 +1134,7 @@ class CoordinatorAgent:
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are a medical AI coordinator with deep long-term patient memory. Summarize the autonomous analysis in clear, actionable language. If the memory_context indicates an anomaly is normal for this patient, heavily emphasize this to reduce false alarms. Highlight critical findings first."
+                        "content": "You are a medical AI coordinator with deep long-term patient memory. Summarize the autonomous analysis in clear, actionable language. If the patient memory indicates an anomaly is normal for this patient, heavily emphasize this to reduce false alarms. Highlight critical findings first."
                     },
                     {
                         "role": "user",
@@ -1106,6 +1177,21 @@ def autonomous_monitor_loop():
 autonomous_thread = Thread(target=autonomous_monitor_loop, daemon=True)
 autonomous_thread.start()
 
+
+def incident_sweep_loop():
+    """Close incidents of devices that went silent mid-incident (INCIDENT_GAP_SEC)."""
+    while True:
+        for device_id, patient_state in list(PATIENT_STATES.items()):
+            try:
+                patient_state.sweep_incidents()
+            except Exception as e:
+                print(f"[Incidents] ⚠️ sweep failed ({device_id}): {e}")
+        time.sleep(INCIDENT_SWEEP_SEC)
+
+
+if INCIDENTS:
+    Thread(target=incident_sweep_loop, daemon=True).start()
+
 # ======================
 # MONGODB REAL-TIME LISTENER
 # ======================
@@ -1214,6 +1300,34 @@ def mongodb_listener():
 mongo_thread = Thread(target=mongodb_listener, daemon=True)
 mongo_thread.start()
 
+# Neo4j indexes/constraints + legacy reading keys (idempotent) — off the startup path
+def _bootstrap_neo4j_schema():
+    try:
+        ensure_schema()
+        migrate_layer1_keys()
+    except Exception as e:
+        print(f"[Neo4j Schema] ⚠️ bootstrap skipped: {e}")
+
+    # Hourly activity rollups — rebuild settled hours from VitalReading nodes.
+    # Started after the migration: hours compacted without legacy readings
+    # would be final (and never re-read) with their minutes missing.
+    ROLLUPS.start_compactor(lambda: list(PATIENT_STATES.keys()))
+
+    # Retention — raw readings → 15-min → daily summaries (RETENTION=true only).
+    # Also after the migration, so legacy readings are aged out with the rest.
+    RETENTION_ENGINE.start()
+
+if MEMORY_BACKEND == "inprocess":
+    # memory/inprocess_backend.py — no Neo4j / Graphiti / Ollama behind PatientMemory
+    print("[Memory] 🧪 MEMORY_BACKEND=inprocess — schema, rollup compactor, retention and Graphiti queue disabled")
+else:
+    Thread(target=_bootstrap_neo4j_schema, daemon=True).start()
+
+    # Durable Graphiti ingestion queue — start workers now so episodes left by
+    # the previous run are drained even before the first new snapshot
+    if GRAPHITI_QUEUE:
+        run_async_readonly(INGEST_QUEUE.start())
+
 # ======================
 # FLASK ROUTES
 # ======================
@@ -1624,10 +1738,12 @@ def generate_report(device_id):
                 else:
                     from ollama import AsyncClient
                     client = AsyncClient(host=AgentConfig.OLLAMA_HOST)
-                    resp = run_async_readonly(
+                    # local LLM → interactive lane: never waits on Graphiti extraction, cancelled on timeout
+                    resp = run_async(
                         client.chat(model=chat_model, messages=[{"role": "user", "content": prompt}], stream=False),
-                        timeout=30
+                        timeout=30, lane="interactive"
                     )
+                    record_latency(chat_model.replace('ollama:', ''), resp.get('total_duration', 0) / 1e9, resp.get('load_duration', 0) / 1e9)
                     ai_narrative = resp['message']['content']
     except Exception as e:
         print(f"AI narrative generation failed: {e}")
@@ -1688,18 +1804,24 @@ def get_patient_memory(device_id):
     query = "Summarize the patient's normal baseline, typical locations, and any major past emergencies based on your memory. Be factual and concise."
     
     try:
-        context = run_async(patient_state.memory.get_patient_context(query, limit=15))
+        context = run_async(patient_state.memory.get_patient_context(query, limit=15), lane="search")
         if context is None:
              return jsonify({'device_id': device_id, 'memory': '⏳ Graphiti memory engine is currently overloaded or configuring. Please wait a few moments and try again.'})
         return jsonify({'device_id': device_id, 'memory': context})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-@app.route("/api/patient-insights/<device_id>")
-def get_patient_insights(device_id):
+# Wall-clock budget for all memory retrieval of one insights request
+INSIGHT_RETRIEVAL_BUDGET_SEC = float(os.getenv('INSIGHT_RETRIEVAL_BUDGET_SEC', '20'))
+# When to spend an LLM call on insight cards: 'flagged' (only when the
+# statistics engine found something), 'always' or 'never'
+INSIGHT_LLM_MODE = os.getenv('INSIGHT_LLM_MODE', 'flagged').lower()
+
+def generate_patient_insights(device_id, hours=24, period='Today', selected_model=''):
     """
     Generate structured AI Insights from Graphiti memory graph.
     Asks the LLM 4 targeted questions about the patient's history,
     then returns structured insight cards for the UI.
+    Runs in the background refresher; the route serves the stored result.
     """
     if device_id in PATIENT_STATES:
         patient_memory = PATIENT_STATES[device_id].memory
@@ -1709,12 +1831,44 @@ def get_patient_insights(device_id):
         patient_memory = PatientMemory(device_id)
         patient_history = []
     
-    hours = request.args.get('hours', default=24, type=int)
-    period = request.args.get('period', default='Today', type=str)
-    selected_model = request.args.get('model', default='', type=str)
     chat_model = selected_model if selected_model and selected_model in AVAILABLE_MODELS \
                  else AgentConfig.COORDINATOR_AGENT
 
+    # Also grab current live vitals
+    live_vitals = {}
+    if patient_history:
+        latest = list(patient_history)[-1]
+        live_vitals = {
+            'HR':      int(latest.get('HR', 0)),
+            'SpO2':    int(latest.get('Blood_oxygen', 0)),
+            'Posture': POSTURE_MAP.get(int(latest.get('Posture_state', 0)), 'Unknown'),
+            'Area':    AREA_MAP.get(int(latest.get('Area', latest.get('Lokasi', 0))), 'Unknown'),
+        }
+
+    # ── Tier 0: deterministic statistics — no LLM, milliseconds ──────────
+    stat = build_stat_insights(
+        patient_history,
+        activity=run_async_readonly(patient_memory.get_activity_stats(hours)) or {},
+        alerts=[a for a in ACTIVE_ALERTS if a.get('device_id') == device_id],
+        manual=patient_memory.get_manual_episodes_sync(limit=5, hours_back=hours),
+        period=period, hours=hours,
+        hr_low=AgentConfig.ABNORMAL_HR_LOW, hr_high=AgentConfig.ABNORMAL_HR_HIGH,
+        spo2_min=AgentConfig.HYPOXIA_THRESHOLD, posture_map=POSTURE_MAP, area_map=AREA_MAP,
+    )
+    stat_cards = stat['insights']
+    if INSIGHT_LLM_MODE == 'never' or (INSIGHT_LLM_MODE == 'flagged' and not stat['flags']):
+        print(f"[Insights] {device_id} {period}: no flags — statistics cards only")
+        return {
+            'device_id':      device_id,
+            'insights':       stat_cards,
+            'engine':         'statistics',
+            'flags':          stat['flags'],
+            'memory_status':  'active' if stat['stats']['snapshots'] else 'empty',
+            'memory_hits':    0,
+            'live_vitals':    live_vitals,
+            'memory_sources': {'statistics': compact_json(stat['stats'])},
+        }
+
     # Pull broad memory context from Graphiti for all insight topics
     insight_queries = [
         ("risk_profile",    f"What are the known risk factors and past emergencies for this patient in the context of {period}?"),
@@ -1723,41 +1877,27 @@ def get_patient_insights(device_id):
         ("recommendations", f"Based on the patient's history, what are the most important care recommendations currently?"),
     ]
 
+    # One concurrent retrieval: 4 Tier-1 searches in parallel + at most one shared Tier-2 read
+    limit_val = 15 if hours <= 24 else (30 if hours <= 48 else 80)
+    contexts = run_async(
+        patient_memory.get_insight_contexts(
+            dict(insight_queries), limit=8, hours=hours,
+            direct_limit=limit_val, budget_s=INSIGHT_RETRIEVAL_BUDGET_SEC,
+        ),
+        timeout=INSIGHT_RETRIEVAL_BUDGET_SEC + 5,
+        lane="search",
+    ) or {}
+
     raw_contexts = {}
     memory_hits   = 0
-    for key, query in insight_queries:
-        try:
-            # Tier-1: try graphiti.search() via locked run_async (short timeout OK)
-            ctx = run_async(patient_memory.get_patient_context(query, limit=8))
-            if ctx and "No patient history" not in ctx and "first session" not in ctx:
-                raw_contexts[key] = ctx
-                memory_hits += 1
-                continue
-        except Exception:
-            pass
-
-        # Tier-2: direct Neo4j episode read, NO lock, always fast
-        limit_val = 15 if hours <= 24 else (30 if hours <= 48 else 80)
-        direct = run_async_readonly(
-            patient_memory.get_patient_episodes_direct(limit=limit_val, hours=hours), timeout=10
-        )
-        if direct:
-            raw_contexts[key] = direct
+    for key, _ in insight_queries:
+        ctx = contexts.get(key, "")
+        if ctx:
+            raw_contexts[key] = ctx
             memory_hits += 1
         else:
             raw_contexts[key] = "No historical data found for this topic yet."
 
-    # Also grab current live vitals
-    live_vitals = {}
-    if patient_history:
-        latest = list(patient_history)[-1]
-        live_vitals = {
-            'HR':      int(latest.get('HR', 0)),
-            'SpO2':    int(latest.get('Blood_oxygen', 0)),
-            'Posture': POSTURE_MAP.get(int(latest.get('Posture_state', 0)), 'Unknown'),
-            'Area':    AREA_MAP.get(int(latest.get('Area', latest.get('Lokasi', 0))), 'Unknown'),
-        }
-
     # Determine overall memory status for UI
     # Count context that has real data (either Tier-1 facts or Tier-2 episodes)
     if memory_hits == 0:
@@ -1789,35 +1929,45 @@ def get_patient_insights(device_id):
         "Reply with a valid JSON array of 4 objects and NOTHING else."
     )
 
-    # Trim each context to 800 chars to avoid overwhelming the small LLM
-    def _trim(text: str, limit: int = 800) -> str:
-        return text[:limit] + "..." if len(text) > limit else text
-
-    # Dynamically adjust character limit based on timeframe (modern small LLMs handle 8k context easily)
-    char_limit = 2000 if hours <= 24 else (4000 if hours <= 48 else 8000)
-
-    user_prompt = f"""
+    user_template = """
 Patient Device: {device_id}
 Requested Timeframe: {period} (last {hours} hours)
-Live Vitals Now: {json.dumps(live_vitals)}
+Live Vitals Now: {live_vitals}
 Memory Context: {memory_note}
 
+STATISTICAL FINDINGS (computed, trust these numbers):
+{stat_findings}
+
 EPISODE HISTORY — Risk & Vital Patterns:
-{_trim(raw_contexts['risk_profile'], char_limit)}
+{risk_profile}
 
 EPISODE HISTORY — Vitals Over Time:
-{_trim(raw_contexts['vitals_pattern'], char_limit)}
+{vitals_pattern}
 
 EPISODE HISTORY — Location & Activity:
-{_trim(raw_contexts['location_habits'], char_limit)}
+{location_habits}
 
 EPISODE HISTORY — Care Notes:
-{_trim(raw_contexts['recommendations'], char_limit)}
+{recommendations}
 
 Generate EXACTLY 4 insight cards specifically focusing on the requested timeframe ({period}). For each card, cite the specific data point from the episode history that led to the insight.
 Example reasoning: "Based on episode [2026-02-26T06:26] showing HR 89 bpm in Living Room, pattern is stable."
 Output ONLY the JSON array.
 """
+    # Token budget per section; the four retrievals often return the same
+    # Tier-2 episodes, so repeated lines are dropped across sections.
+    budget_ctx = ContextBuilder(chat_model, fixed_text=system_prompt + user_template + memory_note)
+    for key in ("risk_profile", "vitals_pattern", "location_habits", "recommendations"):
+        budget_ctx.add(key, raw_contexts[key], dedupe=True)
+    sections = budget_ctx.build()
+
+    user_prompt = user_template.format(
+        device_id=device_id, period=period, hours=hours,
+        live_vitals=compact_json(live_vitals), memory_note=memory_note,
+        stat_findings="\n".join(f"- {c['title']} [{c['severity']}]: {c['reasoning']}" for c in stat_cards),
+        **sections,
+    )
+    print(f"[Insights] prompt tokens ≈ {count_tokens(system_prompt + user_prompt, chat_model)} | {budget_ctx.usage()}")
 
     try:
         response = AI_CLIENT.chat.completions.create(
@@ -1896,34 +2046,89 @@ Output ONLY the JSON array.
             raise ValueError("No valid cards after normalization")
 
     except Exception as e:
-        # Robust fallback: generate a minimal live-vitals card
+        # Fallback: the deterministic cards already cite the data
         print(f"[Insights] JSON parse/normalize error: {e} | raw[:200]={raw[:200] if 'raw' in dir() else 'N/A'}")
-        lv = live_vitals
-        insights = [
-            {"title": "Current Vitals",
-             "summary": f"HR {lv.get('HR','--')} bpm, SpO2 {lv.get('SpO2','--')}%. Vitals are being monitored in real time.",
-             "severity": "normal"},
-            {"title": "Location & Posture",
-             "summary": f"Patient is {lv.get('Posture','Unknown')} in {lv.get('Area','Unknown')}. No anomalies detected.",
-             "severity": "normal"},
-            {"title": "Memory Context Status",
-             "summary": f"{memory_note}",
-             "severity": "caution"},
-            {"title": "Monitoring Active",
-             "summary": "Live sensor data is streaming. Insights will improve as memory graph accumulates more history.",
-             "severity": "normal"},
-        ]
+        insights = stat_cards
 
-    return jsonify({
+    return {
         'device_id':      device_id,
         'insights':       insights,
+        'engine':         'llm' if insights is not stat_cards else 'statistics',
+        'flags':          stat['flags'],
         'memory_status':  memory_status,
         'memory_hits':    memory_hits,
         'live_vitals':    live_vitals,
         'memory_sources': {k: v for k, v in raw_contexts.items()},  # full context for UI display
+    }
+
+
+def _insight_watermark(device_id):
+    """Data position the cards were built from: reading count + last reading time."""
+    state = PATIENT_STATES.get(device_id)
+    if state is None:
+        return {'reading_count': None, 'last_reading': None}
+    last = state.history[-1].get('timestamp') if state.history else None
+    return {
+        'reading_count': state.reading_count,
+        'last_reading':  last.isoformat() if isinstance(last, datetime) else last,
+    }
+
+
+INSIGHT_STORE = InsightCardStore()
+INSIGHT_REFRESHER = InsightRefresher(
+    INSIGHT_STORE,
+    generate_fn=lambda d, h, p, m: generate_patient_insights(d, h, p, m),
+    patients_fn=lambda: [d for d, st in list(PATIENT_STATES.items()) if st.history],
+    watermark_fn=_insight_watermark,
+)
+INSIGHT_REFRESHER.start()
+
+
+@app.route("/api/patient-insights/<device_id>")
+def get_patient_insights(device_id):
+    """
+    Serve precomputed insight cards for the UI.
+    Cards are regenerated in the background; the response carries a
+    staleness indicator. ?refresh=true queues a regeneration without
+    waiting for it. Only a cold miss (never generated) blocks.
+    """
+    hours = request.args.get('hours', default=24, type=int)
+    period = request.args.get('period', default='Today', type=str)
+    selected_model = request.args.get('model', default='', type=str)
+    refresh = request.args.get('refresh', default='false', type=str).lower() == 'true'
+    # Cards for the default coordinator are shared with the background job
+    model_key = selected_model if selected_model and selected_model in AVAILABLE_MODELS \
+                and selected_model != AgentConfig.COORDINATOR_AGENT else ''
+
+    entry = INSIGHT_STORE.get(device_id, hours, model_key)
+    if entry is None:
+        entry = INSIGHT_REFRESHER.generate_now(device_id, hours, period, model_key)
+        refresh = False
+
+    watermark = _insight_watermark(device_id)
+    fresh = staleness(entry, watermark)
+    refresh_queued = False
+    if refresh or (fresh['stale'] and model_key == ''):
+        refresh_queued = INSIGHT_REFRESHER.enqueue(device_id, hours, period, model_key) \
+                         or INSIGHT_REFRESHER.is_pending(device_id, hours, model_key)
+
+    return jsonify({
+        **entry['payload'],
+        'generated_at':   fresh['generated_at'],
+        'age_seconds':    fresh['age_seconds'],
+        'stale':          fresh['stale'],
+        'new_readings':   fresh['new_readings'],
+        'watermark':      entry.get('watermark'),
+        'refresh_queued': refresh_queued,
     })
 
 
+@app.route("/api/insight-cache")
+def insight_cache_status():
+    """Background insight refresher status"""
+    return jsonify(INSIGHT_REFRESHER.status())
+
+
 @app.route("/api/memory-chat", methods=["POST"])
 def memory_chat():
     """
@@ -2012,7 +2217,7 @@ def memory_chat():
             # ── Tier-1: Graphiti semantic search ──
             try:
                 raw_ctx = run_async(
-                    patient_state.memory.get_patient_context(question, limit=10)
+                    patient_state.memory.get_patient_context(question, limit=10), lane="search"
                 )
                 if raw_ctx and "No patient history" not in raw_ctx and "first session" not in raw_ctx:
                     memory_context = raw_ctx
@@ -2126,6 +2331,28 @@ def memory_chat():
             if first_ts:
                 monitoring_start = f"Monitoring started: {first_ts.strftime('%Y-%m-%d %H:%M') if hasattr(first_ts, 'strftime') else str(first_ts)[:16]}. Current time: {datetime.now().strftime('%Y-%m-%d %H:%M')}."
 
+        # ── Token budget: time-specific records > memory/activity > chat history ──
+        chat_instructions = """INSTRUCTIONS:
+1. LOCATION QUESTIONS: When asked 'where', answer with the LOCATION/AREA (e.g. Laboratory, Bedroom, Corridor). Posture (Lying Down, Standing, etc.) is NOT a location.
+2. POSTURE QUESTIONS: When asked 'what posture', answer with body position (Lying Down, Sitting, Standing, Prone, etc.). Location is NOT a posture.
+3. DURATION QUESTIONS: Clarify if the duration is total (all sessions) or today only. Use h/min format.
+4. CITE DATA: Reference actual values (timestamps, step counts).
+5. CONCISE: 2-4 sentences. Be direct and specific.
+6. HONEST: If location data is missing, say so. Never confuse posture with location.
+"""
+        recent_alerts = json.dumps([a['message'] for a in ACTIVE_ALERTS[-3:]], ensure_ascii=False)
+        chat_budget = ContextBuilder(
+            chat_model,
+            max_tokens=prompt_budget(chat_model) - 400,   # ~400 tokens of fixed prompt headers below
+            fixed_text=chat_instructions + question + live_snippet + monitoring_start + recent_alerts,
+        )
+        chat_budget.add("time",    time_context,   weight=3, dedupe=True)
+        chat_budget.add("memory",  memory_context, weight=2, dedupe=True)
+        chat_budget.add("history", "\n".join(str(t.get("content", "")) for t in session_history[-8:]), weight=1)
+        fitted = chat_budget.build()
+        time_context, memory_context = fitted["time"], fitted["memory"]
+        history_tokens = chat_budget.usage()["history"]["alloc"]
+
         # Build time-specific section header
         time_section = ""
         if time_context:
@@ -2155,20 +2382,12 @@ CURRENT LIVE SENSOR DATA (right now):
 {live_snippet}
 
 RECENT SYSTEM ALERTS:
-{json.dumps([a['message'] for a in ACTIVE_ALERTS[-3:]], ensure_ascii=False)}
+{recent_alerts}
 
-INSTRUCTIONS:
-1. LOCATION QUESTIONS: When asked 'where', answer with the LOCATION/AREA (e.g. Laboratory, Bedroom, Corridor). Posture (Lying Down, Standing, etc.) is NOT a location.
-2. POSTURE QUESTIONS: When asked 'what posture', answer with body position (Lying Down, Sitting, Standing, Prone, etc.). Location is NOT a posture.
-3. DURATION QUESTIONS: Clarify if the duration is total (all sessions) or today only. Use h/min format.
-4. CITE DATA: Reference actual values (timestamps, step counts).
-5. CONCISE: 2-4 sentences. Be direct and specific.
-6. HONEST: If location data is missing, say so. Never confuse posture with location.
-"""
+{chat_instructions}"""
 
         messages = [{"role": "system", "content": system_prompt}]
-        for turn in session_history[-8:]:
-            messages.append({"role": turn["role"], "content": turn["content"]})
+        messages.extend(fit_history(session_history, chat_model, history_tokens))
         messages.append({"role": "user", "content": question})
 
         @track(name="memory_chatbot", tags=["chat", "graphiti", "memory"])
@@ -2251,6 +2470,80 @@ def check_model_status():
             "error": str(e),
         })
 
+@app.route("/api/model-warmpool")
+def get_model_warmpool():
+    """Keep-alive policy and cold-start vs warm latency per local model."""
+    return jsonify(warm_pool_stats())
+
+@app.route("/api/neo4j-pool")
+def get_neo4j_pool():
+    """Shared Neo4j driver pool (acquire time) and the batched direct writer (flush metrics)."""
+    return jsonify({**neo4j_pool_stats(), 'writer': writer_stats()})
+
+@app.route("/api/graphiti-queue")
+def get_graphiti_queue():
+    """Durable Graphiti ingestion queue: depth per state/priority, oldest pending age, retries."""
+    return jsonify(INGEST_QUEUE.stats())
+
+@app.route("/api/memory-lanes")
+def get_memory_lanes():
+    """Async bridge lanes: concurrency, running/waiting, queue-time histogram per lane."""
+    return jsonify(lane_stats())
+
+@app.route("/api/debug/memory-loop")
+def get_memory_loop():
+    """Memory event loop health: lag, in-flight futures by kind/lane, oldest age, error counters."""
+    return jsonify({**LOOP_MONITOR.status(), 'lanes': lane_stats()})
+
+@app.route("/metrics")
+def get_metrics():
+    """Prometheus scrape endpoint for the memory loop and async lanes."""
+    return app.response_class(
+        response=LOOP_MONITOR.prometheus(lane_stats()),
+        status=200,
+        mimetype='text/plain; version=0.0.4'
+    )
+
+@app.route("/api/memory-cache")
+def get_memory_cache():
+    """PatientMemory read cache: entries, hit rate, invalidations per method."""
+    return jsonify(READ_CACHE.stats())
+
+@app.route("/api/incidents")
+def get_incidents():
+    """Open critical incident per patient (running stats) and closed counts."""
+    return jsonify({dev: ps.incidents.status() for dev, ps in list(PATIENT_STATES.items())})
+
+@app.route("/api/segments")
+def get_segments():
+    """Open posture / area segment per patient and closed segment counts."""
+    return jsonify({dev: ps.sessions.status() for dev, ps in list(PATIENT_STATES.items())})
+
+@app.route("/api/embedding-cache")
+def get_embedding_cache():
+    """Embedding cache hit rate, batch sizes and Ollama latency saved."""
+    return jsonify(embedding_cache_stats())
+
+@app.route("/api/retention")
+def get_retention():
+    """Retention tiers and how much has been downsampled; ?dry_run=1 reports pending work."""
+    if request.args.get("dry_run"):
+        return jsonify(RETENTION_ENGINE.run(request.args.get("device_id"), dry_run=True))
+    return jsonify(RETENTION_ENGINE.status())
+
+@app.route("/api/activity-rollups")
+def get_activity_rollups():
+    """Open in-memory rollup hours per patient and write/compaction counters."""
+    return jsonify(ROLLUPS.status())
+
+@app.route("/api/neo4j-schema")
+def get_neo4j_schema():
+    """Expected indexes/constraints that are missing or still populating."""
+    try:
+        return jsonify(verify_schema())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 503
+
 @app.route("/api/model-preferences")
 def get_model_preferences():
     """Get current model preferences for all agents"""
@@ -2475,10 +2768,12 @@ def generate_multi_period_report():
         from ollama import AsyncClient
         local_model = AgentConfig.COORDINATOR_AGENT.replace('ollama:', '')
         client = AsyncClient(host=AgentConfig.OLLAMA_HOST)
-        resp = run_async_readonly(
+        resp = run_async(
             client.chat(model=local_model, messages=[{"role": "user", "content": prompt}], stream=False),
-            timeout=120 # Local also gets more time for thinking
+            timeout=120, # Local also gets more time for thinking
+            lane="interactive"
         )
+        record_latency(local_model, resp.get('total_duration', 0) / 1e9, resp.get('load_duration', 0) / 1e9)
         return resp['message']['content']
 
     # Generate report
@@ -2634,6 +2929,16 @@ if __name__ == "__main__":
     
     # Gracefully close Neo4j connection on shutdown
     atexit.register(lambda: run_async(close_graphiti()))
+    atexit.register(close_direct_writer)   # flushes buffered vitals, then closes the pool
+
+    def _checkpoint_segments():
+        # atexit is LIFO: runs before close_direct_writer flushes the buffer
+        for dev, sess in list(SESSIONIZERS.items()):
+            rows = sess.open_rows()
+            if rows and dev in PATIENT_STATES:
+                run_async(PATIENT_STATES[dev].memory.store_segments(rows), timeout=10)
+    if SESSIONIZER:
+        atexit.register(_checkpoint_segments)
     
     print("\n" + "="*50)
     print("🔥 UTLMediCore Backend [RESTARTED - PORT 7000]")
@@ -0,0 +1,122 @@
+"""
+backfill_episode_properties.py
+==============================
+One-off backfill: parses the text of existing sensor Episodic nodes and sets
+the typed columns (posture, posture_label, area_label, hr, spo2, steps,
+condition, timestamp_local) that store_sensor_snapshot now writes directly.
+After this, activity summary / raw history never fall back to text parsing.
+
+Every Episodic node without minute_of_day / local_date also gets them from
+valid_at (the wall-clock time Graphiti stored), so time-of-day questions can
+use the (group_id, minute_of_day) index.
+
+VitalReading / AlertEvent nodes written before the direct writer stored
+device_id / valid_at on the node get them from their Patient and timestamp_utc
+(neo4j_schema.migrate_layer1_keys, also run at app startup), so Tier-2,
+rollups and retention can seek on (device_id, valid_at).
+
+Usage:
+    PYTHONUTF8=1 python backfill_episode_properties.py
+    PYTHONUTF8=1 python backfill_episode_properties.py --device DCA632971FC3 --dry-run
+"""
+import argparse
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from memory.neo4j_pool import sync_session, close_all
+from memory.neo4j_schema import migrate_layer1_keys
+from memory.patient_memory import _parse_episode_text
+
+BATCH = 500
+
+
+def backfill(device_id: str = None, dry_run: bool = False) -> int:
+    where = "e.posture_label IS NULL AND e.content CONTAINS 'Activity/Posture:'"
+    params = {}
+    if device_id:
+        where += " AND e.group_id = $gid"
+        params["gid"] = f"patient_{device_id}"
+
+    updated, scanned, cursor = 0, 0, None
+    with sync_session() as s:
+        while True:
+            page = list(s.run(
+                f"""
+                MATCH (e:Episodic)
+                WHERE {where} AND ($after IS NULL OR e.created_at > $after)
+                RETURN e.uuid AS uuid, e.content AS content, e.created_at AS created_at
+                ORDER BY e.created_at ASC
+                LIMIT $lim
+                """,
+                after=cursor, lim=BATCH, **params,
+            ))
+            if not page:
+                break
+            cursor = page[-1]["created_at"]
+            scanned += len(page)
+
+            rows = []
+            for rec in page:
+                props = _parse_episode_text(rec["content"])
+                if props.get("posture_label"):
+                    rows.append({"uuid": rec["uuid"], "props": props})
+
+            if rows and not dry_run:
+                s.run(
+                    "UNWIND $rows AS row MATCH (e:Episodic {uuid: row.uuid}) SET e += row.props",
+                    rows=rows,
+                ).consume()
+            updated += len(rows)
+            print(f"  scanned {scanned:,} | {'would update' if dry_run else 'updated'} {updated:,}")
+
+    return updated
+
+
+def backfill_time_of_day(device_id: str = None, dry_run: bool = False) -> int:
+    where = "e.minute_of_day IS NULL AND e.valid_at IS NOT NULL"
+    params = {}
+    if device_id:
+        where += " AND e.group_id = $gid"
+        params["gid"] = f"patient_{device_id}"
+
+    with sync_session() as s:
+        todo = s.run(f"MATCH (e:Episodic) WHERE {where} RETURN count(e) AS n", **params).single()["n"]
+        if dry_run or not todo:
+            return todo
+        s.run(
+            f"""
+            MATCH (e:Episodic) WHERE {where}
+            CALL {{
+                WITH e
+                SET e.minute_of_day = e.valid_at.hour * 60 + e.valid_at.minute,
+                    e.local_date    = toString(date(e.valid_at))
+            }} IN TRANSACTIONS OF {BATCH} ROWS
+            """,
+            **params,
+        ).consume()
+    return todo
+
+
+def backfill_device_ids(device_id: str = None, dry_run: bool = False) -> int:
+    return migrate_layer1_keys(device_id=device_id, dry_run=dry_run)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill typed columns on sensor Episodic nodes")
+    parser.add_argument("--device", default=None, help="Only this device_id (default: all patients)")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and count, do not write")
+    args = parser.parse_args()
+
+    print("=" * 55)
+    print(f"  Backfill episode properties — {args.device or 'all patients'}")
+    print("=" * 55)
+    try:
+        n = backfill(args.device, args.dry_run)
+        t = backfill_time_of_day(args.device, args.dry_run)
+        d = backfill_device_ids(args.device, args.dry_run)
+        verb = "would be updated" if args.dry_run else "updated"
+        print(f"\n✅ Done — {n:,} episodes {verb} (sensor columns), {t:,} {verb} (minute_of_day/local_date), "
+              f"{d:,} readings/alerts {verb} (device_id / valid_at)")
+    finally:
+        close_all()
@@ -0,0 +1,173 @@
+"""
+Context Budget Evaluation
+=========================
+
+Compares the old prompt construction (pretty-printed JSON, raw episode dumps)
+with the token-budgeted ContextBuilder on the evaluation datasets:
+
+1. Token count per prompt (always — no LLM needed)
+2. Optional: answer quality + latency with a real model (--run)
+   The model must classify severity; accuracy is measured against
+   expected_output['severity'] for both prompt variants.
+
+Usage:
+    python evaluation/context_budget_eval.py
+    python evaluation/context_budget_eval.py --run --model ollama:lfm2.5-thinking:1.2b --test-cases 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from evaluation.test_datasets import FALL_DETECTION_TESTS, VITAL_SIGNS_ANOMALY_TESTS
+from evaluation.metrics import calculate_latency_metrics
+from utils.context_builder import ContextBuilder, compact_json, count_tokens
+
+SYSTEM_PROMPT = (
+    "You are a medical AI coordinator. Classify the overall severity of this analysis "
+    "as exactly one word: NORMAL, WARNING or CRITICAL."
+)
+
+# Episode history repeated across sections, like the four insight retrievals did
+_EPISODES = "\n\n".join(
+    f"[2026-03-2{d}T0{h}:00] [Normal — all vitals within safe parameters] Patient monitoring record. "
+    f"Location: Laboratory. Activity/Posture: Sitting. Heart Rate: 8{h} bpm (normal range)."
+    for d in range(3) for h in range(6)
+)
+
+
+def _analysis(test: dict) -> dict:
+    """Build a CoordinatorAgent-style results dict from one test case."""
+    data = test["input_data"]
+    return {
+        "device_id": "EVAL_DEVICE",
+        "timestamp": "2026-03-26T10:00:00",
+        "monitoring": {
+            "anomalies": [],
+            "data": data,
+            "memory_context": "Patient Episode History — 18 recent records:\n" + _EPISODES,
+        },
+        "patterns": {
+            "activity_distribution": {"Sitting": "60.0%", "Standing": "40.0%"},
+            "vitals_trend": {"hr_avg": float(data.get("HR", 0)) + 0.3333, "hr_std": 4.56789,
+                             "spo2_avg": float(data.get("Blood_oxygen", 0)) - 0.25},
+            "location_hotspots": {"Laboratory": 12, "Corridor": 3},
+            "risk_assessment": 0.2,
+        },
+        "prediction": {"next_hour_risk": 0.15, "trend_direction": "stable", "recommendations": []},
+        "overall_risk": 0.2,
+    }
+
+
+def verbose_prompt(results: dict) -> str:
+    """Prompt as generate_ai_summary built it before the context builder."""
+    return f"""
+        AUTONOMOUS ANALYSIS REPORT
+        Device: {results['device_id']}
+        Time: {results['timestamp']}
+
+        REAL-TIME MONITORING:
+        {json.dumps(results.get('monitoring'), indent=2)}
+
+        PATTERN ANALYSIS:
+        {json.dumps(results.get('patterns'), indent=2)}
+
+        PREDICTIVE INSIGHTS:
+        {json.dumps(results.get('prediction'), indent=2)}
+
+        Overall Risk Score: {results['overall_risk']}
+        """
+
+
+def compact_prompt(results: dict, model: str) -> str:
+    """Prompt as generate_ai_summary builds it now."""
+    monitoring = dict(results.get("monitoring") or {})
+    memory = ContextBuilder(model, max_tokens=600).add(
+        "memory", monitoring.pop("memory_context", ""), dedupe=True
+    ).build()["memory"]
+    return (
+        f"AUTONOMOUS ANALYSIS REPORT\n"
+        f"Device: {results['device_id']} | Time: {results['timestamp']}\n"
+        f"REAL-TIME MONITORING: {compact_json(monitoring)}\n"
+        f"PATIENT MEMORY:\n{memory}\n"
+        f"PATTERN ANALYSIS: {compact_json(results.get('patterns'))}\n"
+        f"PREDICTIVE INSIGHTS: {compact_json(results.get('prediction'))}\n"
+        f"Overall Risk Score: {results['overall_risk']}"
+    )
+
+
+def _classify(client, model: str, prompt: str):
+    t0 = time.time()
+    resp = client.chat_completions_create(
+        model=model,
+        messages=[{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}],
+        temperature=0.1,
+    )
+    latency = (time.time() - t0) * 1000
+    text = resp.choices[0].message.content.upper()
+    for label in ("CRITICAL", "WARNING", "NORMAL"):
+        if label in text:
+            return label, latency
+    return "UNKNOWN", latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token budget evaluation")
+    parser.add_argument("--model", default="ollama:lfm2.5-thinking:1.2b")
+    parser.add_argument("--test-cases", type=int, default=None)
+    parser.add_argument("--run", action="store_true", help="Also call the model and compare accuracy")
+    args = parser.parse_args()
+
+    tests = [t for t in FALL_DETECTION_TESTS + VITAL_SIGNS_ANOMALY_TESTS if "input_data" in t]
+    if args.test_cases:
+        tests = tests[: args.test_cases]
+
+    client = None
+    if args.run:
+        from evaluation.opik_integration import TrackedAISuiteClient
+        client = TrackedAISuiteClient()
+
+    totals = {"verbose": 0, "compact": 0}
+    correct = {"verbose": 0, "compact": 0}
+    latencies = {"verbose": [], "compact": []}
+    labelled = 0
+
+    for i, test in enumerate(tests, 1):
+        results = _analysis(test)
+        prompts = {"verbose": verbose_prompt(results), "compact": compact_prompt(results, args.model)}
+        for variant, prompt in prompts.items():
+            totals[variant] += count_tokens(SYSTEM_PROMPT + prompt, args.model)
+
+        expected = test.get("expected_output", {}).get("severity")
+        if client and expected:
+            labelled += 1
+            for variant, prompt in prompts.items():
+                try:
+                    label, ms = _classify(client, args.model, prompt)
+                    latencies[variant].append(ms)
+                    correct[variant] += int(label == expected)
+                except Exception as e:
+                    print(f"[{i}/{len(tests)}] {test['id']} {variant} failed: {e}")
+
+    n = max(len(tests), 1)
+    print("\n" + "=" * 60)
+    print(f"  CONTEXT BUDGET EVALUATION — {args.model} — {len(tests)} cases")
+    print("=" * 60)
+    print(f"  Avg prompt tokens (verbose): {totals['verbose'] / n:8.1f}")
+    print(f"  Avg prompt tokens (compact): {totals['compact'] / n:8.1f}")
+    if totals["verbose"]:
+        print(f"  Reduction                  : {100 * (1 - totals['compact'] / totals['verbose']):7.1f}%")
+
+    if client and labelled:
+        for variant in ("verbose", "compact"):
+            lat = calculate_latency_metrics(latencies[variant]) if latencies[variant] else {}
+            print(f"  {variant:8s} accuracy: {correct[variant] / labelled:.1%}"
+                  f" | mean latency: {lat.get('mean', 0):.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Episode Encoding A/B — verbose vs compact
+=========================================
+
+Renders the same synthetic sensor readings with both EPISODE_ENCODING modes
+(PatientMemory._render_snapshot) and ingests each through Graphiti into its
+own group, measuring:
+
+- tokens / chars  : per episode, with utils.context_builder.count_tokens
+- latency         : wall-clock of graphiti.add_episode (LLM extraction) p50 / p95
+- edge quality    : entities and facts created per episode, and fact recall —
+                    share of the reading's key facts (location, posture, HR,
+                    SpO2) that appear in the extracted entity names / facts
+
+The compact group gets its baseline preamble first (not timed), exactly as
+store_sensor_snapshot would send it.
+
+Needs Neo4j + Ollama (same env as the app) unless --tokens-only. Synthetic
+patients are 'BENCH_ENC_VERBOSE' / 'BENCH_ENC_COMPACT', removed with --cleanup.
+
+Usage:
+    python evaluation/episode_encoding_ab.py --tokens-only
+    python evaluation/episode_encoding_ab.py --episodes 12
+    python evaluation/episode_encoding_ab.py --cleanup
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.context_builder import count_tokens
+
+VARIANTS = {"verbose": "BENCH_ENC_VERBOSE", "compact": "BENCH_ENC_COMPACT"}
+MODEL = os.getenv("GRAPHITI_LOCAL_MODEL", "llama3.1:8b")
+
+# (HR, SpO2, posture, area) — routine, warnings and critical mixed like a real day
+SCENARIOS = [
+    (72, 97, 1, 7), (68, 98, 3, 7), (85, 96, 8, 3), (76, 97, 1, 5),
+    (118, 95, 2, 6), (58, 88, 3, 7), (130, 84, 5, 6), (42, 93, 3, 7),
+    (80, 96, 1, 4), (95, 91, 6, 7), (70, 97, 11, 5), (112, 87, 8, 3),
+]
+
+
+def readings(n: int, seed: int = 11) -> list:
+    rng = random.Random(seed)
+    start = datetime.now().replace(second=0, microsecond=0) - timedelta(hours=n)
+    out = []
+    for i in range(n):
+        hr, spo2, posture, area = SCENARIOS[i % len(SCENARIOS)]
+        out.append({
+            "HR": hr, "Blood_oxygen": spo2, "Posture_state": posture, "Area": area,
+            "Step": 300 * i + rng.randint(0, 200), "Calories_burned": 40 * i, "Calories": 0,
+            "timestamp": start + timedelta(hours=i, minutes=rng.randint(0, 59)),
+        })
+    return out
+
+
+def render(data: list) -> dict:
+    from memory.patient_memory import PatientMemory
+    rendered = {}
+    for variant, device in VARIANTS.items():
+        mem = PatientMemory(device)
+        rendered[variant] = [mem._render_snapshot(d, encoding=variant) for d in data]
+    return rendered
+
+
+def _pct(vals, p):
+    vals = sorted(vals)
+    return vals[min(int(len(vals) * p), len(vals) - 1)] if vals else 0
+
+
+def _key_facts(snap: dict) -> list:
+    facts = [snap["area_txt"], snap["posture_txt"]]
+    if snap["hr"]:
+        facts.append(str(snap["hr"]))
+    if snap["spo2"]:
+        facts.append(str(snap["spo2"]))
+    return [f.lower() for f in facts]
+
+
+async def ingest(rendered: dict) -> dict:
+    from memory.graphiti_client import get_graphiti
+    from memory.patient_memory import _encoding_preamble
+    graphiti = await get_graphiti()
+    results = {}
+
+    for variant, snaps in rendered.items():
+        device = VARIANTS[variant]
+        gid = f"patient_{device}"
+        if variant == "compact":
+            await graphiti.add_episode(
+                name="baseline_preamble", episode_body=_encoding_preamble(device),
+                source_description="UTLMediCore encoding A/B", group_id=gid,
+                reference_time=snaps[0]["now"] - timedelta(minutes=1),
+            )
+        rows = []
+        for i, snap in enumerate(snaps):
+            t0 = time.perf_counter()
+            res = await graphiti.add_episode(
+                name=f"{variant}_{i}", episode_body=snap["episode_text"],
+                source_description="UTLMediCore encoding A/B", group_id=gid,
+                reference_time=snap["now"],
+            )
+            ms = (time.perf_counter() - t0) * 1000
+            names = [n.name.lower() for n in (res.nodes or [])]
+            facts = [e.fact.lower() for e in (res.edges or [])]
+            haystack = " | ".join(names + facts)
+            key = _key_facts(snap)
+            rows.append({
+                "ms": ms,
+                "entities": len(names),
+                "facts": len(facts),
+                "recall": sum(1 for k in key if k in haystack) / len(key),
+            })
+            print(f"  {variant:8s} #{i:<3d} {ms:7.0f} ms  {len(names):2d} entities  {len(facts):2d} facts")
+        results[variant] = rows
+    return results
+
+
+def cleanup() -> None:
+    from memory.neo4j_pool import sync_session
+    with sync_session() as s:
+        for device in VARIANTS.values():
+            s.run("""
+                MATCH (n) WHERE n.group_id = $gid
+                CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 1000 ROWS
+            """, gid=f"patient_{device}").consume()
+    print(f"Deleted A/B groups {', '.join(VARIANTS.values())}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A/B verbose vs compact Graphiti episode encoding")
+    parser.add_argument("--episodes", type=int, default=len(SCENARIOS))
+    parser.add_argument("--tokens-only", action="store_true", help="Only render and count tokens (no LLM)")
+    parser.add_argument("--cleanup", action="store_true", help="Delete the synthetic groups and exit")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup()
+        return
+
+    rendered = render(readings(args.episodes))
+    print("=" * 72)
+    print(f"  EPISODE ENCODING A/B — {args.episodes} episodes, tokens for {MODEL}")
+    print("=" * 72)
+    print("\nSample (critical reading):")
+    for variant, snaps in rendered.items():
+        print(f"  [{variant}] {snaps[min(6, len(snaps) - 1)]['episode_text']}\n")
+
+    tokens = {v: [count_tokens(s["episode_text"], f"ollama:{MODEL}") for s in snaps]
+              for v, snaps in rendered.items()}
+    print(f"{'Variant':10s} {'tokens avg':>10s} {'tokens max':>10s} {'chars avg':>10s}")
+    print("-" * 44)
+    for v, toks in tokens.items():
+        chars = sum(len(s["episode_text"]) for s in rendered[v]) / len(rendered[v])
+        print(f"{v:10s} {sum(toks) / len(toks):10.0f} {max(toks):10d} {chars:10.0f}")
+    if args.tokens_only:
+        return
+
+    results = asyncio.run(ingest(rendered))
+    print(f"\n{'Variant':10s} {'p50 ms':>8s} {'p95 ms':>8s} {'entities':>9s} {'facts':>6s} {'recall':>7s}")
+    print("-" * 54)
+    for v, rows in results.items():
+        ms = [r["ms"] for r in rows]
+        n = len(rows)
+        print(f"{v:10s} {_pct(ms, .5):8.0f} {_pct(ms, .95):8.0f} "
+              f"{sum(r['entities'] for r in rows) / n:9.1f} {sum(r['facts'] for r in rows) / n:6.1f} "
+              f"{100 * sum(r['recall'] for r in rows) / n:6.0f}%")
+    print("\nRun with --cleanup to remove the synthetic groups.")
+
+
+if __name__ == "__main__":
+    main()
@@ -37,6 +37,8 @@ from opik.evaluation import evaluate
 # from opik.evaluation.metrics import Metric  # Not available in this version
 import opik
 
+from utils.model_warmpool import track_call
+
 # Initialize Opik with API key
 OPIK_API_KEY = os.getenv("OPIK_API_KEY", "2ciMrRhl5TFrvKBXmCngakr1L")
 OPIK_WORKSPACE = os.getenv("OPIK_WORKSPACE", None)  # None = use default workspace
@@ -112,13 +114,14 @@ class TrackedAISuiteClient:
         start_time = time.time()
         
         try:
-            # Call aisuite (existing functionality - UNCHANGED)
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=temperature,
-                **kwargs
-            )
+            # Call aisuite (existing functionality - UNCHANGED); local models feed the warm-pool latency stats
+            with track_call(model):
+                response = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    **kwargs
+                )
             
             # Calculate metrics
             latency_ms = (time.time() - start_time) * 1000
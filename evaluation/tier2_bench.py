@@ -0,0 +1,192 @@
+"""
+Tier-2 Memory Context Benchmark
+===============================
+
+Compares the old Tier-2 query (UNION ALL over every Episodic, VitalReading
+and AlertEvent of the patient, sorted in Neo4j) with the time-bounded
+per-source top-k reads of PatientMemory._tier2_context, on a graph seeded
+with months of readings.
+
+Needs a running Neo4j (NEO4J_URI / NEO4J_USER / NEO4J_PASSWORD). The
+synthetic patient is device 'BENCH_T2' (group_id 'patient_BENCH_T2') and is
+removed with --cleanup.
+
+The newest LEGACY_ROWS readings and one alert are seeded in the pre-direct-
+writer shape (no device_id / valid_at, only timestamp_utc + HAD_READING /
+HAD_ALERT); the bench runs migrate_layer1_keys() and checks that the top-k
+path returns them like the old query does.
+
+Usage:
+    python evaluation/tier2_bench.py                        # 90 days, 1 reading / min
+    python evaluation/tier2_bench.py --days 180 --runs 30 --limit 15
+    python evaluation/tier2_bench.py --cleanup
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory.neo4j_pool import sync_session, async_session, close_all
+from memory.neo4j_schema import ensure_schema, migrate_layer1_keys
+
+DEVICE = "BENCH_T2"
+GROUP = f"patient_{DEVICE}"
+LEGACY_ROWS = 5
+
+OLD_QUERY = """
+MATCH (e:Episodic)
+WHERE e.group_id = $gid
+RETURN e.content AS content, datetime(e.created_at) AS ts
+UNION ALL
+MATCH (p:Patient {device_id: $dev_id})-[:HAD_READING]->(v:VitalReading)
+RETURN "Real-time reading — HR: " + toString(v.hr) + " | SpO2: " + toString(v.spo2) +
+       "% | Posture: " + v.posture_label + " (" + v.condition + ")" AS content,
+       datetime(v.timestamp_utc) AS ts
+UNION ALL
+MATCH (p:Patient {device_id: $dev_id})-[:HAD_ALERT]->(a:AlertEvent)
+RETURN "⚠️ ALERT — " + a.alert_type + " [" + a.severity + "]: " + a.message AS content,
+       datetime(a.timestamp_utc) AS ts
+ORDER BY ts DESC
+LIMIT $lim
+"""
+
+
+def seed(days: int, every_min: int) -> None:
+    with sync_session() as s:
+        existing = s.run("MATCH (v:VitalReading {device_id: $d}) RETURN count(v) AS n", d=DEVICE).single()["n"]
+        if existing:
+            print(f"  Using {existing:,} existing synthetic readings")
+            return
+        s.run("MERGE (p:Patient {device_id: $d}) SET p.id = $d", d=DEVICE).consume()
+
+        start = datetime.now(timezone.utc) - timedelta(days=days)
+        total = days * 24 * 60 // every_min
+        vitals, episodes, alerts = [], [], []
+        for i in range(total):
+            ts = (start + timedelta(minutes=i * every_min)).isoformat()
+            vitals.append({"uuid": str(uuid.uuid4()), "ts": ts, "hr": 60 + i % 40, "spo2": 94 + i % 6})
+            if i % 30 == 0:
+                episodes.append({"uuid": str(uuid.uuid4()), "ts": ts,
+                                 "content": f"Routine observation {i}. Location: Bedroom."})
+            if i % 1440 == 0:
+                alerts.append({"uuid": str(uuid.uuid4()), "ts": ts})
+            if len(vitals) == 10000 or i == total - 1:
+                legacy = [] if i < total - 1 else vitals[-LEGACY_ROWS:]
+                vitals = vitals[:len(vitals) - len(legacy)]
+                s.run("""
+                    UNWIND $rows AS row
+                    MATCH (p:Patient {device_id: $d})
+                    CREATE (p)-[:HAD_READING]->(:VitalReading {
+                        uuid: row.uuid, device_id: $d, hr: row.hr, spo2: row.spo2,
+                        posture_label: 'Sitting', condition: 'routine_observation',
+                        timestamp_utc: row.ts, valid_at: datetime(row.ts)})
+                """, rows=vitals, d=DEVICE).consume()
+                s.run("""
+                    UNWIND $rows AS row
+                    MATCH (p:Patient {device_id: $d})
+                    CREATE (p)-[:HAD_READING]->(:VitalReading {
+                        uuid: row.uuid, hr: row.hr, spo2: row.spo2,
+                        posture_label: 'Legacy', condition: 'routine_observation',
+                        timestamp_utc: row.ts})
+                """, rows=legacy, d=DEVICE).consume()
+                s.run("""
+                    UNWIND $rows AS row
+                    CREATE (:Episodic {uuid: row.uuid, name: 'bench', group_id: $gid, content: row.content,
+                                       created_at: datetime(row.ts), valid_at: datetime(row.ts)})
+                """, rows=episodes, gid=GROUP).consume()
+                s.run("""
+                    UNWIND $rows AS row
+                    MATCH (p:Patient {device_id: $d})
+                    CREATE (p)-[:HAD_ALERT]->(:AlertEvent {
+                        uuid: row.uuid, device_id: $d, alert_type: 'abnormal_hr', severity: 'warning',
+                        message: 'bench alert', timestamp_utc: row.ts, valid_at: datetime(row.ts)})
+                """, rows=alerts, d=DEVICE).consume()
+                vitals, episodes, alerts = [], [], []
+                print(f"  seeded {i + 1:,}/{total:,} readings", end="\r")
+        s.run("""
+            MATCH (p:Patient {device_id: $d})
+            CREATE (p)-[:HAD_ALERT]->(:AlertEvent {
+                uuid: $uuid, alert_type: 'legacy_alert', severity: 'warning',
+                message: 'legacy alert', timestamp_utc: $ts})
+        """, d=DEVICE, uuid=str(uuid.uuid4()), ts=datetime.now(timezone.utc).isoformat()).consume()
+        print()
+
+
+def _pct(vals, p):
+    vals = sorted(vals)
+    return vals[min(int(len(vals) * p), len(vals) - 1)] if vals else 0
+
+
+async def _bench_async(runs: int, limit: int) -> dict:
+    from memory.patient_memory import PatientMemory
+    mem = PatientMemory(DEVICE)
+    old, new = [], []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        async with async_session() as s:
+            r = await s.run(OLD_QUERY, gid=GROUP, dev_id=DEVICE, lim=limit)
+            old_rows = [rec async for rec in r]
+        old.append((time.perf_counter() - t0) * 1000)
+
+        t0 = time.perf_counter()
+        ctx = await mem._tier2_context(limit)
+        new.append((time.perf_counter() - t0) * 1000)
+
+    print(f"  old returned {len(old_rows)} rows, new returned "
+          f"{ctx.count(chr(10) + chr(10)) + 1 if ctx else 0} records")
+    old_legacy = sum("Legacy" in r["content"] or "legacy_alert" in r["content"] for r in old_rows)
+    new_legacy = ctx.count("Legacy") + ctx.count("legacy_alert")
+    mark = "✅" if new_legacy == old_legacy else "❌"
+    print(f"  {mark} legacy-shaped records — old {old_legacy}, new {new_legacy}")
+    return {"old UNION ALL": old, "top-k merge": new}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Tier-2 memory context retrieval")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--every", type=int, default=1, help="Minutes between synthetic readings")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=15)
+    parser.add_argument("--cleanup", action="store_true", help="Delete the synthetic patient and exit")
+    args = parser.parse_args()
+
+    try:
+        if args.cleanup:
+            with sync_session() as s:
+                s.run("""
+                    MATCH (:Patient {device_id: $d})-[:HAD_READING|HAD_ALERT]->(n)
+                    CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS
+                """, d=DEVICE).consume()
+                s.run("""
+                    MATCH (n) WHERE n.device_id = $d OR n.group_id = $gid
+                    CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS
+                """, d=DEVICE, gid=GROUP).consume()
+            print(f"Deleted synthetic data of {DEVICE}")
+            return
+
+        ensure_schema()
+        print("=" * 60)
+        print(f"  TIER-2 CONTEXT BENCH — {args.days} days, 1 reading / {args.every} min")
+        print("=" * 60)
+        seed(args.days, args.every)
+        print(f"  migrate_layer1_keys: {migrate_layer1_keys(device_id=DEVICE)} legacy nodes updated")
+        with sync_session() as s:
+            s.run("CALL db.awaitIndexes(300)").consume()
+
+        results = asyncio.run(_bench_async(args.runs, args.limit))
+        print(f"\n{'Variant':16s} {'p50 ms':>8s} {'p95 ms':>8s} {'max ms':>8s}")
+        print("-" * 44)
+        for name, ms in results.items():
+            print(f"{name:16s} {_pct(ms, .5):8.1f} {_pct(ms, .95):8.1f} {max(ms):8.1f}")
+    finally:
+        close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Time-of-Day Query Benchmark
+===========================
+
+Compares the old time-of-day filter (valid_at.hour * 60 + valid_at.minute,
+computed for every episode of the patient) with the indexed
+(group_id, [local_date,] minute_of_day) lookup used by
+PatientMemory.get_episodes_by_time_range, on a year of synthetic episodes.
+
+Reports latency (p50 / p95) and database hits (PROFILE) per variant, for
+windows inside the day, windows that wrap midnight and single-date lookups.
+
+Needs a running Neo4j (NEO4J_URI / NEO4J_USER / NEO4J_PASSWORD). The
+synthetic patient lives in group_id 'patient_BENCH_TOD' and is removed with
+--cleanup.
+
+Usage:
+    python evaluation/time_of_day_bench.py                  # seed (if needed) + run
+    python evaluation/time_of_day_bench.py --days 365 --every 10 --queries 50
+    python evaluation/time_of_day_bench.py --cleanup
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory.neo4j_pool import sync_session, close_all
+from memory.neo4j_schema import ensure_schema
+
+GROUP = "patient_BENCH_TOD"
+POSTURES = ["Sitting", "Standing", "Lying Down", "Walking"]
+AREAS = ["Bedroom", "Living Room", "Dining Table", "Bathroom"]
+
+OLD_QUERY = """
+MATCH (e:Episodic)
+WHERE e.group_id = $gid
+  AND (e.valid_at.hour * 60 + e.valid_at.minute) >= $lo
+  AND (e.valid_at.hour * 60 + e.valid_at.minute) <= $hi
+  {date_filter}
+RETURN toString(e.valid_at) AS ts_str, e.content AS content
+ORDER BY e.valid_at ASC
+LIMIT $lim
+"""
+
+
+def _new_query(ranges: list) -> tuple:
+    """Same construction as get_episodes_by_time_range."""
+    params, branches = {}, []
+    for i, (day, lo, hi) in enumerate(ranges):
+        params[f"lo{i}"], params[f"hi{i}"] = lo, hi
+        day_filter = ""
+        if day:
+            params[f"d{i}"] = day
+            day_filter = f"AND e.local_date = $d{i}"
+        branches.append(f"MATCH (e:Episodic) WHERE e.group_id = $gid {day_filter} "
+                        f"AND e.minute_of_day >= $lo{i} AND e.minute_of_day <= $hi{i} RETURN e")
+    cypher = f"""
+        CALL {{ {" UNION ".join(branches)} }}
+        RETURN toString(e.valid_at) AS ts_str, e.content AS content
+        ORDER BY e.valid_at ASC
+        LIMIT $lim
+    """
+    return cypher, params
+
+
+def seed(days: int, every_min: int) -> int:
+    with sync_session() as s:
+        existing = s.run("MATCH (e:Episodic {group_id: $gid}) RETURN count(e) AS n", gid=GROUP).single()["n"]
+        if existing:
+            print(f"  Using {existing:,} existing synthetic episodes")
+            return existing
+
+        start = datetime.now().replace(second=0, microsecond=0) - timedelta(days=days)
+        total = days * 24 * 60 // every_min
+        rows = []
+        for i in range(total):
+            ts = start + timedelta(minutes=i * every_min)
+            rows.append({
+                "uuid": str(uuid.uuid4()),
+                "name": f"bench_{i}",
+                "content": f"Location: {AREAS[i % 4]}. Activity/Posture: {POSTURES[(i // 7) % 4]}. "
+                           f"Heart Rate: {60 + i % 40} bpm.",
+                "valid_at": ts.isoformat(),
+                "minute_of_day": ts.hour * 60 + ts.minute,
+                "local_date": ts.strftime("%Y-%m-%d"),
+            })
+            if len(rows) == 5000 or i == total - 1:
+                s.run(
+                    """
+                    UNWIND $rows AS row
+                    CREATE (e:Episodic {uuid: row.uuid, name: row.name, content: row.content,
+                                        group_id: $gid, created_at: localdatetime(row.valid_at),
+                                        valid_at: localdatetime(row.valid_at),
+                                        minute_of_day: row.minute_of_day, local_date: row.local_date})
+                    """,
+                    rows=rows, gid=GROUP,
+                ).consume()
+                rows = []
+                print(f"  seeded {i + 1:,}/{total:,}", end="\r")
+        print()
+        return total
+
+
+def _run(s, cypher: str, params: dict) -> tuple:
+    t0 = time.perf_counter()
+    n = len(list(s.run(cypher, **params)))
+    ms = (time.perf_counter() - t0) * 1000
+    profile = s.run("PROFILE " + cypher, **params).consume().profile
+    return ms, n, _db_hits(profile)
+
+
+def _db_hits(plan) -> int:
+    if not plan:
+        return 0
+    return plan.get("dbHits", 0) + sum(_db_hits(c) for c in plan.get("children", []))
+
+
+def _pct(vals, p):
+    vals = sorted(vals)
+    return vals[min(int(len(vals) * p), len(vals) - 1)] if vals else 0
+
+
+def bench(n_queries: int, window: int, days: int) -> None:
+    from memory.patient_memory import _minute_ranges
+
+    rng = random.Random(7)
+    scenarios = {
+        "in-day":       lambda: (rng.randint(window, 1439 - window), None),
+        "wraps 00:00":  lambda: (rng.choice([rng.randint(0, window - 1), rng.randint(1440 - window, 1439)]), None),
+        "single date":  lambda: (rng.randint(0, 1439),
+                                 (datetime.now() - timedelta(days=rng.randint(1, days - 1))).strftime("%Y-%m-%d")),
+    }
+
+    print(f"\n{'Scenario':14s} {'Variant':8s} {'p50 ms':>8s} {'p95 ms':>8s} {'db hits':>10s} {'rows':>6s}")
+    print("-" * 60)
+    with sync_session() as s:
+        for name, make in scenarios.items():
+            res = {"old": [], "new": []}
+            for _ in range(n_queries):
+                center, day = make()
+                ranges = _minute_ranges(center, window, day)
+
+                # Old query could only clamp to 0..1439 — one range, no wrap
+                lo, hi = max(center - window, 0), min(center + window, 1439)
+                date_filter = ""
+                old_params = {"gid": GROUP, "lo": lo, "hi": hi, "lim": 30}
+                if day:
+                    d = datetime.strptime(day, "%Y-%m-%d")
+                    date_filter = "AND e.valid_at.year = $yr AND e.valid_at.month = $mo AND e.valid_at.day = $dy"
+                    old_params.update(yr=d.year, mo=d.month, dy=d.day)
+                res["old"].append(_run(s, OLD_QUERY.format(date_filter=date_filter), old_params))
+
+                cypher, params = _new_query(ranges)
+                res["new"].append(_run(s, cypher, {"gid": GROUP, "lim": 30, **params}))
+
+            for variant, rows in res.items():
+                ms = [r[0] for r in rows]
+                print(f"{name:14s} {variant:8s} {_pct(ms, .5):8.1f} {_pct(ms, .95):8.1f} "
+                      f"{int(sum(r[2] for r in rows) / len(rows)):10,d} {int(sum(r[1] for r in rows) / len(rows)):6d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark time-of-day episode queries")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--every", type=int, default=10, help="Minutes between synthetic episodes")
+    parser.add_argument("--queries", type=int, default=30, help="Queries per scenario")
+    parser.add_argument("--window", type=int, default=45, help="± minutes around the center time")
+    parser.add_argument("--cleanup", action="store_true", help="Delete the synthetic patient and exit")
+    args = parser.parse_args()
+
+    try:
+        if args.cleanup:
+            with sync_session() as s:
+                s.run("""
+                    MATCH (e:Episodic {group_id: $gid})
+                    CALL { WITH e DETACH DELETE e } IN TRANSACTIONS OF 10000 ROWS
+                """, gid=GROUP).consume()
+            print(f"Deleted synthetic episodes of {GROUP}")
+            return
+
+        ensure_schema()
+        print("=" * 60)
+        print(f"  TIME-OF-DAY QUERY BENCH — {args.days} days, 1 episode / {args.every} min")
+        print("=" * 60)
+        seed(args.days, args.every)
+        with sync_session() as s:
+            s.run("CALL db.awaitIndexes(300)").consume()
+        bench(args.queries, args.window, args.days)
+    finally:
+        close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Ward Load Benchmark — in-process memory backend
+===============================================
+
+Drives the memory pipeline at ward scale without Neo4j / Ollama
+(MEMORY_BACKEND=inprocess, memory/inprocess_backend.py): every patient
+streams synthetic readings through IncidentTracker + store_sensor_snapshot
+(the same path as PatientState.add_data), then the agent / report reads are
+timed per patient.
+
+- ingest : snapshots / s over all patients, Graphiti-equivalent episodes,
+           facts extracted
+- reads  : p50 / p95 ms of get_patient_context, get_insight_contexts,
+           get_activity_summary, get_episodes_by_time_range
+
+Usage:
+    python evaluation/ward_load_bench.py                          # 40 patients, 24 h, 1 reading / min
+    python evaluation/ward_load_bench.py --patients 200 --hours 72 --every-sec 30
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+os.environ["MEMORY_BACKEND"] = "inprocess"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory.incidents import INCIDENTS, IncidentTracker, critical_kinds
+from memory.inprocess_backend import STORE
+from memory.patient_memory import PatientMemory
+
+INSIGHT_QUERIES = {
+    "vitals":   "How have the patient's heart rate and SpO2 been?",
+    "activity": "What activities and postures has the patient had?",
+    "risks":    "Were there falls or critical events?",
+    "recommendations": "What care recommendations apply?",
+}
+
+
+def reading(rng: random.Random, ts: datetime) -> dict:
+    roll = rng.random()
+    if roll < 0.002:
+        hr, spo2, posture = rng.randint(90, 130), rng.randint(88, 96), 5          # fall
+    elif roll < 0.01:
+        hr, spo2, posture = rng.randint(70, 100), rng.randint(82, 89), 3          # hypoxia
+    else:
+        hr, spo2, posture = rng.randint(58, 98), rng.randint(94, 99), rng.choice([1, 2, 3, 7, 8])
+    return {"HR": hr, "Blood_oxygen": spo2, "Posture_state": posture, "Area": rng.choice([3, 4, 5, 6, 7]),
+            "Step": rng.randint(0, 8000), "Calories_burned": rng.randint(0, 1500), "timestamp": ts}
+
+
+async def stream_patient(device: str, start: datetime, n: int, every_sec: int) -> int:
+    """
+    Every normal reading is a snapshot (worst case — the app debounces transitions);
+    critical readings follow the IncidentTracker decisions, as in add_data.
+    """
+    rng = random.Random(device)
+    mem = PatientMemory(device)
+    tracker = IncidentTracker(device)
+    stored = 0
+    for i in range(n):
+        data = reading(rng, start + timedelta(seconds=every_sec * i))
+        hr, spo2, posture = data["HR"], data["Blood_oxygen"], data["Posture_state"]
+        decisions = [d for d in tracker.observe(hr, spo2, posture, data["timestamp"]) if d["write"]] \
+            if INCIDENTS else []
+        for decision in decisions:
+            await mem.store_sensor_snapshot(data, incident=decision)
+            stored += 1
+        if not decisions and not (INCIDENTS and critical_kinds(hr, spo2, posture)):
+            await mem.store_sensor_snapshot(data)
+            stored += 1
+        if i % 200 == 0:
+            await asyncio.sleep(0)      # let the other patients interleave
+    return stored
+
+
+def _pct(vals, p):
+    vals = sorted(vals)
+    return vals[min(int(len(vals) * p), len(vals) - 1)] if vals else 0
+
+
+async def time_reads(devices: list, hours: int) -> dict:
+    timings = {k: [] for k in ("context", "insights", "activity_summary", "time_range")}
+    for device in devices:
+        mem = PatientMemory(device)
+        for key, call in (
+            ("context",          lambda: mem.get_patient_context("Did the patient fall?", limit=10)),
+            ("insights",         lambda: mem.get_insight_contexts(INSIGHT_QUERIES, hours=hours)),
+            ("activity_summary", lambda: mem.get_activity_summary(hours)),
+            ("time_range",       lambda: mem.get_episodes_by_time_range(8, 0, 45)),
+        ):
+            t0 = time.perf_counter()
+            await call()
+            timings[key].append((time.perf_counter() - t0) * 1000)
+    return timings
+
+
+async def main_async(args) -> None:
+    devices = [f"WARD_{i:03d}" for i in range(args.patients)]
+    n = args.hours * 3600 // args.every_sec
+    start = datetime.now() - timedelta(hours=args.hours)
+
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+        total = sum(await asyncio.gather(*(stream_patient(d, start, n, args.every_sec) for d in devices)))
+        elapsed = time.perf_counter() - t0
+        timings = await time_reads(devices, args.hours)
+    st = STORE.stats()
+    print(f"\nIngest: {total:,} snapshots in {elapsed:.1f}s → {total / elapsed:,.0f} snapshots/s")
+    print(f"  episodes {sum(p['episodes'] for p in st.values()):,}  "
+          f"facts {sum(p['facts'] for p in st.values()):,}  "
+          f"alerts {sum(p['alerts'] for p in st.values()):,}  "
+          f"incidents {sum(p['incidents'] for p in st.values()):,}")
+
+    print(f"\n{'Read':18s} {'p50 ms':>8s} {'p95 ms':>8s}")
+    print("-" * 36)
+    for key, ms in timings.items():
+        print(f"{key:18s} {_pct(ms, .5):8.2f} {_pct(ms, .95):8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ward-scale load test on the in-process memory backend")
+    parser.add_argument("--patients", type=int, default=40)
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--every-sec", type=int, default=60)
+    parser.add_argument("--verbose", action="store_true", help="Keep the per-snapshot memory logs")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"  WARD LOAD BENCH — {args.patients} patients, {args.hours} h, "
+          f"1 reading / {args.every_sec}s (in-process backend)")
+    print("=" * 60)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
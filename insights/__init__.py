@@ -17,6 +17,7 @@ except Exception:
 
 # Always available - no heavy dependencies
 from insights.lite_report_agent import generate_lite_narrative
+from insights.insight_cache import InsightCardStore, InsightRefresher
 
 __all__ = [
     'get_aisuite_llm',
@@ -24,5 +25,7 @@ __all__ = [
     'get_report_crew',
     'ReportNarrativeCrew',
     'generate_lite_narrative',
+    'InsightCardStore',
+    'InsightRefresher',
     'CREWAI_AVAILABLE',
 ]
@@ -0,0 +1,212 @@
+"""
+Precomputed Insight Cards for UTLMediCore
+=========================================
+The insights panel used to run the full memory retrieval + LLM pipeline on
+every open. Cards are now generated in the background per (patient, period)
+and served from this store.
+
+- every entry keeps `generated_at` and the data `watermark` it was built
+  from (reading_count + last reading timestamp of the patient)
+- an entry is stale when the patient has produced INSIGHT_STALE_READINGS new
+  readings since, or when it is older than INSIGHT_MAX_AGE_SEC
+- InsightRefresher runs one worker thread: explicit refresh requests are
+  served first, and every INSIGHT_REFRESH_SEC it sweeps all active patients
+  and regenerates the stale periods
+- entries are persisted to INSIGHT_CACHE_PATH so a restart still serves cards
+
+Usage:
+    store = InsightCardStore()
+    refresher = InsightRefresher(store, generate_fn, patients_fn, watermark_fn)
+    refresher.start()
+    refresher.enqueue("DEVICE_1", 24, "Today")      # non-blocking
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+INSIGHT_REFRESH_SEC    = int(os.getenv("INSIGHT_REFRESH_SEC", "300"))
+INSIGHT_MAX_AGE_SEC    = int(os.getenv("INSIGHT_MAX_AGE_SEC", "1800"))
+INSIGHT_STALE_READINGS = int(os.getenv("INSIGHT_STALE_READINGS", "150"))   # ~5 min at 2s/read
+INSIGHT_CACHE_PATH     = os.getenv("INSIGHT_CACHE_PATH", os.path.join("reports", "insight_cards.json"))
+
+# Periods shown by the insights panel: (hours, label)
+INSIGHT_PERIODS = [(24, "Today"), (48, "Yesterday"), (168, "This Week")]
+
+
+def _key(device_id: str, hours: int, model: str = "") -> str:
+    return f"{device_id}|{int(hours)}|{model or ''}"
+
+
+class InsightCardStore:
+    """Thread-safe (patient, period, model) -> cards store with JSON persistence."""
+
+    def __init__(self, path: str = INSIGHT_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+            print(f"[InsightCache] Loaded {len(self._entries)} precomputed card sets")
+        except Exception as e:
+            print(f"[InsightCache] ⚠️ Could not load {self.path}: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False, default=str)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"[InsightCache] ⚠️ Could not persist cards: {e}")
+
+    def get(self, device_id: str, hours: int, model: str = ""):
+        with self._lock:
+            entry = self._entries.get(_key(device_id, hours, model))
+            return dict(entry) if entry else None
+
+    def put(self, device_id: str, hours: int, period: str, payload: dict,
+            watermark: dict, model: str = "", duration_s: float = None):
+        entry = {
+            "device_id":    device_id,
+            "hours":        int(hours),
+            "period":       period,
+            "model":        model or "",
+            "payload":      payload,
+            "watermark":    watermark,
+            "generated_at": time.time(),
+            "duration_s":   round(duration_s, 2) if duration_s is not None else None,
+        }
+        with self._lock:
+            self._entries[_key(device_id, hours, model)] = entry
+            self._save()
+        return entry
+
+    def keys(self) -> list:
+        with self._lock:
+            return list(self._entries.keys())
+
+
+def staleness(entry: dict, current_watermark: dict, now: float = None) -> dict:
+    """How far an entry lags behind the patient's current data."""
+    now = now if now is not None else time.time()
+    age = now - entry.get("generated_at", 0)
+    built = entry.get("watermark") or {}
+    new_readings = None
+    if current_watermark and built.get("reading_count") is not None:
+        new_readings = max(current_watermark.get("reading_count", 0) - built["reading_count"], 0)
+        # reading_count restarts at 0 with the app — a lower value means new data
+        if current_watermark.get("reading_count", 0) < built["reading_count"]:
+            new_readings = current_watermark.get("reading_count", 0)
+    stale = age > INSIGHT_MAX_AGE_SEC or (new_readings is not None and new_readings >= INSIGHT_STALE_READINGS)
+    return {
+        "generated_at": datetime.fromtimestamp(entry.get("generated_at", 0)).isoformat(timespec="seconds"),
+        "age_seconds":  int(age),
+        "new_readings": new_readings,
+        "stale":        stale,
+    }
+
+
+class InsightRefresher:
+    """Single background worker that regenerates insight cards."""
+
+    def __init__(self, store: InsightCardStore, generate_fn, patients_fn, watermark_fn):
+        """
+        Args:
+            store        : InsightCardStore
+            generate_fn  : (device_id, hours, period, model) -> payload dict
+            patients_fn  : () -> iterable of active device_ids
+            watermark_fn : (device_id) -> watermark dict (reading_count, last_reading)
+        """
+        self.store = store
+        self.generate_fn = generate_fn
+        self.patients_fn = patients_fn
+        self.watermark_fn = watermark_fn
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._thread = None
+        self.stats = {"generated": 0, "failed": 0, "last_sweep": None}
+
+    def enqueue(self, device_id: str, hours: int, period: str, model: str = "") -> bool:
+        """Queue one regeneration. Returns False if the same job is already pending."""
+        key = _key(device_id, hours, model)
+        with self._pending_lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+        self._queue.put((device_id, int(hours), period, model or ""))
+        return True
+
+    def is_pending(self, device_id: str, hours: int, model: str = "") -> bool:
+        with self._pending_lock:
+            return _key(device_id, hours, model) in self._pending
+
+    def generate_now(self, device_id: str, hours: int, period: str, model: str = "") -> dict:
+        """Generate synchronously and store the result (used on a cold cache miss)."""
+        watermark = self.watermark_fn(device_id)
+        t0 = time.time()
+        payload = self.generate_fn(device_id, hours, period, model)
+        return self.store.put(device_id, hours, period, payload, watermark, model, time.time() - t0)
+
+    def _run_job(self, device_id, hours, period, model):
+        key = _key(device_id, hours, model)
+        try:
+            self.generate_now(device_id, hours, period, model)
+            self.stats["generated"] += 1
+            print(f"[InsightCache] ✅ {device_id} {period} regenerated")
+        except Exception as e:
+            self.stats["failed"] += 1
+            print(f"[InsightCache] ❌ {device_id} {period} failed: {e}")
+        finally:
+            with self._pending_lock:
+                self._pending.discard(key)
+
+    def _sweep(self):
+        """Queue every stale (patient, period) pair for the default model."""
+        self.stats["last_sweep"] = datetime.now().isoformat(timespec="seconds")
+        for device_id in list(self.patients_fn()):
+            watermark = self.watermark_fn(device_id)
+            for hours, period in INSIGHT_PERIODS:
+                entry = self.store.get(device_id, hours)
+                if entry is None or staleness(entry, watermark)["stale"]:
+                    self.enqueue(device_id, hours, period)
+
+    def _loop(self):
+        print(f"[InsightCache] Background refresher started (sweep every {INSIGHT_REFRESH_SEC}s)")
+        next_sweep = time.time()
+        while True:
+            if time.time() >= next_sweep:
+                try:
+                    self._sweep()
+                except Exception as e:
+                    print(f"[InsightCache] sweep failed: {e}")
+                next_sweep = time.time() + INSIGHT_REFRESH_SEC
+            try:
+                job = self._queue.get(timeout=max(next_sweep - time.time(), 0.1))
+            except queue.Empty:
+                continue
+            self._run_job(*job)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def status(self) -> dict:
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {**self.stats, "pending": pending, "cached": len(self.store.keys())}
@@ -3,10 +3,17 @@ Lite Agentic Report Generator - PRO VERSION
 Forced Correlation & Clinical Insights Engine
 """
 
-import json
+import os
+import sys
 from textwrap import dedent
 
-def generate_lite_narrative(patient_id, vital_signs, activities, locations, nutrition, alerts, risk_score, graphiti_summary, time_range_hours, model_caller, manual_context=None):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.context_builder import ContextBuilder, compact_json
+
+# Reports prefer the cloud models (see model_caller in the backend)
+REPORT_MODEL = os.getenv('REPORT_MODEL', 'ollamacloud:kimi-k2-thinking')
+
+def generate_lite_narrative(patient_id, vital_signs, activities, locations, nutrition, alerts, risk_score, graphiti_summary, time_range_hours, model_caller, manual_context=None, model=None):
     """
     Advanced Multi-Step Analysis:
     1. Correlation Analyst: Finds "WHY" things happen.
@@ -17,8 +24,6 @@ def generate_lite_narrative(patient_id, vital_signs, activities, locations, nutr
     manual_logs_text = "No manual logs recorded."
     has_manual = False
     if manual_context:
-        import sys, os
-        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
         from utils.tz_utils import utc_to_utc8
         lines = []
         for entry in manual_context:
@@ -31,23 +36,26 @@ def generate_lite_narrative(patient_id, vital_signs, activities, locations, nutr
         manual_logs_text = "\n".join(lines)
         has_manual = True
     
-    # Context Construction
-    raw_data = dedent(f'''
-        PATIENT ID: {patient_id}
-        MONITORING DURATION: {time_range_hours} hours
-        
-        VITALS: {json.dumps(vital_signs, indent=2)}
-        PHYSICAL ACTIVITIES: {json.dumps(activities, indent=2)}
-        LOCATION LOGS: {json.dumps(locations, indent=2)}
-        NUTRITION: {json.dumps(nutrition, indent=2)}
-        SYSTEM ALERTS: {json.dumps(alerts, indent=2)}
-        
-        GRAPH MEMORY (Contextual Trends):
-        {graphiti_summary}
-        
-        MANUAL PATIENT LOGS (Meals, Activities, Medical Records):
-        {manual_logs_text}
-    ''').strip()
+    # Context Construction — stats as compact JSON, free text fitted to a token budget
+    stats_text = (
+        f"VITALS: {compact_json(vital_signs)}\n"
+        f"PHYSICAL ACTIVITIES: {compact_json(activities)}\n"
+        f"LOCATION LOGS: {compact_json(locations)}\n"
+        f"NUTRITION: {compact_json(nutrition)}\n"
+        f"SYSTEM ALERTS: {compact_json(alerts)}"
+    )
+    budget = ContextBuilder(model or REPORT_MODEL, fixed_text=stats_text)
+    budget.add('graph', graphiti_summary or '', weight=1)
+    budget.add('manual', manual_logs_text, weight=2, dedupe=True)
+    fitted = budget.build()
+
+    raw_data = (
+        f"PATIENT ID: {patient_id}\n"
+        f"MONITORING DURATION: {time_range_hours} hours\n\n"
+        f"{stats_text}\n\n"
+        f"GRAPH MEMORY (Contextual Trends):\n{fitted['graph']}\n\n"
+        f"MANUAL PATIENT LOGS (Meals, Activities, Medical Records):\n{fitted['manual']}"
+    )
 
     # Build manual-specific analysis instructions
     manual_analysis_instruction = ""
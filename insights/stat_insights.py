@@ -0,0 +1,283 @@
+"""
+Deterministic Insight Engine for UTLMediCore
+============================================
+Builds the four insight cards (risk profile, vitals pattern, location habits,
+recommendations) from statistics only — no LLM call, runs in milliseconds.
+
+Inputs:
+- rolling vitals   : PatientState.history (HR, Blood_oxygen, Posture_state, Area, timestamp)
+- activity stats   : PatientMemory.get_activity_stats() — minutes per posture / area
+- alert history    : ACTIVE_ALERTS entries for the patient
+- manual context   : PatientMemory.get_manual_episodes_sync()
+
+Every card cites the numbers it was derived from in `reasoning`.
+`flags` lists the non-trivial findings; the insights route only spends an LLM
+call when this list is not empty (see INSIGHT_LLM_MODE).
+
+Usage:
+    result = build_stat_insights(history, activity=stats, alerts=alerts, manual=notes,
+                                 period="Today", hours=24)
+    result["insights"]   # 4 cards
+    result["flags"]      # e.g. ["hypoxia", "critical_alerts"]
+"""
+
+import statistics
+from datetime import datetime, timedelta
+
+DEFAULT_POSTURE_MAP = {
+    0: "Unknown", 1: "Sitting", 2: "Standing", 3: "Lying Down",
+    4: "Lying on Right Side", 5: "Falling", 6: "Prone",
+    7: "Lying on Left Side", 8: "Walking", 10: "Unstable Temp",
+    11: "Upright Torso"
+}
+DEFAULT_AREA_MAP = {
+    1: "Unknown Area", 2: "Laboratory", 3: "Corridor",
+    4: "Dining Table", 5: "Living Room", 6: "Bathroom",
+    7: "Bedroom", 8: "Laboratory"
+}
+
+LYING_POSTURES = {"Lying Down", "Lying on Right Side", "Lying on Left Side", "Prone"}
+
+# Rule thresholds
+OUT_OF_RANGE_CAUTION = 0.10     # >10% of readings outside the normal band
+HR_DRIFT_BPM         = 10       # mean HR change between first and second half of the window
+HR_SPIKE_Z           = 2.5      # latest HR vs rolling mean
+BATHROOM_MIN_CAUTION = 60       # minutes in the bathroom within the period
+LYING_SHARE_CAUTION  = 0.80     # share of monitored time spent lying
+
+_SEV_ORDER = ["normal", "caution", "critical"]
+
+
+def _worst(*severities) -> str:
+    return max(severities, key=_SEV_ORDER.index) if severities else "normal"
+
+
+def _fmt_ts(ts) -> str:
+    if isinstance(ts, datetime):
+        return ts.strftime("%Y-%m-%dT%H:%M")
+    return str(ts or "")[:16]
+
+
+def _parse_ts(ts):
+    if isinstance(ts, datetime):
+        return ts
+    try:
+        return datetime.fromisoformat(str(ts).replace("Z", "").split("+")[0])
+    except Exception:
+        return None
+
+
+def _fmt_minutes(mins: float) -> str:
+    h, m = divmod(int(mins), 60)
+    return f"{h}h {m}min" if h else f"{int(mins)} min"
+
+
+def vitals_stats(history: list, hr_low: int = 45, hr_high: int = 110, spo2_min: int = 90) -> dict:
+    """HR / SpO2 statistics over the rolling window. Zero readings (sensor off) are ignored."""
+    rows = list(history or [])
+    hr_pts = [(r.get("timestamp"), int(r.get("HR", 0) or 0)) for r in rows]
+    hr_pts = [(t, v) for t, v in hr_pts if v > 0]
+    spo2_pts = [(r.get("timestamp"), int(r.get("Blood_oxygen", 0) or 0)) for r in rows]
+    spo2_pts = [(t, v) for t, v in spo2_pts if v > 0]
+
+    out = {"readings": len(rows), "hr": None, "spo2": None}
+    if hr_pts:
+        vals = [v for _, v in hr_pts]
+        half = len(vals) // 2
+        out["hr"] = {
+            "n":        len(vals),
+            "mean":     statistics.fmean(vals),
+            "std":      statistics.pstdev(vals) if len(vals) > 1 else 0.0,
+            "min":      min(hr_pts, key=lambda p: p[1]),
+            "max":      max(hr_pts, key=lambda p: p[1]),
+            "latest":   hr_pts[-1],
+            "low_n":    sum(v < hr_low for v in vals),
+            "high_n":   sum(v > hr_high for v in vals),
+            "drift":    statistics.fmean(vals[half:]) - statistics.fmean(vals[:half]) if half >= 3 else 0.0,
+        }
+    if spo2_pts:
+        vals = [v for _, v in spo2_pts]
+        out["spo2"] = {
+            "n":      len(vals),
+            "mean":   statistics.fmean(vals),
+            "min":    min(spo2_pts, key=lambda p: p[1]),
+            "latest": spo2_pts[-1],
+            "low_n":  sum(v < spo2_min for v in vals),
+        }
+    return out
+
+
+def build_stat_insights(history: list, activity: dict = None, alerts: list = None, manual: list = None,
+                        period: str = "Today", hours: int = 24,
+                        hr_low: int = 45, hr_high: int = 110, spo2_min: int = 90,
+                        posture_map: dict = None, area_map: dict = None) -> dict:
+    """
+    Build the four insight cards deterministically.
+
+    Returns:
+        {"insights": [4 cards], "flags": [str], "stats": {...}}
+    """
+    posture_map = posture_map or DEFAULT_POSTURE_MAP
+    area_map = area_map or DEFAULT_AREA_MAP
+    activity = activity or {}
+    rows = list(history or [])
+    flags = []
+
+    since = datetime.now() - timedelta(hours=hours)
+    window_alerts = [a for a in (alerts or []) if (_parse_ts(a.get("timestamp")) or datetime.now()) >= since]
+    falls = [r for r in rows if int(r.get("Posture_state", 0) or 0) == 5]
+    vs = vitals_stats(rows, hr_low, hr_high, spo2_min)
+    hr, spo2 = vs["hr"], vs["spo2"]
+
+    # ── 1. Risk profile: alerts + falls + hypoxia ─────────────────────────
+    crit = [a for a in window_alerts if str(a.get("severity", "")).upper() == "CRITICAL"]
+    warn = [a for a in window_alerts if str(a.get("severity", "")).upper() == "WARNING"]
+    risk_sev = "normal"
+    risk_why = [f"{len(window_alerts)} alerts in the last {hours}h ({len(crit)} critical, {len(warn)} warning)."]
+    if falls:
+        risk_sev = "critical"
+        flags.append("fall_detected")
+        risk_why.append(f"Fall posture recorded at {_fmt_ts(falls[-1].get('timestamp'))}.")
+    if crit:
+        risk_sev = "critical"
+        flags.append("critical_alerts")
+        last = crit[-1]
+        risk_why.append(f"Latest critical alert [{_fmt_ts(last.get('timestamp'))}]: {str(last.get('message', ''))[:80]}")
+    elif warn:
+        risk_sev = _worst(risk_sev, "caution")
+        flags.append("warning_alerts")
+        last = warn[-1]
+        risk_why.append(f"Latest warning [{_fmt_ts(last.get('timestamp'))}]: {str(last.get('message', ''))[:80]}")
+    if risk_sev == "normal":
+        risk_summary = f"No falls or critical events in the {period.lower()} window. Risk is low."
+    elif risk_sev == "critical":
+        risk_summary = "Critical events occurred in this period. Review the alert timeline and check on the patient."
+    else:
+        risk_summary = "Warning-level events occurred in this period. Keep monitoring closely."
+    risk_card = {"title": "Risk Profile", "summary": risk_summary, "severity": risk_sev,
+                 "reasoning": " ".join(risk_why)}
+
+    # ── 2. Vitals pattern: range, out-of-band share, drift, spike ─────────
+    vit_sev = "normal"
+    vit_why = []
+    if hr:
+        vit_why.append(
+            f"HR mean {hr['mean']:.0f} bpm (sd {hr['std']:.1f}) over {hr['n']} readings, "
+            f"min {hr['min'][1]} at {_fmt_ts(hr['min'][0])}, max {hr['max'][1]} at {_fmt_ts(hr['max'][0])}."
+        )
+        out_share = (hr["low_n"] + hr["high_n"]) / hr["n"]
+        if out_share > OUT_OF_RANGE_CAUTION:
+            vit_sev = "caution"
+            flags.append("hr_out_of_range")
+            vit_why.append(f"{out_share:.0%} of HR readings outside {hr_low}-{hr_high} bpm.")
+        if abs(hr["drift"]) >= HR_DRIFT_BPM:
+            vit_sev = _worst(vit_sev, "caution")
+            flags.append("hr_drift")
+            vit_why.append(f"Mean HR shifted {hr['drift']:+.0f} bpm across the window.")
+        if hr["std"] > 0 and abs(hr["latest"][1] - hr["mean"]) / hr["std"] >= HR_SPIKE_Z and hr["n"] >= 10:
+            vit_sev = _worst(vit_sev, "caution")
+            flags.append("hr_spike")
+            vit_why.append(f"Latest HR {hr['latest'][1]} bpm is {abs(hr['latest'][1] - hr['mean']) / hr['std']:.1f} sd from the mean.")
+    if spo2:
+        vit_why.append(f"SpO2 mean {spo2['mean']:.0f}%, min {spo2['min'][1]}% at {_fmt_ts(spo2['min'][0])}.")
+        if spo2["latest"][1] < spo2_min:
+            vit_sev = "critical"
+            flags.append("hypoxia")
+            vit_why.append(f"Latest SpO2 {spo2['latest'][1]}% is below {spo2_min}%.")
+        elif spo2["low_n"]:
+            vit_sev = _worst(vit_sev, "caution")
+            flags.append("hypoxia_episodes")
+            vit_why.append(f"{spo2['low_n']} SpO2 readings below {spo2_min}%.")
+    if not vit_why:
+        vit_why.append("No valid HR/SpO2 readings in the rolling window (sensor off or not worn).")
+        vit_summary = "No valid vital readings available yet."
+    elif vit_sev == "normal":
+        vit_summary = f"Heart rate and SpO2 stayed within safe ranges (HR {hr_low}-{hr_high} bpm, SpO2 ≥{spo2_min}%)."
+    else:
+        vit_summary = "Vital signs deviated from the safe range. See the cited readings."
+    vitals_card = {"title": "Vitals Pattern", "summary": vit_summary, "severity": vit_sev,
+                   "reasoning": " ".join(vit_why)}
+
+    # ── 3. Location & activity: durations from memory, rolling counts as fallback ──
+    posture_min = dict(activity.get("posture_minutes") or {})
+    area_min = dict(activity.get("area_minutes") or {})
+    source = f"{activity.get('snapshots', 0)} stored snapshots"
+    if activity.get("duration_source") == "segments":
+        source = f"{activity['segments']} posture/area segments"
+    if not posture_min and rows:
+        # Rolling window only — each reading counts as one sample
+        source = f"{len(rows)} live readings (share of samples)"
+        for r in rows:
+            p = posture_map.get(int(r.get("Posture_state", 0) or 0), "Unknown")
+            a = area_map.get(int(r.get("Area", r.get("Lokasi", 0)) or 0), "Unknown")
+            posture_min[p] = posture_min.get(p, 0) + 1
+            area_min[a] = area_min.get(a, 0) + 1
+    loc_sev = "normal"
+    loc_why = []
+    as_minutes = bool(activity.get("posture_minutes"))
+    total = sum(posture_min.values()) or 1
+    if posture_min:
+        top_p = sorted(posture_min.items(), key=lambda x: -x[1])[:3]
+        loc_why.append("Posture: " + ", ".join(
+            f"{p} {_fmt_minutes(m) if as_minutes else f'{m / total:.0%}'}" for p, m in top_p) + ".")
+        lying = sum(m for p, m in posture_min.items() if p in LYING_POSTURES) / total
+        if lying >= LYING_SHARE_CAUTION and hours <= 24 and total >= 10:
+            loc_sev = "caution"
+            flags.append("low_mobility")
+            loc_why.append(f"{lying:.0%} of monitored time lying down.")
+    if area_min:
+        top_a = sorted(area_min.items(), key=lambda x: -x[1])[:3]
+        loc_why.append("Location: " + ", ".join(
+            f"{a} {_fmt_minutes(m) if as_minutes else f'{m / (sum(area_min.values()) or 1):.0%}'}" for a, m in top_a) + ".")
+        if as_minutes and area_min.get("Bathroom", 0) >= BATHROOM_MIN_CAUTION:
+            loc_sev = _worst(loc_sev, "caution")
+            flags.append("long_bathroom_stay")
+            loc_why.append(f"Bathroom total {_fmt_minutes(area_min['Bathroom'])} (≥{BATHROOM_MIN_CAUTION} min).")
+    if activity.get("steps_avg") is not None:
+        loc_why.append(f"Steps avg {int(activity['steps_avg']):,}, max {int(activity['steps_max']):,}.")
+    if posture_min:
+        main_p = max(posture_min, key=posture_min.get)
+        main_a = max(area_min, key=area_min.get) if area_min else "Unknown"
+        loc_summary = f"Mostly {main_p} in {main_a} during this period."
+    else:
+        loc_summary = "No posture or location data recorded for this period."
+    loc_why.append(f"Source: {source}.")
+    location_card = {"title": "Location & Activity", "summary": loc_summary, "severity": loc_sev,
+                     "reasoning": " ".join(loc_why)}
+
+    # ── 4. Recommendations: one action per flag + latest caregiver notes ──
+    actions = {
+        "fall_detected":      "Confirm the patient's condition after the recorded fall.",
+        "critical_alerts":    "Review critical alerts with the care team.",
+        "hypoxia":            "Assess oxygen saturation now.",
+        "hypoxia_episodes":   "Check sensor fit and breathing during low-SpO2 episodes.",
+        "hr_out_of_range":    "Review heart-rate readings outside the normal band.",
+        "hr_drift":           "Watch the heart-rate trend over the next hour.",
+        "hr_spike":           "Re-check heart rate; latest value is unusual for this patient.",
+        "low_mobility":       "Encourage repositioning or short walks.",
+        "long_bathroom_stay": "Check on long bathroom visits.",
+        "warning_alerts":     "Keep monitoring warning-level alerts.",
+    }
+    recs = [actions[f] for f in flags if f in actions]
+    rec_why = [f"Derived from findings: {', '.join(flags)}." if flags else "No findings require action."]
+    notes = [m for m in (manual or []) if m.get("content")]
+    if notes:
+        n = notes[0]
+        rec_why.append(f"Latest care note [{_fmt_ts(n.get('timestamp'))}] {n.get('name', '')}: {str(n['content'])[:80]}")
+    rec_summary = " ".join(recs[:2]) if recs else "Continue routine monitoring; no intervention indicated."
+    rec_card = {"title": "Care Recommendations", "summary": rec_summary,
+                "severity": _worst(risk_sev, vit_sev, loc_sev),
+                "reasoning": " ".join(rec_why)}
+
+    return {
+        "insights": [risk_card, vitals_card, location_card, rec_card],
+        "flags":    flags,
+        "stats": {
+            "alerts":   {"total": len(window_alerts), "critical": len(crit), "warning": len(warn)},
+            "falls":    len(falls),
+            "hr_mean":  round(hr["mean"], 1) if hr else None,
+            "spo2_mean": round(spo2["mean"], 1) if spo2 else None,
+            "readings": vs["readings"],
+            "snapshots": activity.get("snapshots", 0),
+        },
+    }
@@ -0,0 +1,418 @@
+"""
+Hourly Activity Rollups for UTLMediCore
+=======================================
+get_activity_summary(hours_back=720) used to stream every episode of the
+month into Python and recompute posture/area durations on every chatbot turn.
+This module keeps one (:ActivityRollup) node per patient per hour instead:
+
+    (:ActivityRollup {device_id, hour: "YYYY-MM-DDTHH:00", n, first_ts, last_ts,
+                      posture_json, area_json,            # minutes per label
+                      steps_sum, steps_n, steps_max, steps_delta,
+                      hr_n, hr_sum, hr_min, hr_max,
+                      spo2_n, spo2_sum, spo2_min, spo2_max,
+                      final, updated_at})
+
+- live     : store_sensor_snapshot feeds every snapshot to observe(); the open
+             hour stays in memory and is written when the next hour starts
+- compact  : a background job rebuilds settled hours from VitalReading nodes
+             (source of truth, survives restarts) and marks them final; hours
+             already final are not read again, hours without readings get an
+             empty final row. Legacy readings need valid_at / device_id
+             (neo4j_schema.migrate_layer1_keys — the app starts the compactor
+             after it)
+- backfill : readings written into past hours after the fact (reprocess_episodes
+             --vitals-from-mongo) call backfilled(), which clears `final` on
+             those hours and recompacts just that range
+- read     : summarize() sums at most `hours_back` rollup rows plus the open
+             in-memory hour — same dict shape as PatientMemory.get_activity_stats.
+             A window that starts before the first rollup hour returns {} so
+             the caller falls back to the episode scan
+
+Durations follow the episode-based summary: the time between two snapshots is
+credited to the posture/area of the earlier one (gaps > 10 h are ignored),
+split across hour boundaries.
+
+CLI (one-off backfill):
+    python -m memory.activity_rollup --hours 720
+    python -m memory.activity_rollup --device DCA632971FC3 --hours 168
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from memory.neo4j_pool import async_session, sync_session
+
+ACTIVITY_ROLLUP           = os.getenv("ACTIVITY_ROLLUP", "true").lower() == "true"
+ROLLUP_MIN_HOURS          = int(os.getenv("ACTIVITY_ROLLUP_MIN_HOURS", "6"))       # shorter windows scan episodes
+ROLLUP_COMPACT_SEC        = int(os.getenv("ACTIVITY_ROLLUP_COMPACT_SEC", "900"))
+ROLLUP_COMPACT_HOURS      = int(os.getenv("ACTIVITY_ROLLUP_COMPACT_HOURS", "48"))  # look-back of each compaction
+ROLLUP_SETTLE_MIN         = int(os.getenv("ACTIVITY_ROLLUP_SETTLE_MIN", "10"))     # hour must be closed this long
+
+MAX_GAP_MIN = 600   # same cap as the episode-based summary
+
+
+def _hour(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _hour_key(ts: datetime) -> str:
+    return _hour(ts).strftime("%Y-%m-%dT%H:00")
+
+
+def _local(ts) -> datetime:
+    """Naive local datetime (snapshots are local; Neo4j valid_at is UTC)."""
+    if hasattr(ts, "to_native"):
+        ts = ts.to_native()
+    if ts.tzinfo is not None:
+        ts = ts.astimezone().replace(tzinfo=None)
+    return ts
+
+
+def _empty_bucket(hour: str) -> dict:
+    return {
+        "hour": hour, "n": 0, "first_ts": None, "last_ts": None,
+        "posture": {}, "area": {},
+        "steps_sum": 0, "steps_n": 0, "steps_max": 0, "steps_delta": 0,
+        "hr_n": 0, "hr_sum": 0, "hr_min": None, "hr_max": None,
+        "spo2_n": 0, "spo2_sum": 0, "spo2_min": None, "spo2_max": None,
+    }
+
+
+def _add_span(buckets: dict, start: datetime, end: datetime, posture: str, area: str) -> None:
+    """Credit [start, end) to posture/area, split over the hours it covers."""
+    while start < end:
+        boundary = min(_hour(start) + timedelta(hours=1), end)
+        mins = (boundary - start).total_seconds() / 60
+        b = buckets.setdefault(_hour_key(start), _empty_bucket(_hour_key(start)))
+        b["posture"][posture] = b["posture"].get(posture, 0) + mins
+        b["area"][area] = b["area"].get(area, 0) + mins
+        start = boundary
+
+
+def _agg(b: dict, key: str, val) -> None:
+    if not val:
+        return
+    b[f"{key}_n"] += 1
+    b[f"{key}_sum"] += val
+    b[f"{key}_min"] = val if b[f"{key}_min"] is None else min(b[f"{key}_min"], val)
+    b[f"{key}_max"] = val if b[f"{key}_max"] is None else max(b[f"{key}_max"], val)
+
+
+def accumulate(buckets: dict, last, ts: datetime, props: dict) -> dict:
+    """
+    Fold one snapshot into the hour buckets. `last` is the previous snapshot
+    ({ts, posture_label, area_label, steps}) or None. Returns the new `last`.
+    """
+    posture = props.get("posture_label") or "Unknown"
+    area    = props.get("area_label") or "Unknown"
+    steps   = int(props.get("steps") or 0)
+
+    if last is not None:
+        gap = (ts - last["ts"]).total_seconds() / 60
+        if 0 < gap <= MAX_GAP_MIN:
+            _add_span(buckets, last["ts"], ts, last["posture_label"], last["area_label"])
+
+    key = _hour_key(ts)
+    b = buckets.setdefault(key, _empty_bucket(key))
+    b["n"] += 1
+    iso = ts.isoformat()
+    b["first_ts"] = b["first_ts"] or iso
+    b["last_ts"] = iso
+    if steps > 0:
+        b["steps_sum"] += steps
+        b["steps_n"] += 1
+        b["steps_max"] = max(b["steps_max"], steps)
+    if last is not None and last["ts"].date() == ts.date():
+        b["steps_delta"] += max(steps - last["steps"], 0)
+    else:
+        b["steps_delta"] += steps    # first reading of the day: counter starts at 0
+    _agg(b, "hr", int(props.get("hr") or 0))
+    _agg(b, "spo2", int(props.get("spo2") or 0))
+
+    return {"ts": ts, "posture_label": posture, "area_label": area, "steps": steps}
+
+
+def _to_row(device_id: str, b: dict, final: bool) -> dict:
+    row = {k: v for k, v in b.items() if k not in ("posture", "area")}
+    row.update({
+        "device_id":    device_id,
+        "posture_json": json.dumps({k: round(v, 2) for k, v in b["posture"].items()}),
+        "area_json":    json.dumps({k: round(v, 2) for k, v in b["area"].items()}),
+        "final":        final,
+        "updated_at":   datetime.now().isoformat(),
+    })
+    return row
+
+
+def _from_row(row: dict) -> dict:
+    b = {k: row.get(k) for k in _empty_bucket("") if k not in ("posture", "area")}
+    b["posture"] = json.loads(row.get("posture_json") or "{}")
+    b["area"] = json.loads(row.get("area_json") or "{}")
+    return b
+
+
+# Live rows never overwrite an hour the compactor already finalised
+_UPSERT = """
+UNWIND $rows AS row
+MERGE (r:ActivityRollup {device_id: row.device_id, hour: row.hour})
+WITH r, row
+WHERE row.final OR NOT coalesce(r.final, false)
+SET r += row
+"""
+
+
+def merge_buckets(buckets: list) -> dict:
+    """Sum hour buckets into the get_activity_stats dict ({} when empty)."""
+    # an hour without snapshots can still carry minutes of a span across it
+    buckets = [b for b in buckets if b and (b.get("n") or b.get("posture"))]
+    if not buckets:
+        return {}
+    posture, area = {}, {}
+    for b in buckets:
+        for k, v in b["posture"].items():
+            posture[k] = posture.get(k, 0) + v
+        for k, v in b["area"].items():
+            area[k] = area.get(k, 0) + v
+
+    def total(key):
+        return sum(b.get(key) or 0 for b in buckets)
+
+    steps_n, hr_n, spo2_n = total("steps_n"), total("hr_n"), total("spo2_n")
+    firsts = [b["first_ts"] for b in buckets if b.get("first_ts")]
+    lasts = [b["last_ts"] for b in buckets if b.get("last_ts")]
+    return {
+        "snapshots":       total("n"),
+        "first_ts":        datetime.fromisoformat(min(firsts)) if firsts else None,
+        "last_ts":         datetime.fromisoformat(max(lasts)) if lasts else None,
+        "posture_minutes": posture,
+        "area_minutes":    area,
+        "steps_avg":       total("steps_sum") / steps_n if steps_n else None,
+        "steps_max":       max(b.get("steps_max") or 0 for b in buckets) if steps_n else None,
+        "steps_delta":     total("steps_delta"),
+        "hr_mean":         round(total("hr_sum") / hr_n, 1) if hr_n else None,
+        "spo2_mean":       round(total("spo2_sum") / spo2_n, 1) if spo2_n else None,
+        "hours":           len(buckets),
+        "source":          "rollup",
+    }
+
+
+class RollupTracker:
+    """Open-hour buckets per patient, fed by store_sensor_snapshot."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open = {}      # device_id -> {hour_key: bucket}
+        self._last = {}      # device_id -> last snapshot
+        self._stats = {"observed": 0, "hours_written": 0, "compactions": 0,
+                       "hours_compacted": 0, "last_error": None}
+
+    async def observe(self, device_id: str, ts: datetime, props: dict) -> None:
+        """Fold a snapshot in; hours that just closed are written to Neo4j."""
+        if not ACTIVITY_ROLLUP:
+            return
+        ts = _local(ts)
+        current = _hour_key(ts)
+        with self._lock:
+            buckets = self._open.setdefault(device_id, {})
+            self._last[device_id] = accumulate(buckets, self._last.get(device_id), ts, props)
+            closed = [buckets.pop(k) for k in sorted(buckets) if k < current]
+            self._stats["observed"] += 1
+        if closed:
+            try:
+                async with async_session() as s:
+                    await s.run(_UPSERT, rows=[_to_row(device_id, b, False) for b in closed])
+                self._stats["hours_written"] += len(closed)
+            except Exception as e:
+                self._stats["last_error"] = str(e)
+                print(f"[Rollup] ⚠️ write of {len(closed)} closed hours failed ({device_id}): {e} — compaction will rebuild")
+
+    def open_buckets(self, device_id: str) -> list:
+        with self._lock:
+            return [json.loads(json.dumps(b)) for b in self._open.get(device_id, {}).values()]
+
+    async def summarize(self, device_id: str, hours_back: int) -> dict:
+        """Activity stats for the last `hours_back` hours from rollup rows + open hour."""
+        now = datetime.now()
+        start_key = _hour_key(now - timedelta(hours=hours_back))
+        open_b = self.open_buckets(device_id)
+        open_keys = {b["hour"] for b in open_b}
+
+        rows = []
+        async with async_session() as s:
+            r = await s.run(
+                """
+                MATCH (r:ActivityRollup)
+                WHERE r.device_id = $dev_id AND r.hour >= $start
+                RETURN r {.*} AS r
+                ORDER BY r.hour ASC
+                """,
+                dev_id=device_id, start=start_key,
+            )
+            async for rec in r:
+                if rec["r"]["hour"] not in open_keys:
+                    rows.append(_from_row(rec["r"]))
+        buckets = rows + open_b
+        if not buckets or min(b["hour"] for b in buckets) > start_key:
+            return {}       # only partly covered — the episode scan answers it
+        return merge_buckets(buckets)
+
+    # ── compaction ──────────────────────────────────────────────────────────
+
+    def compact(self, device_id: str, hours: int = ROLLUP_COMPACT_HOURS, session=None,
+                since: datetime = None, until: datetime = None) -> int:
+        """
+        Rebuild settled hours of the last `hours` hours (or of the hours
+        [since, until]) from VitalReading nodes and mark them final. Returns
+        the number of hour rows written.
+        """
+        if session is None:
+            with sync_session() as s:
+                return self.compact(device_id, hours, s, since, until)
+
+        now = datetime.now()
+        end = _hour(now - timedelta(minutes=ROLLUP_SETTLE_MIN))       # exclusive
+        start = _hour(now - timedelta(hours=hours))
+        if since is not None:
+            start = _hour(_local(since))
+        if until is not None:
+            end = min(end, _hour(_local(until)) + timedelta(hours=1))
+        done = {
+            rec["hour"] for rec in session.run(
+                """
+                MATCH (r:ActivityRollup)
+                WHERE r.device_id = $dev_id AND r.hour >= $start AND r.final = true
+                RETURN r.hour AS hour
+                """,
+                dev_id=device_id, start=_hour_key(start),
+            )
+        }
+
+        todo = []
+        hour = start
+        while hour < end:
+            if _hour_key(hour) not in done:
+                todo.append(hour)
+            hour += timedelta(hours=1)
+        if not todo:
+            self._stats["compactions"] += 1
+            return 0
+
+        buckets, last = {}, None
+        first, until = todo[0], todo[-1] + timedelta(hours=1)
+        # carry-in: the snapshot before the first open hour decides its first minutes
+        carry = session.run(
+            """
+            MATCH (v:VitalReading)
+            WHERE v.device_id = $dev_id
+              AND v.valid_at >= datetime($since) AND v.valid_at < datetime($before)
+            RETURN v.valid_at AS ts, v.posture_label AS posture_label, v.area_label AS area_label,
+                   v.steps AS steps, v.hr AS hr, v.spo2 AS spo2
+            ORDER BY v.valid_at DESC
+            LIMIT 1
+            """,
+            dev_id=device_id,
+            since=(first - timedelta(minutes=MAX_GAP_MIN)).astimezone().isoformat(),
+            before=first.astimezone().isoformat(),
+        ).single()
+        if carry is not None:
+            last = accumulate(buckets, last, _local(carry["ts"]), dict(carry))
+        for rec in session.run(
+            """
+            MATCH (v:VitalReading)
+            WHERE v.device_id = $dev_id
+              AND v.valid_at >= datetime($since) AND v.valid_at < datetime($until)
+            RETURN v.valid_at AS ts, v.posture_label AS posture_label, v.area_label AS area_label,
+                   v.steps AS steps, v.hr AS hr, v.spo2 AS spo2
+            ORDER BY v.valid_at ASC
+            """,
+            dev_id=device_id,
+            since=first.astimezone().isoformat(),
+            until=until.astimezone().isoformat(),
+        ):
+            last = accumulate(buckets, last, _local(rec["ts"]), dict(rec))
+
+        # hours without readings are final too (empty), so they are not re-read
+        rows = [
+            _to_row(device_id, buckets.get(_hour_key(h)) or _empty_bucket(_hour_key(h)), True)
+            for h in todo
+        ]
+        if rows:
+            session.run(_UPSERT, rows=rows).consume()
+        self._stats["compactions"] += 1
+        self._stats["hours_compacted"] += len(rows)
+        return len(rows)
+
+    def backfilled(self, device_id: str, since: datetime, until: datetime, session=None) -> int:
+        """
+        Readings were added to [since, until] after those hours were compacted
+        (often as empty final rows). Clear `final` there — plus the next hour,
+        whose first minutes come from the carry-in — and rebuild the range.
+        """
+        if not ACTIVITY_ROLLUP:
+            return 0
+        if session is None:
+            with sync_session() as s:
+                return self.backfilled(device_id, since, until, s)
+
+        since, until = _hour(_local(since)), _hour(_local(until)) + timedelta(hours=1)
+        session.run(
+            """
+            MATCH (r:ActivityRollup)
+            WHERE r.device_id = $dev_id AND r.hour >= $start AND r.hour <= $end
+            SET r.final = false
+            """,
+            dev_id=device_id, start=_hour_key(since), end=_hour_key(until),
+        ).consume()
+        return self.compact(device_id, session=session, since=since, until=until)
+
+    def start_compactor(self, patients_fn, interval: int = ROLLUP_COMPACT_SEC):
+        """Background thread: compact every patient from patients_fn() every `interval` s."""
+        if not ACTIVITY_ROLLUP:
+            return None
+
+        def _loop():
+            while True:
+                for device_id in list(patients_fn()):
+                    try:
+                        n = self.compact(device_id)
+                        if n:
+                            print(f"[Rollup] ✅ {device_id}: {n} hours compacted")
+                    except Exception as e:
+                        self._stats["last_error"] = str(e)
+                        print(f"[Rollup] ⚠️ compaction failed ({device_id}): {e}")
+                time.sleep(interval)
+
+        t = threading.Thread(target=_loop, daemon=True)
+        t.start()
+        return t
+
+    def status(self) -> dict:
+        with self._lock:
+            open_hours = {d: sorted(b) for d, b in self._open.items()}
+        return {"enabled": ACTIVITY_ROLLUP, "min_hours": ROLLUP_MIN_HOURS,
+                "open_hours": open_hours, **self._stats}
+
+
+ROLLUPS = RollupTracker()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Rebuild hourly ActivityRollup nodes from VitalReading")
+    parser.add_argument("--device", default=None, help="Only this device_id (default: every patient)")
+    parser.add_argument("--hours", type=int, default=720)
+    args = parser.parse_args()
+
+    from memory.neo4j_pool import close_all
+    try:
+        with sync_session() as s:
+            devices = [args.device] if args.device else [
+                r["d"] for r in s.run("MATCH (v:VitalReading) RETURN DISTINCT v.device_id AS d")
+            ]
+            for dev in devices:
+                print(f"[Rollup] {dev}: {ROLLUPS.compact(dev, args.hours, s)} hours written")
+    finally:
+        close_all()
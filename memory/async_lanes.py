@@ -0,0 +1,186 @@
+"""
+Async Bridge Lanes for UTLMediCore
+==================================
+run_async() used to wrap every coroutine in ONE global asyncio.Lock, so a
+cheap graphiti.search() from the Monitor agent (embedding + hybrid search,
+no chat completion) queued behind a 90 s add_episode extraction.
+
+Every coroutine submitted to the PatientMemory loop now runs in a named lane:
+
+    lane        concurrency                    priority  on caller timeout
+    readonly    unbounded                      0         cancelled
+    search      LANE_SEARCH_CONCURRENCY (4)    1         cancelled
+    interactive LANE_INTERACTIVE_CONCURRENCY (2) 1       cancelled
+    write       LANE_WRITE_CONCURRENCY (4)     2         keeps running
+    extraction  LANE_EXTRACTION_CONCURRENCY (1) 3        keeps running
+
+- each lane has its own semaphore — lanes never wait on each other, so
+  interactive reads never queue behind background extraction
+- inside a saturated lane, waiters are admitted by priority (lane default,
+  or per call) and then FIFO — e.g. a user-triggered write passes queued
+  background writes
+- per-lane queue-time histogram, running/waiting gauges, timeouts and
+  failures (see lane_stats(), served by /api/memory-lanes)
+
+run_async() defaults to the 'write' lane; callers pick 'search' for
+get_patient_context() and 'interactive' for local LLM calls a user is waiting
+on (report narratives), run_async_readonly() uses 'readonly'. The 'extraction'
+lane is entered inside PatientMemory.ingest_episode() around
+graphiti.add_episode(), so queue workers and inline ingestion (GRAPHITI_QUEUE
+on or off) share one cap, ordered by ingest_queue.PRIORITY.
+
+All lanes run on the single PatientMemory loop — async Neo4j drivers and the
+Graphiti client are bound to the loop that created them.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+
+LANE_SEARCH_CONCURRENCY     = int(os.getenv("LANE_SEARCH_CONCURRENCY", "4"))
+LANE_WRITE_CONCURRENCY      = int(os.getenv("LANE_WRITE_CONCURRENCY", "4"))
+LANE_EXTRACTION_CONCURRENCY = int(os.getenv("LANE_EXTRACTION_CONCURRENCY", "1"))
+LANE_INTERACTIVE_CONCURRENCY = int(os.getenv("LANE_INTERACTIVE_CONCURRENCY", "2"))
+
+# Queue-time histogram bucket upper bounds (ms)
+_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000, 30000, float("inf"))
+
+
+class _PrioritySemaphore:
+    """asyncio semaphore whose waiters are woken lowest (priority, arrival) first."""
+
+    def __init__(self, value: int):
+        self._value = value
+        self._waiters = []          # heap of (priority, seq, future)
+        self._seq = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for *_, f in self._waiters if not f.done())
+
+    async def acquire(self, priority: int) -> None:
+        if self._value > 0 and not self.waiting:
+            self._value -= 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()      # woken and cancelled at once — pass the slot on
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            *_, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._value += 1
+
+
+class Lane:
+    def __init__(self, name: str, concurrency, priority: int, cancel_on_timeout: bool):
+        self.name = name
+        self.concurrency = concurrency          # None = unbounded
+        self.priority = priority
+        self.cancel_on_timeout = cancel_on_timeout
+        self._sem = None                        # created on the loop that uses it
+        self.running = 0
+        self.hist = [0] * len(_BUCKETS_MS)
+        self.recent_wait_ms = deque(maxlen=500)
+        self.wait_ms_sum = 0.0                  # lifetime, for the histogram _sum/_count
+        self.wait_count = 0
+        self.counts = {"submitted": 0, "completed": 0, "failed": 0, "timeouts": 0}
+
+    def _record_wait(self, ms: float) -> None:
+        self.recent_wait_ms.append(ms)
+        self.wait_ms_sum += ms
+        self.wait_count += 1
+        for i, bound in enumerate(_BUCKETS_MS):
+            if ms <= bound:
+                self.hist[i] += 1
+                break
+
+    async def run(self, coro, priority: int = None, submitted: float = None, timeout: float = None):
+        """
+        Await `coro` inside this lane. `submitted` is the time.monotonic() of the
+        caller's submission, so the queue time includes the hop onto the loop.
+        `timeout` covers queue + run; lanes with cancel_on_timeout cancel the
+        coroutine when it expires, the others let it finish in the background.
+        """
+        submitted = submitted or time.monotonic()
+        self.counts["submitted"] += 1
+        if self.concurrency and self._sem is None:
+            self._sem = _PrioritySemaphore(self.concurrency)
+
+        async def _admitted():
+            if self._sem is not None:
+                await self._sem.acquire(self.priority if priority is None else priority)
+            self._record_wait((time.monotonic() - submitted) * 1000)
+            self.running += 1
+            try:
+                return await coro
+            finally:
+                self.running -= 1
+                if self._sem is not None:
+                    self._sem.release()
+
+        task = _admitted()
+        try:
+            if timeout and self.cancel_on_timeout:
+                result = await asyncio.wait_for(task, max(timeout - (time.monotonic() - submitted), 0.01))
+            else:
+                result = await task
+        except asyncio.TimeoutError:
+            self.counts["timeouts"] += 1
+            raise
+        except Exception:
+            self.counts["failed"] += 1
+            raise
+        self.counts["completed"] += 1
+        return result
+
+    def stats(self) -> dict:
+        waits = sorted(self.recent_wait_ms)
+
+        def pct(p):
+            return round(waits[min(int(len(waits) * p), len(waits) - 1)], 1) if waits else None
+
+        return {
+            "concurrency": self.concurrency or "unbounded",
+            "priority":    self.priority,
+            "running":     self.running,
+            "waiting":     self._sem.waiting if self._sem else 0,
+            "queue_ms_p50": pct(.5),
+            "queue_ms_p95": pct(.95),
+            "queue_ms_histogram": {
+                (f"<={b:g}" if b != float("inf") else f">{_BUCKETS_MS[-2]:g}"): n
+                for b, n in zip(_BUCKETS_MS, self.hist)
+            },
+            "queue_ms_sum":   round(self.wait_ms_sum, 3),
+            "queue_ms_count": self.wait_count,
+            **self.counts,
+        }
+
+
+LANES = {
+    "readonly":   Lane("readonly",   None,                        0, cancel_on_timeout=True),
+    "search":     Lane("search",     LANE_SEARCH_CONCURRENCY,     1, cancel_on_timeout=True),
+    "interactive": Lane("interactive", LANE_INTERACTIVE_CONCURRENCY, 1, cancel_on_timeout=True),
+    "write":      Lane("write",      LANE_WRITE_CONCURRENCY,      2, cancel_on_timeout=False),
+    "extraction": Lane("extraction", LANE_EXTRACTION_CONCURRENCY, 3, cancel_on_timeout=False),
+}
+
+
+def in_lane(lane: str, coro, priority: int = None, submitted: float = None, timeout: float = None):
+    """Coroutine running `coro` in the named lane (KeyError for unknown lanes)."""
+    return LANES[lane].run(coro, priority=priority, submitted=submitted, timeout=timeout)
+
+
+def lane_stats() -> dict:
+    return {name: lane.stats() for name, lane in LANES.items()}
@@ -5,135 +5,332 @@ DirectNeo4jWriter: Real-time structured vitals writer for UTLMediCore.
 Menulis data sensor langsung ke Neo4j TANPA LLM — < 1 detik per write.
 Digunakan untuk real-time vitals stream (setiap 3 menit).
 
+Write-behind buffer:
+  write_*() hanya memasukkan row ke buffer (tanpa round-trip). Thread flusher
+  menulis semua row dengan SATU transaksi `UNWIND $rows` per jenis node, setiap
+  DIRECT_WRITE_FLUSH_SEC atau segera saat buffer mencapai DIRECT_WRITE_BATCH.
+  - at-least-once : row baru dihapus dari buffer setelah commit; jika gagal,
+                    row dikembalikan dan dicoba lagi (backoff). Setiap row
+                    punya uuid dan di-MERGE, jadi retry tidak menggandakan node.
+  - bounded       : maksimal DIRECT_WRITE_MAX_BUFFER row; jika penuh, row
+                    tertua dibuang dan dihitung di `dropped`.
+  - metrics       : writer_stats() — flush count, durasi, rows per flush, retry.
+  DIRECT_WRITE_BEHIND=false → setiap write langsung di-flush (perilaku lama).
+
+Async API (untuk coroutine di background event loop PatientMemory):
+  awrite_vital_reading / awrite_alert_event / awrite_posture_change /
+  awrite_incident / awrite_segment / aflush
+  tidak pernah memblokir loop — dengan buffer hanya append ke deque, tanpa
+  buffer round-trip Bolt dijalankan di thread executor.
+
 Schema Node:
   (:Patient  {id, device_id})
-  (:VitalReading  {hr, spo2, steps, posture, area, kcal, condition,
-                   timestamp_local, timestamp_utc, valid_at})
-  (:AlertEvent    {type, severity, message, timestamp_local, timestamp_utc})
-  (:PostureChange {from_posture, to_posture, timestamp_local})
+  (:VitalReading  {uuid, device_id, hr, spo2, steps, posture, area, kcal, condition,
+                   timestamp_local, timestamp_utc, valid_at, minute_of_day, local_date})
+  (:AlertEvent    {uuid, device_id, type, severity, message, timestamp_local,
+                   timestamp_utc, valid_at})
+  (:PostureChange {uuid, device_id, from_posture, to_posture, timestamp_local,
+                   timestamp_utc, valid_at})
+  (:Incident      {uuid, device_id, status, kinds, level, severity, started_utc,
+                   ended_utc, duration_sec, readings, hr_min, hr_max, spo2_min,
+                   valid_at})   — lihat memory/incidents.py
+  (:Segment       {uuid, device_id, kind, label, status, start_utc, end_utc,
+                   duration_sec, readings, valid_at, end_at})   — lihat memory/sessionizer.py
 
 Relationships:
   (Patient)-[:HAD_READING]->(VitalReading)
   (Patient)-[:HAD_ALERT]->(AlertEvent)
   (Patient)-[:HAD_POSTURE_CHANGE]->(PostureChange)
+  (Patient)-[:HAD_INCIDENT]->(Incident)
+  (Patient)-[:HAD_SEGMENT]->(Segment)
 """
 
+import asyncio
 import os
+import threading
+import time
+import uuid
+from collections import deque
 from datetime import datetime, timezone
 
-# ── Lazy import — connector hanya di-load saat pertama dipakai ────────────────
-_driver = None
+# ── Driver comes from the shared pool (memory/neo4j_pool.py) ─────────────────
+from memory.neo4j_pool import sync_session
+
+WRITE_BEHIND    = os.getenv("DIRECT_WRITE_BEHIND", "true").lower() == "true"
+FLUSH_SEC       = float(os.getenv("DIRECT_WRITE_FLUSH_SEC", "1.0"))
+BATCH_SIZE      = int(os.getenv("DIRECT_WRITE_BATCH", "500"))
+MAX_BUFFER      = int(os.getenv("DIRECT_WRITE_MAX_BUFFER", "20000"))
+MAX_BACKOFF_SEC = 30.0
+
+# One UNWIND statement per node type — all run inside one transaction per flush
+_UNWIND_QUERIES = {
+    "vital": """
+        UNWIND $rows AS row
+        MERGE (p:Patient {device_id: row.device_id})
+        ON CREATE SET p.id = row.device_id, p.created_at = row.timestamp_utc
+        MERGE (v:VitalReading {uuid: row.uuid})
+        ON CREATE SET v += row, v.valid_at = datetime(row.timestamp_utc)
+        MERGE (p)-[:HAD_READING]->(v)
+    """,
+    "alert": """
+        UNWIND $rows AS row
+        MERGE (p:Patient {device_id: row.device_id})
+        ON CREATE SET p.id = row.device_id, p.created_at = row.timestamp_utc
+        MERGE (a:AlertEvent {uuid: row.uuid})
+        ON CREATE SET a += row, a.valid_at = datetime(row.timestamp_utc)
+        MERGE (p)-[:HAD_ALERT]->(a)
+    """,
+    "posture": """
+        UNWIND $rows AS row
+        MERGE (p:Patient {device_id: row.device_id})
+        ON CREATE SET p.id = row.device_id
+        MERGE (pc:PostureChange {uuid: row.uuid})
+        ON CREATE SET pc += row, pc.valid_at = datetime(row.timestamp_utc)
+        MERGE (p)-[:HAD_POSTURE_CHANGE]->(pc)
+    """,
+    # Incidents are updated in place: every row overwrites the running stats
+    "incident": """
+        UNWIND $rows AS row
+        MERGE (p:Patient {device_id: row.device_id})
+        ON CREATE SET p.id = row.device_id
+        MERGE (i:Incident {uuid: row.uuid})
+        SET i += row, i.valid_at = datetime(row.started_utc)
+        MERGE (p)-[:HAD_INCIDENT]->(i)
+    """,
+    # Open segments are checkpointed under the same uuid until they close
+    "segment": """
+        UNWIND $rows AS row
+        MERGE (p:Patient {device_id: row.device_id})
+        ON CREATE SET p.id = row.device_id
+        MERGE (s:Segment {uuid: row.uuid})
+        SET s += row, s.valid_at = datetime(row.start_utc), s.end_at = datetime(row.end_utc)
+        MERGE (p)-[:HAD_SEGMENT]->(s)
+    """,
+}
+
+_buffer = {kind: deque() for kind in _UNWIND_QUERIES}
+_buffer_lock = threading.Lock()
+_flush_lock = threading.Lock()          # one flush at a time
+_wake = threading.Event()
+_thread = None
+_listeners = []
+
+_stats = {
+    "enqueued":     {kind: 0 for kind in _UNWIND_QUERIES},
+    "written":      {kind: 0 for kind in _UNWIND_QUERIES},
+    "dropped":      0,
+    "flushes":      0,
+    "failures":     0,
+    "last_error":   None,
+    "flush_ms":     deque(maxlen=200),
+    "rows_per_flush": deque(maxlen=200),
+}
+
+
+def _now_fields(ts_utc: str = None) -> dict:
+    return {
+        "timestamp_local": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "timestamp_utc":   ts_utc or datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def _enqueue(kind: str, row: dict) -> bool:
+    """Add one row to the buffer. Never does I/O unless write-behind is disabled."""
+    row["uuid"] = row.get("uuid") or str(uuid.uuid4())
+    with _buffer_lock:
+        buf = _buffer[kind]
+        if sum(len(b) for b in _buffer.values()) >= MAX_BUFFER:
+            # Bounded memory: drop the oldest row of this kind (or any kind)
+            victim = buf if buf else max(_buffer.values(), key=len)
+            victim.popleft()
+            _stats["dropped"] += 1
+        buf.append(row)
+        _stats["enqueued"][kind] += 1
+        full = len(buf) >= BATCH_SIZE
+
+    if not WRITE_BEHIND:
+        return flush()
+    _start_flusher()
+    if full:
+        _wake.set()
+    return True
+
+
+def add_flush_listener(fn) -> None:
+    """
+    Register fn({kind: set(device_ids)}) — called after every successful flush
+    with the patients whose rows were just committed.
+    """
+    _listeners.append(fn)
+
+
+def _ensure_constraints(session) -> None:
+    # MERGE on uuid needs a unique index, otherwise every row is a label scan.
+    # The constraints live in neo4j_schema with the other indexes.
+    from memory.neo4j_schema import ensure_schema
+    ensure_schema(session)
+
+
+def _write_batch(tx, batch: dict) -> None:
+    for kind, rows in batch.items():
+        if rows:
+            tx.run(_UNWIND_QUERIES[kind], rows=rows).consume()
+
+
+def flush() -> bool:
+    """
+    Write everything currently buffered (up to BATCH_SIZE rows per kind) in one
+    transaction. On failure the rows go back to the front of the buffer; if that
+    overfills it, the oldest rows are dropped (same policy as _enqueue).
+    """
+    with _flush_lock:
+        with _buffer_lock:
+            batch = {kind: [buf.popleft() for _ in range(min(len(buf), BATCH_SIZE))]
+                     for kind, buf in _buffer.items()}
+        n_rows = sum(len(r) for r in batch.values())
+        if n_rows == 0:
+            return True
+
+        t0 = time.perf_counter()
+        try:
+            with sync_session() as session:
+                _ensure_constraints(session)
+                session.execute_write(_write_batch, batch)
+        except Exception as e:
+            with _buffer_lock:
+                for kind, rows in batch.items():
+                    _buffer[kind].extendleft(reversed(rows))
+                # Rows enqueued during the outage are the newest — keep them
+                overflow = sum(len(b) for b in _buffer.values()) - MAX_BUFFER
+                for _ in range(max(overflow, 0)):
+                    max(_buffer.values(), key=len).popleft()
+                    _stats["dropped"] += 1
+            _stats["failures"] += 1
+            _stats["last_error"] = str(e)
+            print(f"[DirectNeo4j] ❌ flush of {n_rows} rows failed (will retry): {e}")
+            return False
+
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        _stats["flushes"] += 1
+        _stats["flush_ms"].append(elapsed_ms)
+        _stats["rows_per_flush"].append(n_rows)
+        for kind, rows in batch.items():
+            _stats["written"][kind] += len(rows)
+
+    counts = " ".join(f"{k}:{len(r)}" for k, r in batch.items() if r)
+    print(f"[DirectNeo4j] ✅ Flushed {n_rows} rows ({counts}) in {elapsed_ms:.0f} ms")
+
+    touched = {kind: {r["device_id"] for r in rows} for kind, rows in batch.items() if rows}
+    for fn in list(_listeners):
+        try:
+            fn(touched)
+        except Exception as e:
+            print(f"[DirectNeo4j] flush listener failed: {e}")
+    return True
+
+
+def _flush_loop() -> None:
+    backoff = FLUSH_SEC
+    while True:
+        _wake.wait(timeout=backoff)
+        _wake.clear()
+        ok = flush()
+        # Keep draining while full batches are waiting
+        while ok and any(len(b) >= BATCH_SIZE for b in _buffer.values()):
+            ok = flush()
+        backoff = FLUSH_SEC if ok else min(backoff * 2, MAX_BACKOFF_SEC)
+
+
+def _start_flusher() -> None:
+    global _thread
+    if _thread is None:
+        with _buffer_lock:
+            if _thread is None:
+                _thread = threading.Thread(target=_flush_loop, daemon=True)
+                _thread.start()
+
+
+def bulk_write(kind: str, rows: list) -> int:
+    """
+    Write rows straight to Neo4j in one transaction, bypassing the buffer —
+    for backfills. Rows need device_id, timestamp_utc and a stable uuid so a
+    re-run MERGEs instead of duplicating. Returns the number of rows written.
+    """
+    if not rows:
+        return 0
+    with sync_session() as session:
+        _ensure_constraints(session)
+        session.execute_write(_write_batch, {kind: rows})
+    _stats["written"][kind] += len(rows)
+    return len(rows)
+
 
-def _get_driver():
-    global _driver
-    if _driver is None:
-        from neo4j import GraphDatabase
-        uri  = os.getenv("NEO4J_URI",      "bolt://localhost:7687")
-        user = os.getenv("NEO4J_USER",     "neo4j")
-        pw   = os.getenv("NEO4J_PASSWORD", "password")
-        _driver = GraphDatabase.driver(uri, auth=(user, pw))
-        print(f"[DirectNeo4j] Connected to {uri}")
-    return _driver
+def pending() -> int:
+    """Rows waiting in the buffer."""
+    with _buffer_lock:
+        return sum(len(b) for b in _buffer.values())
 
 
 def write_vital_reading(device_id: str, data: dict) -> bool:
     """
-    Tulis satu snapshot vital ke Neo4j langsung (tanpa LLM).
+    Tulis satu snapshot vital ke Neo4j langsung (tanpa LLM) — via buffer.
 
     Args:
         device_id: e.g. "C5945F0F59FB_D612D9000180"
         data: dict dengan key: hr, spo2, steps, posture, posture_label,
-              area_label, kcal, condition, timestamp_local (str)
+              area_label, kcal, condition, timestamp_local (str),
+              minute_of_day, local_date
 
     Returns:
-        True jika berhasil, False jika error
+        True jika row masuk buffer (atau berhasil ditulis saat write-behind off)
     """
     try:
-        driver = _get_driver()
-        ts_local = data.get("timestamp_local", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
         # Prioritaskan timestamp_utc bawaan data dari memory agent
-        now_utc = data.get("timestamp_utc", datetime.now(timezone.utc).isoformat())
-
-        with driver.session() as session:
-            session.run(
-                """
-                MERGE (p:Patient {device_id: $device_id})
-                ON CREATE SET p.id = $device_id, p.created_at = $utc
-
-
-                CREATE (v:VitalReading {
-                    hr:              $hr,
-                    spo2:            $spo2,
-                    steps:           $steps,
-                    posture:         $posture,
-                    posture_label:   $posture_label,
-                    area_label:      $area_label,
-                    kcal:            $kcal,
-                    condition:       $condition,
-                    timestamp_local: $ts_local,
-                    timestamp_utc:   $utc
-                })
-                CREATE (p)-[:HAD_READING]->(v)
-                """,
-                device_id    = device_id,
-                hr           = data.get("hr", 0),
-                spo2         = data.get("spo2", 0),
-                steps        = data.get("steps", 0),
-                posture      = data.get("posture", 0),
-                posture_label= data.get("posture_label", "Unknown"),
-                area_label   = data.get("area_label", "Unknown Area"),
-                kcal         = data.get("kcal", 0),
-                condition    = data.get("condition", "normal"),
-                ts_local     = ts_local,
-                utc          = now_utc,
-            )
-        print(f"[DirectNeo4j] ✅ VitalReading saved — {device_id} | HR:{data.get('hr')} SpO2:{data.get('spo2')} | {ts_local}")
-        return True
+        row = _now_fields(data.get("timestamp_utc"))
+        row.update({
+            "device_id":     device_id,
+            "hr":            data.get("hr", 0),
+            "spo2":          data.get("spo2", 0),
+            "steps":         data.get("steps", 0),
+            "posture":       data.get("posture", 0),
+            "posture_label": data.get("posture_label", "Unknown"),
+            "area_label":    data.get("area_label", "Unknown Area"),
+            "kcal":          data.get("kcal", 0),
+            "condition":     data.get("condition", "normal"),
+        })
+        for key in ("timestamp_local", "minute_of_day", "local_date"):
+            if data.get(key) is not None:
+                row[key] = data[key]
+        return _enqueue("vital", row)
 
     except Exception as e:
         print(f"[DirectNeo4j] ❌ write_vital_reading failed: {e}")
         return False
 
 
-def write_alert_event(device_id: str, alert_type: str, severity: str, message: str) -> bool:
+def write_alert_event(device_id: str, alert_type: str, severity: str, message: str,
+                      incident_id: str = None) -> bool:
     """
-    Tulis alert event ke Neo4j (bradycardia, hypoxia, fall, dll).
+    Tulis alert event ke Neo4j (bradycardia, hypoxia, fall, dll) — via buffer.
 
     Args:
-        device_id: patient device ID
-        alert_type: e.g. "bradycardia", "hypoxia", "fall_detected"
-        severity:   "warning" | "critical"
-        message:    human readable alert text
+        device_id:   patient device ID
+        alert_type:  e.g. "bradycardia", "hypoxia", "fall_detected"
+        severity:    "warning" | "critical"
+        message:     human readable alert text
+        incident_id: uuid of the Incident this alert opened/escalated (optional)
     """
     try:
-        driver = _get_driver()
-        now_utc   = datetime.now(timezone.utc).isoformat()
-        ts_local  = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        with driver.session() as session:
-            session.run(
-                """
-                MERGE (p:Patient {device_id: $device_id})
-                ON CREATE SET p.id = $device_id, p.created_at = $utc
-
-                CREATE (a:AlertEvent {
-                    alert_type:      $alert_type,
-                    severity:        $severity,
-                    message:         $message,
-                    timestamp_local: $ts_local,
-                    timestamp_utc:   $utc
-                })
-                CREATE (p)-[:HAD_ALERT]->(a)
-                """,
-                device_id  = device_id,
-                alert_type = alert_type,
-                severity   = severity,
-                message    = message,
-                ts_local   = ts_local,
-                utc        = now_utc,
-            )
-        print(f"[DirectNeo4j] 🚨 AlertEvent saved — {device_id} | {alert_type} [{severity}]")
-        return True
+        row = _now_fields()
+        row.update({
+            "device_id":  device_id,
+            "alert_type": alert_type,
+            "severity":   severity,
+            "message":    message,
+        })
+        if incident_id:
+            row["incident_id"] = incident_id
+        return _enqueue("alert", row)
 
     except Exception as e:
         print(f"[DirectNeo4j] ❌ write_alert_event failed: {e}")
@@ -142,44 +339,122 @@ def write_alert_event(device_id: str, alert_type: str, severity: str, message: s
 
 def write_posture_change(device_id: str, from_posture: str, to_posture: str) -> bool:
     """
-    Catat perubahan postur pasien ke Neo4j.
+    Catat perubahan postur pasien ke Neo4j — via buffer.
     """
     try:
-        driver = _get_driver()
-        ts_local = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        now_utc  = datetime.now(timezone.utc).isoformat()
-
-        with driver.session() as session:
-            session.run(
-                """
-                MERGE (p:Patient {device_id: $device_id})
-                ON CREATE SET p.id = $device_id
-
-                CREATE (pc:PostureChange {
-                    from_posture:    $from_posture,
-                    to_posture:      $to_posture,
-                    timestamp_local: $ts_local,
-                    timestamp_utc:   $utc
-                })
-                CREATE (p)-[:HAD_POSTURE_CHANGE]->(pc)
-                """,
-                device_id    = device_id,
-                from_posture = from_posture,
-                to_posture   = to_posture,
-                ts_local     = ts_local,
-                utc          = now_utc,
-            )
-        print(f"[DirectNeo4j] 🔄 PostureChange saved — {device_id} | {from_posture} → {to_posture}")
-        return True
+        row = _now_fields()
+        row.update({
+            "device_id":    device_id,
+            "from_posture": from_posture,
+            "to_posture":   to_posture,
+        })
+        return _enqueue("posture", row)
 
     except Exception as e:
         print(f"[DirectNeo4j] ❌ write_posture_change failed: {e}")
         return False
 
 
-def close():
-    """Tutup koneksi Neo4j saat server shutdown."""
-    global _driver
-    if _driver:
-        _driver.close()
-        _driver = None
+def write_incident(device_id: str, incident: dict) -> bool:
+    """
+    Upsert satu Incident (memory/incidents.py) — via buffer. Row dengan uuid
+    yang sama menimpa statistik sebelumnya (open → update → close).
+    """
+    try:
+        row = {k: v for k, v in incident.items() if v is not None}
+        row["device_id"] = device_id
+        return _enqueue("incident", row)
+
+    except Exception as e:
+        print(f"[DirectNeo4j] ❌ write_incident failed: {e}")
+        return False
+
+
+def write_segment(row: dict) -> bool:
+    """
+    Upsert satu posture/area Segment (memory/sessionizer.py) — via buffer.
+    Checkpoint dari segment yang masih open memakai uuid yang sama.
+    """
+    try:
+        return _enqueue("segment", dict(row))
+
+    except Exception as e:
+        print(f"[DirectNeo4j] ❌ write_segment failed: {e}")
+        return False
+
+
+async def _offload(fn, *args):
+    """Run a writer call without blocking the event loop."""
+    if WRITE_BEHIND:
+        return fn(*args)        # buffer append only — no I/O on the loop
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+async def awrite_vital_reading(device_id: str, data: dict) -> bool:
+    """Async write_vital_reading — safe to await on the shared event loop."""
+    return await _offload(write_vital_reading, device_id, data)
+
+
+async def awrite_alert_event(device_id: str, alert_type: str, severity: str, message: str,
+                             incident_id: str = None) -> bool:
+    """Async write_alert_event — safe to await on the shared event loop."""
+    return await _offload(write_alert_event, device_id, alert_type, severity, message, incident_id)
+
+
+async def awrite_posture_change(device_id: str, from_posture: str, to_posture: str) -> bool:
+    """Async write_posture_change — safe to await on the shared event loop."""
+    return await _offload(write_posture_change, device_id, from_posture, to_posture)
+
+
+async def awrite_incident(device_id: str, incident: dict) -> bool:
+    """Async write_incident — safe to await on the shared event loop."""
+    return await _offload(write_incident, device_id, incident)
+
+
+async def awrite_segment(row: dict) -> bool:
+    """Async write_segment — safe to await on the shared event loop."""
+    return await _offload(write_segment, row)
+
+
+async def aflush() -> bool:
+    """Flush the buffer from a coroutine (the transaction runs in the executor)."""
+    return await asyncio.get_running_loop().run_in_executor(None, flush)
+
+
+def writer_stats() -> dict:
+    """Buffer depth and flush metrics."""
+    ms = sorted(_stats["flush_ms"])
+    rows = list(_stats["rows_per_flush"])
+    with _buffer_lock:
+        depth = {kind: len(b) for kind, b in _buffer.items()}
+    return {
+        "write_behind":   WRITE_BEHIND,
+        "flush_sec":      FLUSH_SEC,
+        "batch_size":     BATCH_SIZE,
+        "max_buffer":     MAX_BUFFER,
+        "pending":        depth,
+        "enqueued":       dict(_stats["enqueued"]),
+        "written":        dict(_stats["written"]),
+        "dropped":        _stats["dropped"],
+        "flushes":        _stats["flushes"],
+        "failures":       _stats["failures"],
+        "last_error":     _stats["last_error"],
+        "flush_ms": {
+            "avg": round(sum(ms) / len(ms), 1) if ms else None,
+            "p95": round(ms[min(int(len(ms) * 0.95), len(ms) - 1)], 1) if ms else None,
+            "max": round(ms[-1], 1) if ms else None,
+        },
+        "avg_rows_per_flush": round(sum(rows) / len(rows), 1) if rows else None,
+    }
+
+
+def close(timeout: float = 10.0):
+    """Flush sisa buffer lalu tutup koneksi Neo4j saat server shutdown (shared pool)."""
+    deadline = time.time() + timeout
+    while pending() and time.time() < deadline:
+        if not flush():
+            time.sleep(0.5)
+    if pending():
+        print(f"[DirectNeo4j] ⚠️ {pending()} rows not flushed at shutdown")
+    from memory.neo4j_pool import close_all
+    close_all()
@@ -0,0 +1,306 @@
+"""
+Persistent Embedding Cache for UTLMediCore
+==========================================
+Graphiti embeds every entity name, fact and search query through Ollama
+(nomic-embed-text) — including the same strings over and over: repeated
+insight questions, the fixed get_patient_memory prompt, near-identical
+routine episodes. CachingEmbedder wraps the real embedder:
+
+- key        : sha1(model | dim | text)
+- memory     : LRU of EMBED_CACHE_MEM vectors in front of ...
+- disk       : EMBED_CACHE_PATH (SQLite, WAL, float32 blobs), at most
+               EMBED_CACHE_MAX rows, least recently used pruned first
+- batching   : misses arriving within EMBED_BATCH_WINDOW_MS (from any number
+               of concurrent create() calls) go to Ollama as ONE create_batch
+               call; a text already being embedded is awaited, not re-sent
+- metrics    : hit rate, batches, mean embedding latency and the latency
+               saved by hits (see stats(), served by /api/embedding-cache)
+
+Set EMBED_CACHE=false to use the plain embedder.
+
+Usage:
+    embedder = CachingEmbedder(OpenAIEmbedder(...), model="nomic-embed-text", dim=768)
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+EMBED_CACHE           = os.getenv("EMBED_CACHE", "true").lower() == "true"
+EMBED_CACHE_PATH      = os.getenv("EMBED_CACHE_PATH", os.path.join("reports", "embedding_cache.db"))
+EMBED_CACHE_MAX       = int(os.getenv("EMBED_CACHE_MAX", "100000"))
+EMBED_CACHE_MEM       = int(os.getenv("EMBED_CACHE_MEM", "4096"))
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "10"))
+EMBED_BATCH_MAX       = int(os.getenv("EMBED_BATCH_MAX", "64"))
+
+_PRUNE_EVERY = 500      # inserts between LRU prunes of the SQLite store
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key        TEXT PRIMARY KEY,
+    model      TEXT NOT NULL,
+    dim        INTEGER NOT NULL,
+    vec        BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    last_used  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings (last_used);
+"""
+
+_active = None          # the CachingEmbedder built by graphiti_client, for stats
+
+
+def _pack(vec) -> bytes:
+    return array("f", vec).tobytes()
+
+
+def _unpack(blob: bytes) -> list:
+    a = array("f")
+    a.frombytes(blob)
+    return a.tolist()
+
+
+class EmbeddingStore:
+    """SQLite vector store (sync, short; called via the default executor from the loop)."""
+
+    def __init__(self, path: str = EMBED_CACHE_PATH, max_rows: int = EMBED_CACHE_MAX):
+        self.path = path
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._db = None
+        self._inserts = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+            self._db = db
+        return self._db
+
+    def get_many(self, keys: list) -> dict:
+        if not keys:
+            return {}
+        with self._lock:
+            db = self._conn()
+            marks = ",".join("?" * len(keys))
+            rows = db.execute(f"SELECT key, vec FROM embeddings WHERE key IN ({marks})", keys).fetchall()
+            if rows:
+                db.execute(f"UPDATE embeddings SET last_used = ? WHERE key IN ({marks})",
+                           [time.time(), *[r[0] for r in rows]])
+        return {k: _unpack(v) for k, v in rows}
+
+    def put_many(self, model: str, dim: int, items: dict) -> None:
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vec, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(k, model, dim, _pack(v), now, now) for k, v in items.items()],
+            )
+            self._inserts += len(items)
+            if self._inserts >= _PRUNE_EVERY:
+                self._inserts = 0
+                excess = db.execute("SELECT count(*) FROM embeddings").fetchone()[0] - self.max_rows
+                if excess > 0:
+                    db.execute("DELETE FROM embeddings WHERE key IN "
+                               "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)", (excess,))
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn().execute("SELECT count(*) FROM embeddings").fetchone()[0]
+
+
+class CachingEmbedder:
+    """Drop-in Graphiti embedder (create / create_batch) with a two-level cache."""
+
+    def __init__(self, inner, model: str, dim: int, store: EmbeddingStore = None,
+                 mem_size: int = EMBED_CACHE_MEM):
+        global _active
+        self.inner = inner
+        self.config = getattr(inner, "config", None)
+        self.model = model
+        self.dim = dim
+        self.store = store or EmbeddingStore()
+        self.mem_size = mem_size
+        self._mem = OrderedDict()
+        self._inflight = {}         # key -> Future, queued or being embedded
+        self._queue = {}            # key -> text, waiting for the next batch
+        self._batch_loop = None
+        self._batch_handle = None
+        self._stats = {"texts": 0, "mem_hits": 0, "disk_hits": 0, "joined": 0, "misses": 0,
+                       "batches": 0, "embedded": 0, "embed_ms": 0.0, "errors": 0, "last_error": None}
+        _active = self
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model}|{self.dim}|{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vec: list) -> None:
+        self._mem[key] = vec
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.mem_size:
+            self._mem.popitem(last=False)
+
+    # ── Graphiti EmbedderClient interface ────────────────────────────────────
+
+    async def create(self, input_data) -> list:
+        if isinstance(input_data, str):
+            return (await self._embed([input_data]))[0]
+        if isinstance(input_data, list) and len(input_data) == 1 and isinstance(input_data[0], str):
+            return (await self._embed(input_data))[0]
+        return await self.inner.create(input_data)      # token ids etc. — not cached
+
+    async def create_batch(self, input_data_list: list) -> list:
+        return await self._embed(list(input_data_list))
+
+    # ── cache + batching ─────────────────────────────────────────────────────
+
+    async def _embed(self, texts: list) -> list:
+        loop = asyncio.get_running_loop()
+        keys = [self._key(t) for t in texts]
+        found = {}
+        self._stats["texts"] += len(texts)
+
+        for k in keys:
+            if k in self._mem:
+                self._mem.move_to_end(k)
+                found[k] = self._mem[k]
+        self._stats["mem_hits"] += sum(1 for k in keys if k in found)
+
+        cold = [k for k in dict.fromkeys(keys) if k not in found and k not in self._inflight]
+        if cold:
+            try:
+                disk = await loop.run_in_executor(None, self.store.get_many, cold)
+            except Exception as e:
+                disk = {}
+                self._stats["last_error"] = f"disk read: {e}"
+            for k, v in disk.items():
+                self._remember(k, v)
+            found.update(disk)
+            self._stats["disk_hits"] += sum(1 for k in keys if k in disk)
+
+        waits = {}
+        for k, t in zip(keys, texts):
+            if k in found or k in waits:
+                continue
+            fut = self._inflight.get(k)
+            if fut is not None and fut.cancelled():
+                self._inflight.pop(k, None)
+                fut = None
+            if fut is not None and fut.get_loop() is loop:
+                self._stats["joined"] += 1
+                waits[k] = fut
+            else:
+                self._stats["misses"] += 1
+                waits[k] = self._enqueue(loop, k, t)
+        if waits:
+            # shield: a cancelled caller (wait_for / run_async timeout) must not
+            # cancel the shared future the other callers of that text wait on
+            vecs = await asyncio.gather(*(asyncio.shield(f) for f in waits.values()))
+            found.update(zip(waits.keys(), vecs))
+        return [found[k] for k in keys]
+
+    def _enqueue(self, loop, key: str, text: str) -> asyncio.Future:
+        if self._batch_loop is not None and self._batch_loop is not loop:
+            # Another event loop (e.g. a CLI script) — embed on its own, unbatched
+            return loop.create_task(self._call_inner({key: text}, track=False))
+        fut = loop.create_future()
+        self._inflight[key] = fut
+        self._queue[key] = text
+        self._batch_loop = loop
+        if len(self._queue) >= EMBED_BATCH_MAX:
+            self._flush_now()
+        elif self._batch_handle is None:
+            self._batch_handle = loop.call_later(EMBED_BATCH_WINDOW_MS / 1000, self._flush_now)
+        return fut
+
+    def _flush_now(self) -> None:
+        if self._batch_handle is not None:
+            self._batch_handle.cancel()
+            self._batch_handle = None
+        batch, self._queue = self._queue, {}
+        loop, self._batch_loop = self._batch_loop, None
+        if batch:
+            loop.create_task(self._call_inner(batch))
+
+    async def _call_inner(self, batch: dict, track: bool = True):
+        """One Ollama call for the whole batch; resolves the waiting futures."""
+        keys, texts = list(batch.keys()), list(batch.values())
+        t0 = time.perf_counter()
+        try:
+            try:
+                vecs = await self.inner.create_batch(texts) if len(texts) > 1 else [await self.inner.create(texts[0])]
+            except NotImplementedError:
+                vecs = [await self.inner.create(t) for t in texts]
+            if len(vecs) != len(texts):
+                raise RuntimeError(f"embedder returned {len(vecs)} vectors for {len(texts)} texts")
+        except asyncio.CancelledError:
+            # batch task cancelled (loop shutdown) — fail the waiters, do not leave them hanging
+            if track:
+                for k in keys:
+                    fut = self._inflight.pop(k, None)
+                    if fut is not None and not fut.done():
+                        fut.set_exception(RuntimeError("embedding batch cancelled"))
+            raise
+        except Exception as e:
+            self._stats["errors"] += 1
+            self._stats["last_error"] = str(e)
+            if not track:
+                raise
+            for k in keys:
+                fut = self._inflight.pop(k, None)
+                if fut is not None and not fut.done():
+                    fut.set_exception(e)
+            return None
+
+        self._stats["batches"] += 1
+        self._stats["embedded"] += len(texts)
+        self._stats["embed_ms"] += (time.perf_counter() - t0) * 1000
+        for k, v in zip(keys, vecs):
+            self._remember(k, v)
+            fut = self._inflight.pop(k, None) if track else None
+            if fut is not None and not fut.done():
+                fut.set_result(v)
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.store.put_many, self.model, self.dim, dict(zip(keys, vecs))
+            )
+        except Exception as e:
+            self._stats["last_error"] = f"disk write: {e}"
+            print(f"[EmbedCache] ⚠️ could not persist {len(keys)} embeddings: {e}")
+        return vecs[0] if not track else None
+
+    def stats(self) -> dict:
+        s = dict(self._stats)
+        hits = s["mem_hits"] + s["disk_hits"] + s["joined"]
+        per_text = s["embed_ms"] / s["embedded"] if s["embedded"] else None
+        try:
+            disk_rows = self.store.count()
+        except Exception:
+            disk_rows = None
+        return {
+            "enabled":          EMBED_CACHE,
+            "model":            self.model,
+            "dim":              self.dim,
+            "hit_rate":         round(hits / s["texts"], 3) if s["texts"] else None,
+            "mem_entries":      len(self._mem),
+            "disk_entries":     disk_rows,
+            "avg_embed_ms":     round(per_text, 1) if per_text else None,
+            "saved_ms":         round(hits * per_text) if per_text else None,
+            "avg_batch_size":   round(s["embedded"] / s["batches"], 1) if s["batches"] else None,
+            "pending":          len(self._queue),
+            **{k: round(v, 1) if isinstance(v, float) else v for k, v in s.items()},
+        }
+
+
+def stats() -> dict:
+    """Stats of the embedder Graphiti is using ({} before the first get_graphiti())."""
+    return _active.stats() if _active is not None else {"enabled": EMBED_CACHE}
@@ -163,6 +163,15 @@ class OllamaCloudLLMClient(LLMClient):
         return {"content": content}
 
 
+class _WarmPoolTimedClient(OpenAIGenericClient):
+    """Local extraction client that reports each call to the model warm pool."""
+
+    async def _generate_response(self, *args, **kwargs):
+        from utils.model_warmpool import atrack_call
+        async with atrack_call(self.model):
+            return await super()._generate_response(*args, **kwargs)
+
+
 def _build_llm_client():
     """
     Build LLM client for Graphiti entity extraction.
@@ -196,13 +205,15 @@ def _build_llm_client():
         timeout=httpx.Timeout(300.0),
         max_retries=0
     )
-    return OpenAIGenericClient(config=config, client=custom_client)
+    return _WarmPoolTimedClient(config=config, client=custom_client)
 
 
-def _build_embedder() -> OpenAIEmbedder:
+def _build_embedder():
     """
     Build an Embedder pointed at local Ollama/nomic-embed-text.
     First run: ollama pull nomic-embed-text  (~274 MB, one-time)
+    Wrapped in the persistent embedding cache (memory/embedding_cache.py)
+    unless EMBED_CACHE=false.
     """
     from openai import AsyncOpenAI
     import httpx
@@ -221,7 +232,12 @@ def _build_embedder() -> OpenAIEmbedder:
         max_retries=0
     )
     
-    return OpenAIEmbedder(config=config, client=custom_client)
+    embedder = OpenAIEmbedder(config=config, client=custom_client)
+
+    from memory.embedding_cache import EMBED_CACHE, CachingEmbedder
+    if EMBED_CACHE:
+        return CachingEmbedder(embedder, model=OLLAMA_EMBED_MODEL, dim=OLLAMA_EMBED_DIM)
+    return embedder
 
 
 async def get_graphiti() -> Graphiti:
@@ -0,0 +1,232 @@
+"""
+Incident Coalescing for UTLMediCore
+===================================
+While a patient stays critical (lying after a fall, sustained tachycardia, a
+hypoxia run) every reading used to take the Tier-1 path in
+PatientState.add_data: a VitalReading, an AlertEvent and a full Graphiti LLM
+extraction per reading — dozens of episodes per minute about ONE event.
+
+IncidentTracker (one per PatientState) turns such a run into one incident:
+
+    open      first critical reading             → snapshot + AlertEvent + Graphiti
+    escalate  new kind (fall on top of hypoxia)  → snapshot + AlertEvent + Graphiti
+              or a higher severity level           (while the LLM budget lasts)
+    update    every other critical reading       → running stats only; a
+                                                   VitalReading at most every
+                                                   INCIDENT_UPDATE_SEC
+    close     INCIDENT_CLOSE_READINGS normal      → snapshot + Graphiti summary
+              readings in a row, or no critical    (duration, min SpO2, max HR)
+              reading for INCIDENT_GAP_SEC — checked on the next reading and
+              by sweep() every INCIDENT_SWEEP_SEC, so an incident whose device
+              went offline is still closed
+
+Graphiti calls per incident are capped at INCIDENT_MAX_LLM, one of them kept
+for the close summary. The incident itself is upserted in place by the direct
+writer:
+
+    (:Incident {uuid, device_id, status, kinds, level, severity, started_utc,
+                last_seen_utc, ended_utc, duration_sec, readings,
+                hr_min, hr_max, spo2_min, escalations, llm_calls})
+    (Patient)-[:HAD_INCIDENT]->(Incident)
+
+Set INCIDENTS=false for the old per-reading behaviour.
+"""
+
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+
+INCIDENTS               = os.getenv("INCIDENTS", "true").lower() == "true"
+INCIDENT_CLOSE_READINGS = int(os.getenv("INCIDENT_CLOSE_READINGS", "5"))
+INCIDENT_GAP_SEC        = int(os.getenv("INCIDENT_GAP_SEC", "300"))
+INCIDENT_UPDATE_SEC     = int(os.getenv("INCIDENT_UPDATE_SEC", "30"))
+INCIDENT_MAX_LLM        = int(os.getenv("INCIDENT_MAX_LLM", "4"))
+INCIDENT_SWEEP_SEC      = int(os.getenv("INCIDENT_SWEEP_SEC", "60"))
+
+# Base severity level per kind; +1 when the reading is in the severe band
+_KIND_LEVEL = {"fall": 3, "hypoxia": 2, "tachycardia": 1, "bradycardia": 1}
+
+
+def critical_kinds(hr: int, spo2: int, posture: int) -> set:
+    """Same thresholds as the Tier-1 check in PatientState.add_data."""
+    kinds = set()
+    if posture == 5:
+        kinds.add("fall")
+    if hr > 110:
+        kinds.add("tachycardia")
+    elif 0 < hr < 45:
+        kinds.add("bradycardia")
+    if 0 < spo2 < 90:
+        kinds.add("hypoxia")
+    return kinds
+
+
+def severity_level(kinds: set, hr: int, spo2: int) -> int:
+    if not kinds:
+        return 0
+    severe = (0 < spo2 < 85) or hr >= 140 or (0 < hr < 40)
+    return max(_KIND_LEVEL[k] for k in kinds) + (1 if severe else 0)
+
+
+def _utc(ts: datetime) -> str:
+    return ts.astimezone(timezone.utc).isoformat()
+
+
+class Incident:
+    def __init__(self, device_id: str, kinds: set, hr: int, spo2: int, ts: datetime):
+        self.uuid = str(uuid.uuid4())
+        self.device_id = device_id
+        self.kinds = set(kinds)
+        self.level = severity_level(kinds, hr, spo2)
+        self.started = self.last_seen = ts
+        self.ended = None
+        self.readings = 0
+        self.hr_min = self.hr_max = self.spo2_min = None
+        self.escalations = 0
+        self.llm_calls = 0
+        self.last_written = None
+        self._fold(hr, spo2, ts)
+
+    def _fold(self, hr: int, spo2: int, ts: datetime) -> None:
+        self.readings += 1
+        self.last_seen = ts
+        if hr > 0:
+            self.hr_min = hr if self.hr_min is None else min(self.hr_min, hr)
+            self.hr_max = hr if self.hr_max is None else max(self.hr_max, hr)
+        if spo2 > 0:
+            self.spo2_min = spo2 if self.spo2_min is None else min(self.spo2_min, spo2)
+
+    def update(self, kinds: set, hr: int, spo2: int, ts: datetime) -> bool:
+        """Fold a critical reading in. True when it escalates the incident."""
+        self._fold(hr, spo2, ts)
+        level = severity_level(kinds, hr, spo2)
+        escalated = bool(kinds - self.kinds) or level > self.level
+        self.kinds |= kinds
+        self.level = max(self.level, level)
+        if escalated:
+            self.escalations += 1
+        return escalated
+
+    @property
+    def duration_sec(self) -> int:
+        return int(((self.ended or self.last_seen) - self.started).total_seconds())
+
+    def row(self) -> dict:
+        return {
+            "uuid":          self.uuid,
+            "device_id":     self.device_id,
+            "status":        "closed" if self.ended else "open",
+            "kinds":         sorted(self.kinds),
+            "level":         self.level,
+            "severity":      "critical" if self.level >= 3 else "warning",
+            "started_utc":   _utc(self.started),
+            "last_seen_utc": _utc(self.last_seen),
+            "ended_utc":     _utc(self.ended) if self.ended else None,
+            "duration_sec":  self.duration_sec,
+            "readings":      self.readings,
+            "hr_min":        self.hr_min,
+            "hr_max":        self.hr_max,
+            "spo2_min":      self.spo2_min,
+            "escalations":   self.escalations,
+            "llm_calls":     self.llm_calls,
+        }
+
+    def summary(self, action: str) -> str:
+        """One sentence for the Graphiti episode of open / escalate / close."""
+        kinds = ", ".join(sorted(self.kinds))
+        mins, secs = divmod(self.duration_sec, 60)
+        stats = []
+        if self.hr_max is not None:
+            stats.append(f"HR range {self.hr_min}-{self.hr_max} bpm")
+        if self.spo2_min is not None:
+            stats.append(f"lowest SpO2 {self.spo2_min}%")
+        stats = f" ({'; '.join(stats)})" if stats else ""
+        if action == "open":
+            return f"Incident started at {self.started.strftime('%H:%M')}: {kinds}."
+        if action == "escalate":
+            return (f"Incident escalated to level {self.level} after {mins}m {secs}s: "
+                    f"now {kinds}{stats}.")
+        return (f"Incident resolved at {(self.ended or self.last_seen).strftime('%H:%M')} "
+                f"after {mins}m {secs}s and {self.readings} critical readings: {kinds}{stats}.")
+
+
+class IncidentTracker:
+    """
+    Coalesces consecutive critical readings of one patient.
+
+    observe() returns a list of decisions (usually 0 or 1; 2 when a stale
+    incident is closed and a new one opened):
+        {"action": open|escalate|update|close, "incident": row, "llm": bool,
+         "summary": str, "write": bool}
+    `write` False means: stats updated in memory only, nothing to persist.
+    """
+
+    def __init__(self, device_id: str):
+        self.device_id = device_id
+        self.current = None
+        self._normal_run = 0
+        self.closed = 0
+        self._lock = threading.Lock()       # observe() (sensor thread) vs sweep() (sweeper)
+
+    def _decision(self, action: str, write: bool = True) -> dict:
+        inc = self.current
+        llm = False
+        if action in ("open", "escalate", "close"):
+            # keep the last LLM call for the close summary
+            budget = INCIDENT_MAX_LLM if action == "close" else INCIDENT_MAX_LLM - 1
+            llm = inc.llm_calls < budget
+            if llm:
+                inc.llm_calls += 1
+        if write:
+            inc.last_written = inc.last_seen
+        return {"action": action, "incident": inc.row(), "llm": llm,
+                "summary": inc.summary(action), "write": write}
+
+    def _close(self, ended: datetime) -> dict:
+        self.current.ended = ended
+        decision = self._decision("close")
+        self.current = None
+        self._normal_run = 0
+        self.closed += 1
+        return decision
+
+    def sweep(self, now: datetime = None) -> list:
+        """Close the incident if no reading came for INCIDENT_GAP_SEC (device offline)."""
+        now = now or datetime.now()
+        with self._lock:
+            if self.current and (now - self.current.last_seen).total_seconds() > INCIDENT_GAP_SEC:
+                return [self._close(self.current.last_seen)]
+        return []
+
+    def observe(self, hr: int, spo2: int, posture: int, ts: datetime = None) -> list:
+        with self._lock:
+            return self._observe(hr, spo2, posture, ts)
+
+    def _observe(self, hr: int, spo2: int, posture: int, ts: datetime = None) -> list:
+        ts = ts or datetime.now()
+        kinds = critical_kinds(hr, spo2, posture)
+        decisions = []
+
+        if self.current and (ts - self.current.last_seen).total_seconds() > INCIDENT_GAP_SEC:
+            decisions.append(self._close(self.current.last_seen))
+
+        if kinds:
+            self._normal_run = 0
+            if self.current is None:
+                self.current = Incident(self.device_id, kinds, hr, spo2, ts)
+                decisions.append(self._decision("open"))
+            elif self.current.update(kinds, hr, spo2, ts):
+                decisions.append(self._decision("escalate"))
+            else:
+                due = (ts - self.current.last_written).total_seconds() >= INCIDENT_UPDATE_SEC
+                decisions.append(self._decision("update", write=due))
+        elif self.current is not None:
+            self._normal_run += 1
+            if self._normal_run >= INCIDENT_CLOSE_READINGS:
+                decisions.append(self._close(ts))
+
+        return decisions
+
+    def status(self) -> dict:
+        return {"open": self.current.row() if self.current else None, "closed": self.closed}
@@ -0,0 +1,266 @@
+"""
+Durable Graphiti Ingestion Queue for UTLMediCore
+================================================
+Graphiti episodes used to be fire-and-forget futures on the memory loop:
+serialized through one global lock, up to 90 s each, lost on restart and piling up
+without bound when the local LLM was slow. add_episode() now only appends to
+this SQLite-backed queue; a fixed pool of async workers drains it.
+
+- durable      : GRAPHITI_QUEUE_PATH (SQLite, WAL); rows left 'inflight' by a
+                 crash are requeued on startup
+- priorities   : falls / critical vitals first, routine heartbeats last
+                 (see PRIORITY; lower = sooner)
+- workers      : GRAPHITI_WORKERS async tasks on the PatientMemory loop; the
+                 LLM call itself is capped by the 'extraction' lane
+                 (memory/async_lanes.py, LANE_EXTRACTION_CONCURRENCY)
+- retries      : exponential backoff (GRAPHITI_RETRY_BASE_SEC * 2^attempt,
+                 capped at GRAPHITI_RETRY_MAX_SEC), 'failed' after
+                 GRAPHITI_MAX_ATTEMPTS
+- dedup        : identical (device, type, content) is stored once; the episode
+                 name carries the row id, and a retry skips Graphiti when that
+                 episode was already saved (timeout after the write)
+- cancellation : a cancelled ingestion is retried like a failure; a worker
+                 cancelled mid-row puts the row back before it exits
+- metrics      : depth per state / priority, oldest pending age, counters
+                 (see stats(), served by /api/graphiti-queue)
+
+Set GRAPHITI_QUEUE=false to call Graphiti inline as before.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+GRAPHITI_QUEUE          = os.getenv("GRAPHITI_QUEUE", "true").lower() == "true"
+GRAPHITI_QUEUE_PATH     = os.getenv("GRAPHITI_QUEUE_PATH", os.path.join("reports", "graphiti_queue.db"))
+GRAPHITI_WORKERS        = int(os.getenv("GRAPHITI_WORKERS", "1"))
+GRAPHITI_MAX_ATTEMPTS   = int(os.getenv("GRAPHITI_MAX_ATTEMPTS", "5"))
+GRAPHITI_RETRY_BASE_SEC = float(os.getenv("GRAPHITI_RETRY_BASE_SEC", "30"))
+GRAPHITI_RETRY_MAX_SEC  = float(os.getenv("GRAPHITI_RETRY_MAX_SEC", "1800"))
+GRAPHITI_KEEP_DONE_H    = int(os.getenv("GRAPHITI_KEEP_DONE_H", "24"))   # dedup window for finished rows
+
+# episode_type -> priority (lower is served first)
+PRIORITY = {
+    "critical_fall":       0,
+    "critical_vitals":     0,
+    "alert":               1,
+    "incident_closed":     1,
+    "low_oxygen":          2,
+    "abnormal_hr":         2,
+    "metabolic_alert":     3,
+    "baseline":            4,
+    "routine_observation": 9,
+}
+DEFAULT_PRIORITY = 5        # manual context (meal, medication, ...) and anything else
+
+_POLL_SEC = 1.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    content_hash    TEXT NOT NULL UNIQUE,
+    device_id       TEXT NOT NULL,
+    episode_type    TEXT NOT NULL,
+    content         TEXT NOT NULL,
+    properties      TEXT,
+    reference_time  TEXT NOT NULL,
+    priority        INTEGER NOT NULL,
+    state           TEXT NOT NULL DEFAULT 'pending',   -- pending | inflight | done | failed
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    enqueued_at     REAL NOT NULL,
+    finished_at     REAL,
+    last_error      TEXT
+);
+CREATE INDEX IF NOT EXISTS episodes_ready ON episodes (state, priority, next_attempt_at, id);
+"""
+
+
+def _hash(device_id: str, episode_type: str, content: str) -> str:
+    return hashlib.sha1(f"{device_id}|{episode_type}|{content}".encode("utf-8")).hexdigest()
+
+
+class GraphitiIngestQueue:
+    """SQLite-backed priority queue + async worker pool for Graphiti episodes."""
+
+    def __init__(self, path: str = GRAPHITI_QUEUE_PATH, workers: int = GRAPHITI_WORKERS):
+        self.path = path
+        self.n_workers = max(workers, 1)
+        self._lock = threading.Lock()
+        self._db = None
+        self._workers = []
+        self._wake = None
+        self._loop = None
+        self._stats = {"enqueued": 0, "deduped": 0, "processed": 0, "retried": 0,
+                       "failed": 0, "process_ms": [], "last_error": None}
+
+    # ── storage (sync, short; called via the default executor from the loop) ──
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+            n = db.execute("UPDATE episodes SET state='pending' WHERE state='inflight'").rowcount
+            if n:
+                print(f"[GraphitiQueue] ♻️ Requeued {n} episodes left in-flight by the last run")
+            self._db = db
+        return self._db
+
+    def enqueue(self, device_id: str, content: str, episode_type: str = "observation",
+                reference_time: datetime = None, properties: dict = None) -> bool:
+        """Persist an episode. Returns False when an identical one is already queued/done."""
+        now = time.time()
+        ref = (reference_time or datetime.now()).isoformat()
+        with self._lock:
+            db = self._conn()
+            db.execute("DELETE FROM episodes WHERE state='done' AND finished_at < ?",
+                       (now - GRAPHITI_KEEP_DONE_H * 3600,))
+            # Identical content is stored once; only a 'failed' row is revived
+            cur = db.execute(
+                """INSERT INTO episodes
+                   (content_hash, device_id, episode_type, content, properties, reference_time,
+                    priority, next_attempt_at, enqueued_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(content_hash) DO UPDATE
+                   SET state='pending', attempts=0, next_attempt_at=excluded.next_attempt_at
+                   WHERE episodes.state='failed'""",
+                (_hash(device_id, episode_type, content), device_id, episode_type, content,
+                 json.dumps(properties) if properties else None, ref,
+                 PRIORITY.get(episode_type, DEFAULT_PRIORITY), now, now),
+            )
+        if cur.rowcount == 0:
+            self._stats["deduped"] += 1
+            return False
+        self._stats["enqueued"] += 1
+        if self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        return True
+
+    def _claim(self):
+        """Mark the most urgent ready row inflight and return it (or None)."""
+        with self._lock:
+            db = self._conn()
+            row = db.execute(
+                """SELECT * FROM episodes
+                   WHERE state='pending' AND next_attempt_at <= ?
+                   ORDER BY priority, next_attempt_at, id LIMIT 1""",
+                (time.time(),),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE episodes SET state='inflight', attempts=attempts+1 WHERE id=?", (row["id"],))
+            return dict(row, attempts=row["attempts"] + 1)
+
+    def _finish(self, row_id: int, error: str = None, attempts: int = 0) -> str:
+        with self._lock:
+            db = self._conn()
+            if error is None:
+                db.execute("UPDATE episodes SET state='done', finished_at=?, last_error=NULL WHERE id=?",
+                           (time.time(), row_id))
+                return "done"
+            if attempts >= GRAPHITI_MAX_ATTEMPTS:
+                db.execute("UPDATE episodes SET state='failed', finished_at=?, last_error=? WHERE id=?",
+                           (time.time(), error, row_id))
+                return "failed"
+            delay = min(GRAPHITI_RETRY_BASE_SEC * 2 ** (attempts - 1), GRAPHITI_RETRY_MAX_SEC)
+            db.execute("UPDATE episodes SET state='pending', next_attempt_at=?, last_error=? WHERE id=?",
+                       (time.time() + delay, error, row_id))
+            return f"retry in {delay:.0f}s"
+
+    # ── workers (on the PatientMemory event loop) ──────────────────────────────
+
+    async def _process(self, row: dict) -> None:
+        from memory.patient_memory import PatientMemory
+        await PatientMemory(row["device_id"]).ingest_episode(
+            row["content"],
+            episode_type=row["episode_type"],
+            reference_time=datetime.fromisoformat(row["reference_time"]),
+            properties=json.loads(row["properties"]) if row["properties"] else None,
+            episode_key=f"q{row['id']}",
+            check_existing=row["attempts"] > 1 or bool(row["last_error"]),
+        )
+
+    async def _worker(self, n: int) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                row = await loop.run_in_executor(None, self._claim)
+            except Exception as e:
+                print(f"[GraphitiQueue] worker {n}: claim failed: {e}")
+                row = None
+            if row is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=_POLL_SEC)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            t0 = time.perf_counter()
+            error = None
+            try:
+                await self._process(row)
+            except asyncio.CancelledError:
+                error = "CancelledError: ingestion cancelled"
+                task = asyncio.current_task()
+                if task is not None and getattr(task, "cancelling", lambda: 0)():
+                    # the worker itself is stopping — put the row back, then exit
+                    self._finish(row["id"], error, row["attempts"])
+                    raise
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"[:500]
+            outcome = await loop.run_in_executor(None, self._finish, row["id"], error, row["attempts"])
+
+            if error is None:
+                self._stats["processed"] += 1
+                self._stats["process_ms"] = (self._stats["process_ms"] + [(time.perf_counter() - t0) * 1000])[-200:]
+            else:
+                self._stats["last_error"] = error
+                self._stats["failed" if outcome == "failed" else "retried"] += 1
+                print(f"[GraphitiQueue] ⚠️ [{row['episode_type']}] {row['device_id']} "
+                      f"attempt {row['attempts']}: {error} — {outcome}")
+
+    async def start(self) -> int:
+        """Start the worker pool on the running loop (idempotent). Returns worker count."""
+        if self._workers:
+            return len(self._workers)
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        await asyncio.get_running_loop().run_in_executor(None, self._conn)
+        self._workers = [asyncio.ensure_future(self._worker(i)) for i in range(self.n_workers)]
+        print(f"[GraphitiQueue] {self.n_workers} worker(s) started ({self.path})")
+        return len(self._workers)
+
+    def stats(self) -> dict:
+        with self._lock:
+            db = self._conn()
+            by_state = {r["state"]: r["n"] for r in db.execute(
+                "SELECT state, COUNT(*) AS n FROM episodes GROUP BY state")}
+            by_priority = {str(r["priority"]): r["n"] for r in db.execute(
+                "SELECT priority, COUNT(*) AS n FROM episodes WHERE state='pending' GROUP BY priority")}
+            oldest = db.execute(
+                "SELECT MIN(enqueued_at) AS t FROM episodes WHERE state IN ('pending','inflight')").fetchone()["t"]
+        ms = sorted(self._stats["process_ms"])
+        return {
+            "enabled":            GRAPHITI_QUEUE,
+            "path":               self.path,
+            "workers":            len(self._workers),
+            "depth":              by_state.get("pending", 0) + by_state.get("inflight", 0),
+            "by_state":           by_state,
+            "pending_by_priority": by_priority,
+            "oldest_pending_sec": round(time.time() - oldest, 1) if oldest else 0,
+            "process_ms":         {"p50": round(ms[len(ms) // 2], 1), "max": round(ms[-1], 1)} if ms else {},
+            **{k: v for k, v in self._stats.items() if k != "process_ms"},
+        }
+
+
+INGEST_QUEUE = GraphitiIngestQueue()
@@ -0,0 +1,396 @@
+"""
+In-Process Memory Backend for UTLMediCore
+=========================================
+Every memory path needs a live Neo4j and an Ollama instance, so ingestion,
+the agents and the reports could not be profiled or load-tested without the
+full stack. With MEMORY_BACKEND=inprocess, PatientMemory(device_id) returns an
+InProcessPatientMemory instead — same public API, nothing leaves the process:
+
+- store       : per patient, episodes / VitalReading rows / AlertEvents kept
+                sorted by time (bisect seeks for windows and top-k reads) plus
+                a minute_of_day index for get_episodes_by_time_range; Segment
+                rows (memory/sessionizer.py) by uuid
+- extraction  : deterministic fake of Graphiti's LLM step — sensor episodes
+                are parsed back into facts (posture + location, HR, SpO2,
+                condition); free text is split into sentences
+- search      : hashed bag-of-words embeddings (INPROCESS_EMBED_DIM), brute-
+                force cosine top-k with numpy over all facts of the patient
+- no queue    : add_episode() "extracts" inline; no Graphiti ingestion queue,
+                no direct writer, no activity rollups or schema bootstrap
+
+Text formats match the Neo4j backend, so agents and reports run unchanged.
+Data lives as long as the process (STORE.clear() resets it).
+
+Load test at ward scale: python evaluation/ward_load_bench.py
+"""
+
+import bisect
+import hashlib
+import itertools
+import os
+import re
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from memory.patient_memory import (
+    EPISODE_PROPS, SAMPLE_ALIGN_SEC, _BUCKET_SCAN, _PREAMBLE_TAG, PatientMemory,
+    _duration_stats, _encoding_preamble, _minute_ranges, _parse_episode_text,
+    _pick_representative, _time_buckets, _time_of_day_props,
+)
+from memory.read_cache import READ_CACHE
+
+INPROCESS_EMBED_DIM = int(os.getenv("INPROCESS_EMBED_DIM", "256"))
+INPROCESS_MAX_FACTS = int(os.getenv("INPROCESS_MAX_FACTS", "8"))   # per free-text episode
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+def _local(ts) -> datetime:
+    """Naive local datetime — the clock sensor snapshots are written in."""
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    if ts.tzinfo is not None:
+        ts = ts.astimezone().replace(tzinfo=None)
+    return ts
+
+
+def embed(text: str, dim: int = INPROCESS_EMBED_DIM) -> np.ndarray:
+    """Deterministic hashed bag of words + bigrams, L2-normalised (no model)."""
+    vec = np.zeros(dim, dtype=np.float32)
+    words = _TOKEN.findall((text or "").lower())
+    for tok in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        h = int.from_bytes(hashlib.blake2b(tok.encode(), digest_size=8).digest(), "little")
+        vec[h % dim] += 1.0 if (h >> 63) else -1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def fake_extract(device_id: str, content: str, reference_time: datetime) -> list:
+    """
+    Stand-in for Graphiti's entity/fact extraction: facts as short sentences.
+    Sensor episodes (verbose or compact) are parsed with _parse_episode_text;
+    anything else (alerts, manual context, baselines) is split into sentences.
+    """
+    clean_id = device_id.replace("_", "-")
+    at = reference_time.strftime("%Y-%m-%d %H:%M")
+    f = _parse_episode_text(content)
+    facts = []
+    if f.get("posture_label") or f.get("area_label"):
+        facts.append(f"Patient {clean_id} was {(f.get('posture_label') or 'active').lower()} "
+                     f"in {f.get('area_label') or 'an unknown area'} at {at}")
+    if f.get("hr"):
+        facts.append(f"Patient {clean_id} had heart rate {f['hr']} bpm at {at}")
+    if f.get("spo2"):
+        facts.append(f"Patient {clean_id} had blood oxygen SpO2 {f['spo2']}% at {at}")
+    if f.get("condition") and f["condition"] != "routine_observation":
+        facts.append(f"Patient {clean_id} had a {f['condition'].replace('_', ' ')} event at {at}")
+
+    sentences = [s.strip() for s in _SENTENCE.split((content or "").strip()) if len(s.strip()) > 12]
+    if facts:
+        # incident summaries appended to a sensor episode
+        facts += [s for s in sentences if s.startswith("Incident ")]
+    else:
+        facts = sentences[:INPROCESS_MAX_FACTS]
+    return facts
+
+
+class _TimeIndex:
+    """Rows kept sorted by timestamp; windows and top-k reads are bisect seeks."""
+
+    def __init__(self):
+        self._keys = []             # (ts, seq)
+        self._rows = []
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, ts: datetime, row: dict) -> None:
+        key = (ts, next(self._seq))
+        i = bisect.bisect_right(self._keys, key)
+        self._keys.insert(i, key)
+        self._rows.insert(i, row)
+
+    def between(self, start: datetime = None, end: datetime = None) -> list:
+        """Rows with start <= ts < end, oldest first."""
+        lo = 0 if start is None else bisect.bisect_left(self._keys, (start, -1))
+        hi = len(self._keys) if end is None else bisect.bisect_left(self._keys, (end, -1))
+        return self._rows[lo:hi]
+
+    def before(self, ts: datetime):
+        i = bisect.bisect_left(self._keys, (ts, -1))
+        return self._rows[i - 1] if i else None
+
+    def latest(self, n: int) -> list:
+        return self._rows[-n:][::-1] if n > 0 else []
+
+
+class _VectorIndex:
+    """Fact embeddings in one growable float32 matrix; search is a brute-force dot product."""
+
+    def __init__(self, dim: int):
+        self._vecs = np.zeros((64, dim), dtype=np.float32)
+        self.facts = []
+
+    def add(self, fact: str) -> None:
+        n = len(self.facts)
+        if n == len(self._vecs):
+            self._vecs = np.concatenate([self._vecs, np.zeros_like(self._vecs)])
+        self._vecs[n] = embed(fact, self._vecs.shape[1])
+        self.facts.append(fact)
+
+    def search(self, query: str, k: int) -> list:
+        n = len(self.facts)
+        if not n or k <= 0:
+            return []
+        scores = self._vecs[:n] @ embed(query, self._vecs.shape[1])
+        top = np.argpartition(-scores, min(k, n) - 1)[:k]
+        return [self.facts[i] for i in sorted(top, key=lambda i: -scores[i]) if scores[i] > 0]
+
+
+class _PatientStore:
+    def __init__(self):
+        self.episodes = _TimeIndex()
+        self.by_minute = [[] for _ in range(1440)]      # minute_of_day → episodes
+        self.vitals = _TimeIndex()
+        self.alerts = _TimeIndex()
+        self.manual = {}                                # uuid → ManualContext row
+        self.incidents = {}                             # uuid → Incident row
+        self.segments = {}                              # uuid → Segment row (checkpoints upsert)
+        self.facts = _VectorIndex(INPROCESS_EMBED_DIM)
+
+
+class InProcessStore:
+    """All patients' data; one lock, since sync (Flask) and async (loop) methods share it."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._patients = {}
+
+    def patient(self, device_id: str) -> _PatientStore:
+        with self.lock:
+            if device_id not in self._patients:
+                self._patients[device_id] = _PatientStore()
+            return self._patients[device_id]
+
+    def clear(self) -> None:
+        with self.lock:
+            self._patients.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                dev: {"episodes": len(p.episodes), "vitals": len(p.vitals), "alerts": len(p.alerts),
+                      "manual": len(p.manual), "incidents": len(p.incidents), "segments": len(p.segments),
+                      "facts": len(p.facts.facts)}
+                for dev, p in self._patients.items()
+            }
+
+
+STORE = InProcessStore()
+
+
+class InProcessPatientMemory(PatientMemory):
+    """PatientMemory on the in-process store — selected by MEMORY_BACKEND=inprocess."""
+
+    @property
+    def _store(self) -> _PatientStore:
+        return STORE.patient(self.device_id)
+
+    # ── writes ────────────────────────────────────────────────────────────────
+
+    async def add_episode(self, content: str, episode_type: str = "observation",
+                          reference_time=None, properties=None) -> None:
+        await self.ingest_episode(content, episode_type, reference_time or datetime.now(), properties)
+
+    async def ingest_episode(self, content: str, episode_type: str, reference_time, properties=None,
+                             episode_key=None, check_existing=False) -> None:
+        ref = _local(reference_time)
+        row = {
+            "uuid":    str(uuid.uuid4()),
+            "name":    f"{episode_type}_{ref.strftime('%Y%m%d_%H%M%S')}",
+            "content": content,
+            "valid_at": ref,
+            **_time_of_day_props(ref, self.device_id),
+            **{k: v for k, v in (properties or {}).items() if k in EPISODE_PROPS and v is not None},
+        }
+        facts = fake_extract(self.device_id, content, ref)
+        store = self._store
+        with STORE.lock:
+            store.episodes.add(ref, row)
+            store.by_minute[row["minute_of_day"]].append(row)
+            for fact in facts:
+                store.facts.add(fact)
+        READ_CACHE.bump(self.device_id)
+
+    async def _write_layer1(self, structured: dict, burned: int, now: datetime, episode_type: str,
+                            severity_label: str, incident=None) -> None:
+        store = self._store
+        with STORE.lock:
+            store.vitals.add(now, {**structured, "kcal": burned, "valid_at": now})
+            alert_due = incident is None or incident["action"] in ("open", "escalate")
+            if episode_type != "routine_observation" and alert_due:
+                store.alerts.add(now, {
+                    "alert_type": episode_type,
+                    "severity":   "critical" if "critical" in episode_type else "warning",
+                    "message":    severity_label,
+                    "incident_id": incident["incident"]["uuid"] if incident else None,
+                    "valid_at":   now,
+                })
+            if incident is not None:
+                store.incidents[incident["incident"]["uuid"]] = dict(incident["incident"])
+
+    async def _write_incident(self, incident_row: dict) -> None:
+        with STORE.lock:
+            self._store.incidents[incident_row["uuid"]] = dict(incident_row)
+
+    async def _ensure_encoding_preamble(self) -> None:
+        if getattr(self, "_preamble_sent", False):
+            return
+        self._preamble_sent = True
+        with STORE.lock:
+            found = any(r.get("encoding") == _PREAMBLE_TAG for r in self._store.episodes.between())
+        if not found:
+            await self.add_episode(_encoding_preamble(self.device_id), episode_type="baseline",
+                                   properties={"encoding": _PREAMBLE_TAG})
+
+    def add_manual_context_sync(self, content: str, context_type: str, reference_time=None) -> bool:
+        node_id = str(uuid.uuid4())
+        with STORE.lock:
+            self._store.manual[node_id] = {
+                "id": node_id, "name": context_type, "content": content,
+                "reference_time": _local(reference_time or datetime.now()),
+            }
+        READ_CACHE.bump(self.device_id)
+        print(f"[Memory] [OK] ManualContext saved (in-process): [{context_type}] for {self.device_id}")
+        return True
+
+    def delete_manual_context_sync(self, node_id: str) -> bool:
+        with STORE.lock:
+            self._store.manual.pop(node_id, None)
+        READ_CACHE.bump(self.device_id)
+        return True
+
+    # ── reads ─────────────────────────────────────────────────────────────────
+
+    async def _search_facts(self, query: str, limit: int) -> str:
+        with STORE.lock:
+            facts = self._store.facts.search(query, limit)
+        if not facts:
+            return ""
+        return ("Patient Memory Context — extracted facts (from Graphiti knowledge graph):\n"
+                + "\n".join(f"- {fact}" for fact in facts))
+
+    async def _tier2_context(self, limit: int, session=None) -> str:
+        store = self._store
+        with STORE.lock:
+            records = [(r["valid_at"], r["content"]) for r in store.episodes.latest(limit)]
+            records += [(r["valid_at"], f"Real-time reading — HR: {r['hr']} | SpO2: {r['spo2']}% | "
+                                        f"Posture: {r['posture_label']} ({r['condition']})")
+                        for r in store.vitals.latest(limit)]
+            records += [(r["valid_at"], f"⚠️ ALERT — {r['alert_type']} [{r['severity']}]: {r['message']}")
+                        for r in store.alerts.latest(limit)]
+        records.sort(key=lambda x: x[0], reverse=True)
+        episodes = [f"[{str(ts)[:16]}] {content.strip()}" for ts, content in records if content][:limit]
+        if not episodes:
+            return ""
+        return (f"Patient Episode & Real-time History — {len(episodes)} recent records:\n"
+                + "\n\n".join(episodes))
+
+    async def _shared_tier2(self, limit: int, hours: int, direct_limit: int) -> str:
+        return (await self._tier2_context(limit)
+                or await self.get_patient_episodes_direct(limit=direct_limit, hours=hours))
+
+    async def get_patient_episodes_direct(self, limit: int = 10, hours: int = 24, session=None) -> str:
+        now = datetime.now()
+        aligned = datetime.fromtimestamp(now.timestamp() // SAMPLE_ALIGN_SEC * SAMPLE_ALIGN_SEC)
+        w_end = aligned - timedelta(hours=24 if hours == 48 else 0)
+        w_start = aligned - timedelta(hours=hours)
+        picked = []
+        with STORE.lock:
+            for b in _time_buckets(w_start, w_end, max(limit, 1)):
+                rows = self._store.episodes.between(datetime.fromisoformat(b["start"]),
+                                                    datetime.fromisoformat(b["end"]))
+                best = _pick_representative(rows[-_BUCKET_SCAN:][::-1])
+                if best:
+                    picked.append(best)
+        episodes = [f"[{str(r['valid_at'])[:16]}] {(r['content'] or '').strip()}" for r in picked]
+        if not episodes:
+            return ""
+        return (f"Patient Episode History — {len(episodes)} recent records:\n"
+                + "\n\n".join(episodes))
+
+    def get_manual_episodes_sync(self, limit: int = 50, hours_back: int = None) -> list:
+        since = datetime.now() - timedelta(hours=hours_back) if hours_back else None
+        with STORE.lock:
+            rows = [r for r in self._store.manual.values() if since is None or r["reference_time"] >= since]
+        rows.sort(key=lambda r: r["reference_time"], reverse=True)
+        return [{
+            "id":        r["id"],
+            "name":      r["name"],
+            "content":   r["content"],
+            "timestamp": r["reference_time"].isoformat() + "Z",   # same shape as the Neo4j backend
+            "source":    "manual",
+        } for r in rows[:limit]]
+
+    def _window(self, hours_back: int) -> tuple:
+        start = datetime.now() - timedelta(hours=hours_back)
+        with STORE.lock:
+            return start, self._store.vitals.between(start), self._store.vitals.before(start)
+
+    async def store_segments(self, rows: list) -> None:
+        with STORE.lock:
+            for row in rows:
+                self._store.segments[row["uuid"]] = dict(row)
+        READ_CACHE.bump(self.device_id)
+
+    async def _segment_rows(self, start: datetime, end: datetime) -> list:
+        with STORE.lock:
+            rows = list(self._store.segments.values())
+        return [r for r in rows if _local(r["end_utc"]) >= start and _local(r["start_utc"]) < end]
+
+    async def _activity_stats(self, hours_back: int = 24) -> dict:
+        """From every VitalReading row (what the hourly rollups are fed with)."""
+        start, rows, prev = self._window(hours_back)
+        snapshots = [{"ts": r["valid_at"], "posture": r["posture_label"] or "Unknown",
+                      "area": r["area_label"] or "Unknown", "steps": r["steps"] or 0} for r in rows]
+        return _duration_stats(snapshots, start,
+                               prev["posture_label"] if prev else "Unknown",
+                               prev["area_label"] if prev else "Unknown")
+
+    async def get_raw_history(self, hours_back: int) -> list:
+        start = datetime.now() - timedelta(hours=hours_back)
+        with STORE.lock:
+            rows = [r for r in self._store.episodes.between(start) if r.get("posture_label")]
+        return [{
+            "timestamp":     r["valid_at"].isoformat(),
+            "HR":            r.get("hr") or 0,
+            "Blood_oxygen":  r.get("spo2") or 0,
+            "Posture_state": r["posture_label"],
+            "Area":          r.get("area_label") or "Unknown",
+            "Step":          r.get("steps") or 0,
+        } for r in rows]
+
+    async def get_episodes_by_time_range(self, center_hour: int, center_minute: int = 0,
+                                         window_minutes: int = 45, date_str=None, limit: int = 30) -> str:
+        try:
+            if date_str:
+                datetime.strptime(date_str, "%Y-%m-%d")
+        except ValueError:
+            date_str = None
+        rows = []
+        with STORE.lock:
+            for day, lo, hi in _minute_ranges(center_hour * 60 + center_minute, window_minutes, date_str):
+                for minute in range(lo, hi + 1):
+                    rows += [r for r in self._store.by_minute[minute] if day is None or r["local_date"] == day]
+        rows.sort(key=lambda r: r["valid_at"])
+        episodes = [f"[{str(r['valid_at'])[:16]}] {r['content'].strip()}" for r in rows if r["content"]][:limit]
+        if not episodes:
+            return ""
+        return (f"Timeline records for {self.device_id} "
+                f"around {center_hour:02d}:{center_minute:02d} ±{window_minutes}min"
+                f" [{date_str or 'any date'}] — {len(episodes)} records:\n" + "\n".join(episodes))
@@ -0,0 +1,195 @@
+"""
+Memory Loop Monitor for UTLMediCore
+===================================
+Everything PatientMemory does runs on ONE background asyncio loop
+(patient_memory._async_loop), fed by run_async(..., wait_result=False)
+fire-and-forget futures. When memory got slow the only signal was console
+prints. This module instruments that loop:
+
+- lag sampler   : a task on the loop sleeps LOOP_LAG_SAMPLE_SEC and measures
+                  how late it wakes up — blocking calls (sync Neo4j, CPU-heavy
+                  parsing) on the loop show up here; > LOOP_LAG_WARN_MS is logged
+- in-flight     : every future submitted through run_async / run_async_readonly,
+                  by kind (snapshot, alert, manual, search, ...) and lane, with
+                  the age of the oldest one
+- loop tasks    : asyncio tasks alive on the loop by coroutine (queue workers,
+                  compactor, retention, ...), collected by the sampler
+- errors        : timeouts / exceptions / silently skipped Graphiti errors, as
+                  classified by _future_done_callback and run_async
+
+Served by /api/debug/memory-loop (JSON) and /metrics (Prometheus text format,
+together with the async lane metrics).
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import Counter, deque
+
+LOOP_LAG_SAMPLE_SEC = float(os.getenv("LOOP_LAG_SAMPLE_SEC", "1.0"))
+LOOP_LAG_WARN_MS    = float(os.getenv("LOOP_LAG_WARN_MS", "500"))
+
+# PatientMemory coroutine → task kind shown in the inventory
+_TASK_KINDS = {
+    "store_sensor_snapshot": "snapshot",
+    "store_alert":           "alert",
+    "add_episode":           "manual",
+    "get_patient_context":   "search",
+    "get_insight_contexts":  "search",
+}
+
+
+def task_kind(coro) -> str:
+    name = getattr(coro, "__name__", None) or type(coro).__name__
+    return _TASK_KINDS.get(name, name)
+
+
+def classify_error(e: BaseException) -> str:
+    """timeout | skipped (duplicate / validation noise from Graphiti) | exception"""
+    err_type, err_str = type(e).__name__, str(e)
+    if "Timeout" in err_type or "Timeout" in err_str:
+        return "timeout"
+    if "Target entity not found" in err_str or "duplicate" in err_str or "validation" in err_str.lower():
+        return "skipped"
+    return "exception"
+
+
+class LoopMonitor:
+    def __init__(self, sample_sec: float = LOOP_LAG_SAMPLE_SEC, warn_ms: float = LOOP_LAG_WARN_MS):
+        self.sample_sec = sample_sec
+        self.warn_ms = warn_ms
+        self._loop = None
+        self._lock = threading.Lock()
+        self._in_flight = {}            # id(future) → (kind, lane, submitted monotonic)
+        self._lag_ms = deque(maxlen=300)
+        self._lag_max_ms = 0.0
+        self._loop_tasks = Counter()
+        self._counts = Counter()        # submitted, finished, timeout, exception, skipped
+        self._last_error = None
+
+    # ── lag sampler (runs on the monitored loop) ───────────────────────────────
+
+    def attach(self, loop) -> None:
+        """Start the lag sampler on `loop` (idempotent)."""
+        if self._loop is loop:
+            return
+        self._loop = loop
+        asyncio.run_coroutine_threadsafe(self._sample(), loop)
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            t0 = loop.time()
+            await asyncio.sleep(self.sample_sec)
+            lag = max((loop.time() - t0 - self.sample_sec) * 1000, 0.0)
+            self._lag_ms.append(lag)
+            self._lag_max_ms = max(self._lag_max_ms, lag)
+            if lag > self.warn_ms:
+                print(f"[MemoryLoop] ⚠️ event loop lag {lag:.0f} ms")
+            tasks = Counter()
+            for t in asyncio.all_tasks(loop):
+                coro = t.get_coro()
+                tasks[getattr(coro, "__qualname__", None) or type(coro).__name__] += 1
+            self._loop_tasks = tasks
+
+    # ── in-flight inventory (called from any thread) ──────────────────────────
+
+    def track(self, future, kind: str, lane: str) -> None:
+        key = id(future)
+        with self._lock:
+            self._in_flight[key] = (kind, lane, time.monotonic())
+            self._counts["submitted"] += 1
+
+        def _done(_):
+            with self._lock:
+                self._in_flight.pop(key, None)
+                self._counts["finished"] += 1
+
+        future.add_done_callback(_done)
+
+    def record_error(self, e: BaseException, kind: str = "") -> str:
+        outcome = classify_error(e)
+        with self._lock:
+            self._counts[outcome] += 1
+            if outcome != "skipped":
+                self._last_error = {"kind": kind, "outcome": outcome,
+                                    "error": f"{type(e).__name__}: {e}"[:300], "at": time.time()}
+        return outcome
+
+    # ── reporting ──────────────────────────────────────────────────────────────
+
+    def status(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            flights = list(self._in_flight.values())
+            counts = dict(self._counts)
+            last_error = self._last_error
+        lags = sorted(self._lag_ms)
+
+        def pct(p):
+            return round(lags[min(int(len(lags) * p), len(lags) - 1)], 1) if lags else None
+
+        oldest = min(flights, key=lambda f: f[2]) if flights else None
+        return {
+            "loop_running": bool(self._loop and self._loop.is_running()),
+            "lag_ms": {
+                "last": round(self._lag_ms[-1], 1) if self._lag_ms else None,
+                "p50": pct(.5), "p95": pct(.95), "max": round(self._lag_max_ms, 1),
+                "samples": len(lags), "sample_sec": self.sample_sec,
+            },
+            "in_flight": {
+                "total": len(flights),
+                "by_kind": dict(Counter(f[0] for f in flights)),
+                "by_lane": dict(Counter(f[1] for f in flights)),
+                "oldest_age_sec": round(now - oldest[2], 1) if oldest else 0.0,
+                "oldest_kind": oldest[0] if oldest else None,
+            },
+            "loop_tasks": {"total": sum(self._loop_tasks.values()), "by_coro": dict(self._loop_tasks)},
+            "counters": {k: counts.get(k, 0) for k in ("submitted", "finished", "timeout", "exception", "skipped")},
+            "last_error": last_error,
+        }
+
+    def prometheus(self, lanes: dict = None) -> str:
+        """Prometheus text exposition of status() and, if given, lane_stats()."""
+        st = self.status()
+        out = []
+
+        def metric(name, kind, help_text, samples):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lbl = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                out.append(f"{name}{{{lbl}}} {value}" if lbl else f"{name} {value}")
+
+        metric("medicore_memory_loop_lag_ms", "gauge", "Event loop wake-up lag of the PatientMemory loop",
+               [({"stat": k}, st["lag_ms"][k] or 0) for k in ("last", "p50", "p95", "max")])
+        metric("medicore_memory_inflight", "gauge", "Futures submitted to the memory loop and not finished",
+               [({"kind": k}, n) for k, n in st["in_flight"]["by_kind"].items()] or [({}, 0)])
+        metric("medicore_memory_inflight_oldest_seconds", "gauge", "Age of the oldest in-flight memory future",
+               [({}, st["in_flight"]["oldest_age_sec"])])
+        metric("medicore_memory_loop_tasks", "gauge", "asyncio tasks alive on the memory loop",
+               [({}, st["loop_tasks"]["total"])])
+        metric("medicore_memory_futures_total", "counter", "Memory futures by outcome",
+               [({"outcome": k}, n) for k, n in st["counters"].items()])
+
+        if lanes:
+            for key, kind in (("running", "gauge"), ("waiting", "gauge"), ("submitted", "counter"),
+                              ("completed", "counter"), ("failed", "counter"), ("timeouts", "counter")):
+                suffix = "_total" if kind == "counter" else ""
+                metric(f"medicore_memory_lane_{key}{suffix}", kind, f"Async bridge lane {key}",
+                       [({"lane": name}, ls[key]) for name, ls in lanes.items()])
+            metric("medicore_memory_lane_queue_ms", "histogram",
+                   "Time from submission to admission into the lane (ms)", [])
+            for name, ls in lanes.items():
+                cumulative = 0
+                for bucket, n in ls["queue_ms_histogram"].items():
+                    cumulative += n
+                    le = "+Inf" if bucket.startswith(">") else bucket[2:]
+                    out.append(f'medicore_memory_lane_queue_ms_bucket{{lane="{name}",le="{le}"}} {cumulative}')
+                out.append(f'medicore_memory_lane_queue_ms_sum{{lane="{name}"}} {ls["queue_ms_sum"]}')
+                out.append(f'medicore_memory_lane_queue_ms_count{{lane="{name}"}} {ls["queue_ms_count"]}')
+        return "\n".join(out) + "\n"
+
+
+LOOP_MONITOR = LoopMonitor()
@@ -0,0 +1,210 @@
+"""
+Shared Neo4j Connection Pool for UTLMediCore
+============================================
+Every PatientMemory method used to open its own driver, which paid TCP +
+Bolt handshake + auth on every call (3–4 fresh connections per chat turn).
+This module owns long-lived drivers instead:
+
+- one sync driver   : manual context, direct writer, scripts
+- one async driver per event loop (normally only the PatientMemory
+  background loop) — async drivers are bound to the loop they were created on
+- tuned pool        : NEO4J_POOL_SIZE, NEO4J_ACQUIRE_TIMEOUT,
+                      NEO4J_MAX_CONN_LIFETIME, NEO4J_LIVENESS_SEC (idle
+                      connections are pinged before reuse)
+- metrics           : connection acquire time per session (see pool_stats)
+- close_all()       : graceful shutdown (registered with atexit by the app)
+
+Usage:
+    from memory.neo4j_pool import sync_session, async_session
+
+    with sync_session() as s:
+        s.run("MATCH (n) RETURN count(n)")
+
+    async with async_session() as s:
+        r = await s.run("MATCH (n) RETURN count(n)")
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+# Load .env first — this module may be imported before graphiti_client
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+NEO4J_URI      = os.getenv("NEO4J_URI",      "bolt://localhost:7687")
+NEO4J_USER     = os.getenv("NEO4J_USER",     "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
+
+POOL_SIZE         = int(os.getenv("NEO4J_POOL_SIZE", "20"))
+ACQUIRE_TIMEOUT   = float(os.getenv("NEO4J_ACQUIRE_TIMEOUT", "10"))
+MAX_CONN_LIFETIME = float(os.getenv("NEO4J_MAX_CONN_LIFETIME", "3600"))
+LIVENESS_SEC      = float(os.getenv("NEO4J_LIVENESS_SEC", "30"))
+
+_lock = threading.Lock()
+_sync_driver = None
+_async_drivers: dict = {}       # event loop -> AsyncDriver
+
+_metrics = {
+    "sync":  {"sessions": 0, "drivers": 0, "acquire_ms": deque(maxlen=500)},
+    "async": {"sessions": 0, "drivers": 0, "acquire_ms": deque(maxlen=500)},
+}
+
+
+def _driver_config() -> dict:
+    return {
+        "max_connection_pool_size":       POOL_SIZE,
+        "connection_acquisition_timeout": ACQUIRE_TIMEOUT,
+        "max_connection_lifetime":        MAX_CONN_LIFETIME,
+        "liveness_check_timeout":         LIVENESS_SEC,
+        "keep_alive":                     True,
+    }
+
+
+def get_sync_driver():
+    """Process-wide sync driver, created on first use."""
+    global _sync_driver
+    if _sync_driver is None:
+        with _lock:
+            if _sync_driver is None:
+                from neo4j import GraphDatabase
+                _sync_driver = GraphDatabase.driver(
+                    NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD), **_driver_config()
+                )
+                _metrics["sync"]["drivers"] += 1
+                print(f"[Neo4j Pool] Sync driver ready ({NEO4J_URI}, pool={POOL_SIZE})")
+    return _sync_driver
+
+
+def get_async_driver():
+    """Async driver for the running event loop. Must be called from inside a coroutine."""
+    loop = asyncio.get_running_loop()
+    drv = _async_drivers.get(loop)
+    if drv is None:
+        from neo4j import AsyncGraphDatabase
+        drv = AsyncGraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD), **_driver_config())
+        with _lock:
+            # Drop drivers of loops that were closed (e.g. asyncio.run() in scripts)
+            for old in [l for l in _async_drivers if l.is_closed()]:
+                _async_drivers.pop(old, None)
+            _async_drivers[loop] = drv
+        _metrics["async"]["drivers"] += 1
+        print(f"[Neo4j Pool] Async driver ready ({NEO4J_URI}, pool={POOL_SIZE})")
+    return drv
+
+
+class _TimedSession:
+    """
+    Session proxy that records connection acquire time.
+
+    The driver acquires a pooled connection lazily on the first query and has
+    no public acquire hook, so acquire time is measured as the first run()
+    up to the RUN acknowledgement (acquire + one round-trip). A slow pool
+    shows up here immediately.
+    """
+
+    def __init__(self, session, kind: str):
+        self._session = session
+        self._kind = kind
+        self._timed = False
+
+    def run(self, *args, **kwargs):
+        if self._timed:
+            return self._session.run(*args, **kwargs)
+        self._timed = True
+        t0 = time.perf_counter()
+        result = self._session.run(*args, **kwargs)
+        _metrics[self._kind]["acquire_ms"].append((time.perf_counter() - t0) * 1000)
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+class _TimedAsyncSession(_TimedSession):
+    async def run(self, *args, **kwargs):
+        if self._timed:
+            return await self._session.run(*args, **kwargs)
+        self._timed = True
+        t0 = time.perf_counter()
+        result = await self._session.run(*args, **kwargs)
+        _metrics[self._kind]["acquire_ms"].append((time.perf_counter() - t0) * 1000)
+        return result
+
+
+@contextmanager
+def sync_session(**kwargs):
+    """Session on the shared sync driver (connection returns to the pool on exit)."""
+    with get_sync_driver().session(**kwargs) as s:
+        _metrics["sync"]["sessions"] += 1
+        yield _TimedSession(s, "sync")
+
+
+@asynccontextmanager
+async def async_session(**kwargs):
+    """Session on the shared async driver of the running loop."""
+    async with get_async_driver().session(**kwargs) as s:
+        _metrics["async"]["sessions"] += 1
+        yield _TimedAsyncSession(s, "async")
+
+
+def _summary(values) -> dict:
+    vals = sorted(values)
+    if not vals:
+        return {"count": 0}
+    return {
+        "count":  len(vals),
+        "avg_ms": round(sum(vals) / len(vals), 2),
+        "p50_ms": round(vals[len(vals) // 2], 2),
+        "p95_ms": round(vals[min(int(len(vals) * 0.95), len(vals) - 1)], 2),
+        "max_ms": round(vals[-1], 2),
+    }
+
+
+def pool_stats() -> dict:
+    """Driver / session counts and connection acquire time summary."""
+    return {
+        "uri":          NEO4J_URI,
+        "pool_size":    POOL_SIZE,
+        "liveness_sec": LIVENESS_SEC,
+        **{
+            kind: {
+                "drivers":  m["drivers"],
+                "sessions": m["sessions"],
+                "acquire":  _summary(list(m["acquire_ms"])),
+            }
+            for kind, m in _metrics.items()
+        },
+    }
+
+
+def close_all(timeout: float = 5.0) -> None:
+    """Close every pooled driver. Async drivers are closed on their own loop."""
+    global _sync_driver
+    with _lock:
+        drivers = list(_async_drivers.items())
+        _async_drivers.clear()
+        sync_drv, _sync_driver = _sync_driver, None
+
+    for loop, drv in drivers:
+        try:
+            if loop.is_closed():
+                continue
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(drv.close(), loop).result(timeout)
+            else:
+                loop.run_until_complete(drv.close())
+        except Exception as e:
+            print(f"[Neo4j Pool] async driver close failed: {e}")
+    if sync_drv is not None:
+        try:
+            sync_drv.close()
+        except Exception as e:
+            print(f"[Neo4j Pool] sync driver close failed: {e}")
+    print("[Neo4j Pool] All drivers closed")
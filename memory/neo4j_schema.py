@@ -0,0 +1,302 @@
+"""
+Neo4j Schema Bootstrap for UTLMediCore
+======================================
+Creates and verifies the range indexes and uniqueness constraints behind every
+memory query path. Graphiti only builds its own single-property indexes; the
+hot paths here filter on two properties at once (patient + time).
+
+Access patterns covered:
+- Episodic      : group_id + created_at / valid_at   (Tier-2, activity summary, history)
+                  group_id [+ local_date] + minute_of_day (time-of-day questions)
+- ManualContext : device_id + reference_time         (manual context panel, reports)
+- Patient       : device_id                          (MERGE on every direct write)
+- VitalReading / AlertEvent / PostureChange : uuid (MERGE), device_id + valid_at
+- ActivityRollup : device_id + hour                  (long-range activity summary)
+- Segment       : uuid (MERGE), device_id + end_at   (posture / area durations)
+
+migrate_layer1_keys() gives VitalReading / AlertEvent nodes written before the
+direct writer stored them their device_id (from the Patient) and valid_at (from
+timestamp_utc) — every (device_id, valid_at) read above skips nodes without them.
+
+explain_report() runs EXPLAIN on every Cypher query in patient_memory.py and
+direct_neo4j_writer.py and lists the ones whose plan still contains a label
+or all-nodes scan.
+
+CLI:
+    python -m memory.neo4j_schema              # ensure + verify
+    python -m memory.neo4j_schema --explain    # also EXPLAIN every memory query
+    python -m memory.neo4j_schema --verify     # verify only, change nothing
+"""
+
+import ast
+import os
+import re
+
+from memory.neo4j_pool import sync_session
+
+# (name, statement) — all idempotent
+CONSTRAINTS = [
+    ("patient_device_id",   "CREATE CONSTRAINT patient_device_id IF NOT EXISTS FOR (p:Patient) REQUIRE p.device_id IS UNIQUE"),
+    ("vital_reading_uuid",  "CREATE CONSTRAINT vital_reading_uuid IF NOT EXISTS FOR (v:VitalReading) REQUIRE v.uuid IS UNIQUE"),
+    ("alert_event_uuid",    "CREATE CONSTRAINT alert_event_uuid IF NOT EXISTS FOR (a:AlertEvent) REQUIRE a.uuid IS UNIQUE"),
+    ("posture_change_uuid", "CREATE CONSTRAINT posture_change_uuid IF NOT EXISTS FOR (pc:PostureChange) REQUIRE pc.uuid IS UNIQUE"),
+    ("manual_context_uuid", "CREATE CONSTRAINT manual_context_uuid IF NOT EXISTS FOR (m:ManualContext) REQUIRE m.uuid IS UNIQUE"),
+    ("incident_uuid",       "CREATE CONSTRAINT incident_uuid IF NOT EXISTS FOR (i:Incident) REQUIRE i.uuid IS UNIQUE"),
+    ("segment_uuid",        "CREATE CONSTRAINT segment_uuid IF NOT EXISTS FOR (s:Segment) REQUIRE s.uuid IS UNIQUE"),
+]
+
+INDEXES = [
+    ("episodic_group_created", "CREATE INDEX episodic_group_created IF NOT EXISTS FOR (e:Episodic) ON (e.group_id, e.created_at)"),
+    ("episodic_group_valid",   "CREATE INDEX episodic_group_valid IF NOT EXISTS FOR (e:Episodic) ON (e.group_id, e.valid_at)"),
+    ("episodic_group_minute",  "CREATE INDEX episodic_group_minute IF NOT EXISTS FOR (e:Episodic) ON (e.group_id, e.minute_of_day)"),
+    ("episodic_group_date_minute", "CREATE INDEX episodic_group_date_minute IF NOT EXISTS FOR (e:Episodic) ON (e.group_id, e.local_date, e.minute_of_day)"),
+    ("manual_device_ref",      "CREATE INDEX manual_device_ref IF NOT EXISTS FOR (m:ManualContext) ON (m.device_id, m.reference_time)"),
+    ("vital_device_valid",     "CREATE INDEX vital_device_valid IF NOT EXISTS FOR (v:VitalReading) ON (v.device_id, v.valid_at)"),
+    ("vital_timestamp_utc",    "CREATE INDEX vital_timestamp_utc IF NOT EXISTS FOR (v:VitalReading) ON (v.timestamp_utc)"),
+    ("alert_device_valid",     "CREATE INDEX alert_device_valid IF NOT EXISTS FOR (a:AlertEvent) ON (a.device_id, a.valid_at)"),
+    ("alert_timestamp_utc",    "CREATE INDEX alert_timestamp_utc IF NOT EXISTS FOR (a:AlertEvent) ON (a.timestamp_utc)"),
+    ("incident_device_valid",  "CREATE INDEX incident_device_valid IF NOT EXISTS FOR (i:Incident) ON (i.device_id, i.valid_at)"),
+    ("segment_device_end",     "CREATE INDEX segment_device_end IF NOT EXISTS FOR (s:Segment) ON (s.device_id, s.end_at)"),
+    ("rollup_device_hour",     "CREATE INDEX rollup_device_hour IF NOT EXISTS FOR (r:ActivityRollup) ON (r.device_id, r.hour)"),
+    ("vital_summary_bucket",   "CREATE INDEX vital_summary_bucket IF NOT EXISTS FOR (s:VitalSummary) ON (s.device_id, s.resolution, s.bucket)"),
+]
+
+# Used when a uniqueness constraint cannot be created (existing duplicates)
+_FALLBACK_INDEXES = {
+    "patient_device_id": ("patient_device_id_idx",
+                          "CREATE INDEX patient_device_id_idx IF NOT EXISTS FOR (p:Patient) ON (p.device_id)"),
+}
+
+_SCAN_OPERATORS = ("NodeByLabelScan", "AllNodesScan")
+_QUERY_SOURCES = ("patient_memory.py", "direct_neo4j_writer.py", "activity_rollup.py", "retention.py")
+
+_ensured = False
+
+
+def ensure_schema(session=None, force: bool = False) -> dict:
+    """
+    Create every constraint and index (IF NOT EXISTS). Runs once per process
+    unless force=True. Returns {name: 'ok' | 'fallback:<idx>' | 'error: ...'}.
+    """
+    global _ensured
+    if _ensured and not force:
+        return {}
+    if session is None:
+        with sync_session() as s:
+            return ensure_schema(s, force)
+
+    status = {}
+    for name, stmt in CONSTRAINTS + INDEXES:
+        try:
+            session.run(stmt).consume()
+            status[name] = "ok"
+        except Exception as e:
+            fallback = _FALLBACK_INDEXES.get(name)
+            if fallback:
+                try:
+                    session.run(fallback[1]).consume()
+                    status[name] = f"fallback:{fallback[0]}"
+                    print(f"[Neo4j Schema] ⚠️ {name} not created ({e}) — using index {fallback[0]}")
+                    continue
+                except Exception as e2:
+                    e = e2
+            status[name] = f"error: {e}"
+            print(f"[Neo4j Schema] ❌ {name}: {e}")
+    _ensured = True
+    ok = sum(1 for v in status.values() if v == "ok")
+    print(f"[Neo4j Schema] {ok}/{len(status)} constraints/indexes in place")
+    return status
+
+
+def migrate_layer1_keys(session=None, device_id: str = None, dry_run: bool = False) -> int:
+    """
+    Set device_id / valid_at on legacy VitalReading / AlertEvent nodes (idempotent).
+    Returns how many nodes were (or, with dry_run, would be) updated.
+    """
+    if session is None:
+        with sync_session() as s:
+            return migrate_layer1_keys(s, device_id, dry_run)
+
+    where = "(n.device_id IS NULL OR (n.valid_at IS NULL AND n.timestamp_utc IS NOT NULL))"
+    params = {}
+    if device_id:
+        where += " AND p.device_id = $dev_id"
+        params["dev_id"] = device_id
+    match = f"MATCH (p:Patient)-[:HAD_READING|HAD_ALERT]->(n) WHERE {where}"
+
+    todo = session.run(f"{match} RETURN count(n) AS n", **params).single()["n"]
+    if dry_run or not todo:
+        return todo
+    session.run(
+        f"""
+        {match}
+        CALL {{
+            WITH n, p
+            SET n.device_id = coalesce(n.device_id, p.device_id),
+                n.valid_at  = coalesce(n.valid_at, datetime(n.timestamp_utc))
+        }} IN TRANSACTIONS OF 500 ROWS
+        """,
+        **params,
+    ).consume()
+    print(f"[Neo4j Schema] ✅ {todo:,} legacy readings/alerts got device_id / valid_at")
+    return todo
+
+
+def verify_schema(session=None) -> dict:
+    """Which expected indexes/constraints are missing or not ONLINE."""
+    if session is None:
+        with sync_session() as s:
+            return verify_schema(s)
+
+    indexes = {r["name"]: r["state"] for r in session.run("SHOW INDEXES YIELD name, state")}
+    constraints = {r["name"] for r in session.run("SHOW CONSTRAINTS YIELD name")}
+    report = {"missing": [], "not_online": [], "ok": []}
+    for name, _ in CONSTRAINTS:
+        if name in constraints:
+            report["ok"].append(name)
+        elif name in _FALLBACK_INDEXES and _FALLBACK_INDEXES[name][0] in indexes:
+            report["ok"].append(_FALLBACK_INDEXES[name][0])
+        else:
+            report["missing"].append(name)
+    for name, _ in INDEXES:
+        if name not in indexes:
+            report["missing"].append(name)
+        elif indexes[name] != "ONLINE":
+            report["not_online"].append(f"{name} ({indexes[name]})")
+        else:
+            report["ok"].append(name)
+    return report
+
+
+# ── EXPLAIN report ──────────────────────────────────────────────────────────
+
+def _render(node) -> str:
+    """String / f-string node → Cypher text. Interpolated parts (optional filters) are dropped."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        return "".join(v.value for v in node.values if isinstance(v, ast.Constant))
+    return None
+
+
+def collect_queries(path: str) -> list:
+    """
+    Every Cypher string passed to .run() in a source file (and module-level
+    query dicts such as _UNWIND_QUERIES). Returns [(label, cypher)].
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+
+    found = []
+    for func in [n for n in ast.walk(tree) if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]:
+        assigned = {}
+        for node in ast.walk(func):
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                text = _render(node.value)
+                if text:
+                    assigned[node.targets[0].id] = text
+        for node in ast.walk(func):
+            if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                    and node.func.attr == "run" and node.args):
+                continue
+            arg = node.args[0]
+            text = _render(arg) or (assigned.get(arg.id) if isinstance(arg, ast.Name) else None)
+            if text and re.search(r"\b(MATCH|MERGE|CREATE|UNWIND)\b", text):
+                found.append((f"{os.path.basename(path)}:{func.name}:{node.lineno}", text))
+
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Dict):
+            for k, v in zip(node.value.keys, node.value.values):
+                text = _render(v)
+                if text and isinstance(k, ast.Constant) and re.search(r"\b(MATCH|MERGE|UNWIND)\b", text):
+                    found.append((f"{os.path.basename(path)}:{node.targets[0].id}[{k.value}]", text))
+    return found
+
+
+def _dummy_params(cypher: str) -> dict:
+    params = {}
+    for name in set(re.findall(r"\$(\w+)", cypher)):
+        if name == "rows":
+            params[name] = []
+        elif "lim" in name or name.endswith(("mins", "_h", "yr", "mo", "dy")):
+            params[name] = 1
+        elif name.startswith("dur"):
+            params[name] = "PT1H"
+        else:
+            params[name] = "x"
+    return params
+
+
+def _operators(plan) -> list:
+    if plan is None:
+        return []
+    ops = [str(plan.get("operatorType", "")).split("@")[0]]
+    for child in plan.get("children", []):
+        ops.extend(_operators(child))
+    return ops
+
+
+def explain_report(session=None, paths: list = None) -> list:
+    """
+    EXPLAIN each memory query. Returns a list of
+    {query, scans: [operator], operators: [operator], error}.
+    """
+    if session is None:
+        with sync_session() as s:
+            return explain_report(s, paths)
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    paths = paths or [os.path.join(here, p) for p in _QUERY_SOURCES]
+    report = []
+    for path in paths:
+        for label, cypher in collect_queries(path):
+            entry = {"query": label, "scans": [], "operators": [], "error": None}
+            try:
+                plan = session.run("EXPLAIN " + cypher, **_dummy_params(cypher)).consume().plan
+                ops = _operators(plan)
+                entry["operators"] = sorted(set(ops))
+                entry["scans"] = sorted({o for o in ops if o.startswith(_SCAN_OPERATORS)})
+            except Exception as e:
+                entry["error"] = str(e).splitlines()[0][:160]
+            report.append(entry)
+    return report
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="UTLMediCore Neo4j schema bootstrap")
+    parser.add_argument("--verify", action="store_true", help="Only verify, do not create anything")
+    parser.add_argument("--explain", action="store_true", help="EXPLAIN every memory query and list label scans")
+    args = parser.parse_args()
+
+    if not args.verify:
+        ensure_schema(force=True)
+        migrate_layer1_keys()
+
+    report = verify_schema()
+    print("\n" + "=" * 60)
+    print("  SCHEMA")
+    print("=" * 60)
+    print(f"  OK         : {len(report['ok'])}")
+    print(f"  Missing    : {', '.join(report['missing']) or '-'}")
+    print(f"  Not online : {', '.join(report['not_online']) or '-'}")
+
+    if args.explain:
+        rows = explain_report()
+        print("\n" + "=" * 60)
+        print("  EXPLAIN — memory queries")
+        print("=" * 60)
+        for r in rows:
+            if r["error"]:
+                mark, detail = "⚠️ ", r["error"]
+            elif r["scans"]:
+                mark, detail = "❌", "label scan: " + ", ".join(r["scans"])
+            else:
+                mark, detail = "✅", ", ".join(o for o in r["operators"] if "Seek" in o or "Index" in o) or "no scan"
+            print(f"  {mark} {r['query']:<60s} {detail}")
+        scans = [r for r in rows if r["scans"]]
+        print(f"\n  {len(scans)}/{len(rows)} queries still plan a label scan")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,10 +16,18 @@ Design choices:
 
 import asyncio
 import concurrent.futures
-from datetime import datetime
+import functools
+import os
+import re
+from contextlib import nullcontext
+from datetime import datetime, timedelta
 from typing import Optional
 
+from memory.async_lanes import in_lane
 from memory.graphiti_client import get_graphiti
+from memory.loop_monitor import LOOP_MONITOR, task_kind
+from memory.neo4j_pool import async_session, sync_session
+from memory.read_cache import READ_CACHE, cached_read, register_flush_listener
 
 
 # ---------------------------------------------------------------------------
@@ -39,113 +47,450 @@ _AREA_MAP = {
 }
 
 
+# ---------------------------------------------------------------------------
+# STRUCTURED EPISODE PROPERTIES
+# ---------------------------------------------------------------------------
+# Typed columns set on sensor Episodic nodes — same names as on VitalReading —
+# so summary/history queries never ship or parse the episode text.
+EPISODE_PROPS = ("posture", "posture_label", "area_label", "hr", "spo2",
+                 "steps", "condition", "timestamp_local", "minute_of_day", "local_date",
+                 "encoding")
+
+# Memory backend: "neo4j" (Neo4j + Graphiti + Ollama) or "inprocess" (memory/inprocess_backend.py —
+# in-memory store, deterministic fake extraction, brute-force vector search; for benchmarks / load tests)
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "neo4j").lower()
+
+# Sensor episode text sent to Graphiti: "verbose" (full clinical prose) or
+# "compact" (entity-bearing facts only; ranges/legend sent once per patient
+# as a baseline preamble episode). Compare with evaluation/episode_encoding_ab.py
+EPISODE_ENCODING = os.getenv("EPISODE_ENCODING", "verbose").lower()
+_PREAMBLE_TAG = "compact_preamble_v1"
+
+# Patient timezone for minute_of_day / local_date (IANA name, "" = server local).
+# PATIENT_TZ_MAP overrides per device: "DCA632971FC3=Asia/Taipei,2CCF6754457F=Asia/Jakarta"
+PATIENT_TZ = os.getenv("PATIENT_TZ", "")
+PATIENT_TZ_MAP = dict(
+    p.strip().split("=", 1) for p in os.getenv("PATIENT_TZ_MAP", "").split(",") if "=" in p
+)
+
+_SEVERITY_CONDITION = {
+    "CRITICAL — FALL DETECTED": "critical_fall",
+    "CRITICAL — Simultaneous HR and SpO2 abnormality": "critical_vitals",
+    "WARNING — Low Blood Oxygen (possible hypoxia)": "low_oxygen",
+    "WARNING — Tachycardia (elevated heart rate)": "abnormal_hr",
+    "WARNING — Bradycardia (low heart rate)": "abnormal_hr",
+    "CAUTION — Calorie deficit (Burned > Intake)": "metabolic_alert",
+    "Normal — all vitals within safe parameters": "routine_observation",
+}
+_POSTURE_CODE = {label: code for code, label in _POSTURE_MAP.items()}
+
+_EPISODE_PATTERNS = {
+    "area_label":      re.compile(r"Location: ([^.]+)\."),
+    "posture_label":   re.compile(r"Activity/Posture: ([^.(]+?)\s*(?:\([^)]*\))?\."),
+    "hr":              re.compile(r"Heart Rate: (\d+) bpm"),
+    "spo2":            re.compile(r"(?:SpO2\)|Blood O2): (\d+)%"),
+    "steps":           re.compile(r"Step count: (\d+)"),
+    "timestamp_local": re.compile(r"\((\d{4}-\d{2}-\d{2} \d{2}:\d{2})\)"),
+    "condition":       re.compile(r"^\[([^\]]+)\]"),
+}
+
+
+def _time_context(hour: int) -> str:
+    if 5 <= hour < 12:
+        return "morning"
+    if 12 <= hour < 17:
+        return "afternoon"
+    if 17 <= hour < 21:
+        return "evening"
+    return "night"
+
+
+def _compact_episode_text(device_id: str, severity_label: str, now: datetime, area_txt: str,
+                          posture_txt: str, hr: int, spo2: int, steps: int,
+                          calories: int, burned: int) -> str:
+    """
+    Compact sensor episode: the facts Graphiti extracts entities from, without
+    the constant range explanations (those live in the per-patient preamble).
+    Keeps the field labels _EPISODE_PATTERNS parses.
+    """
+    clean_id = device_id.replace("_", "-")
+    hr_flag = "" if hr == 0 or 60 <= hr <= 100 else (" HIGH" if hr > 100 else " LOW")
+    spo2_flag = " LOW" if 0 < spo2 < 90 else ""
+    parts = [
+        f"[{severity_label}] Patient {clean_id} at {now.strftime('%A')} "
+        f"({now.strftime('%Y-%m-%d %H:%M')}), {_time_context(now.hour)}.",
+        f"Location: {area_txt}.",
+        f"Activity/Posture: {posture_txt}.",
+        f"Heart Rate: {hr} bpm{hr_flag}." if hr else "Heart Rate: no reading.",
+        f"Blood O2: {spo2}%{spo2_flag}." if spo2 else "Blood O2: no reading.",
+        f"Step count: {steps}.",
+        f"Burned {burned} kcal" + (f", intake {calories} kcal." if calories else "."),
+    ]
+    if posture_txt == "Falling":
+        parts.append(f"Patient {clean_id} fell in {area_txt}.")
+    return " ".join(parts)
+
+
+def _encoding_preamble(device_id: str) -> str:
+    """Static legend for compact episodes — sent once per patient as a baseline."""
+    clean_id = device_id.replace("_", "-")
+    return (
+        f"Patient {clean_id} is continuously monitored by the UTLMediCore wearable sensor. "
+        f"Monitoring records for Patient {clean_id} list severity, time, Location, "
+        f"Activity/Posture, Heart Rate, Blood O2 (SpO2), Step count and calories burned. "
+        f"Normal heart rate is 60-100 bpm; HIGH marks tachycardia and LOW marks bradycardia. "
+        f"Normal SpO2 is 95-100%; LOW (below 90%) means possible hypoxia. "
+        f"CRITICAL records are falls or simultaneous heart rate and SpO2 abnormality; "
+        f"WARNING records are a single abnormal vital; Normal records have stable vitals. "
+        f"Lying prone increases respiratory risk; lying down at night is normal rest."
+    )
+
+
+def _patient_tz(device_id: str = None):
+    name = PATIENT_TZ_MAP.get(device_id) or PATIENT_TZ
+    if not name:
+        return None
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(name)
+    except Exception:
+        return None
+
+
+def _time_of_day_props(ts: datetime, device_id: str = None) -> dict:
+    """
+    minute_of_day (0-1439) and local_date ('YYYY-MM-DD') in the patient's timezone.
+    Naive timestamps are already patient-local (device clock), like valid_at.
+    """
+    if ts.tzinfo is not None:
+        tz = _patient_tz(device_id)
+        ts = ts.astimezone(tz) if tz else ts.astimezone()
+    return {"minute_of_day": ts.hour * 60 + ts.minute, "local_date": ts.strftime("%Y-%m-%d")}
+
+
+def _minute_ranges(center: int, window: int, date_str: str = None) -> list:
+    """
+    [(local_date | None, start_minute, end_minute)] covering center ± window.
+    A window crossing midnight is split in two; with a date, the part before
+    00:00 belongs to the previous day and the part after 23:59 to the next.
+    """
+    if window * 2 >= 1439:
+        return [(date_str, 0, 1439)]
+    day = datetime.strptime(date_str, "%Y-%m-%d") if date_str else None
+
+    def shift(days):
+        return (day + timedelta(days=days)).strftime("%Y-%m-%d") if day else None
+
+    start, end = center - window, center + window
+    ranges = []
+    if start < 0:
+        ranges.append((shift(-1), 1440 + start, 1439))
+        start = 0
+    if end > 1439:
+        ranges.append((shift(1), 0, end - 1440))
+        end = 1439
+    ranges.append((date_str, start, end))
+    return ranges
+
+
+# ---------------------------------------------------------------------------
+# STRATIFIED EPISODE SAMPLING (get_patient_episodes_direct)
+# ---------------------------------------------------------------------------
+SAMPLE_ALIGN_SEC = int(os.getenv("EPISODE_SAMPLE_ALIGN_SEC", "300"))  # same window → same sample
+_BUCKET_SCAN = 12           # newest episodes looked at per bucket
+
+
+def _time_buckets(start: datetime, end: datetime, n: int) -> list:
+    """Split [start, end) into n equal buckets: [{i, start, end}] with ISO bounds."""
+    step = (end - start) / n
+    return [
+        {"i": i, "start": (start + step * i).isoformat(), "end": (start + step * (i + 1)).isoformat()}
+        for i in range(n)
+    ]
+
+
+def _pick_representative(rows: list):
+    """
+    Most representative episode of one bucket (rows newest first):
+    critical/alert episode, else a posture change, else the latest.
+    """
+    if not rows:
+        return None
+
+    def rank(idx):
+        row = rows[idx]
+        cond = (row.get("condition") or "").lower()
+        name = (row.get("name") or "").lower()
+        if cond.startswith("critical") or name.startswith(("critical", "alert")):
+            return 0
+        older = rows[idx + 1] if idx + 1 < len(rows) else None
+        if older and row.get("posture_label") and older.get("posture_label") \
+                and row["posture_label"] != older["posture_label"]:
+            return 1
+        return 2
+
+    return rows[min(range(len(rows)), key=lambda i: (rank(i), i))]
+
+
+# ---------------------------------------------------------------------------
+# TIER-2 TOP-K READS (_tier2_context)
+# ---------------------------------------------------------------------------
+TIER2_LOOKBACK_H     = int(os.getenv("TIER2_LOOKBACK_H", "6"))
+TIER2_MAX_LOOKBACK_H = int(os.getenv("TIER2_MAX_LOOKBACK_H", "720"))
+
+# One per source, each an index-ordered seek: (group_id, created_at) /
+# (device_id, valid_at). All sorted newest first, merged in Python.
+_TIER2_EPISODIC = """
+    MATCH (e:Episodic)
+    WHERE e.group_id = $gid AND e.created_at >= datetime($since)
+    RETURN e.content AS content, e.created_at AS ts
+    ORDER BY e.created_at DESC
+    LIMIT $lim
+"""
+_TIER2_VITALS = """
+    MATCH (v:VitalReading)
+    WHERE v.device_id = $dev_id AND v.valid_at >= datetime($since)
+    RETURN "Real-time reading — HR: " + toString(v.hr) + " | SpO2: " + toString(v.spo2) +
+           "% | Posture: " + v.posture_label + " (" + v.condition + ")" AS content,
+           v.valid_at AS ts
+    ORDER BY v.valid_at DESC
+    LIMIT $lim
+"""
+_TIER2_ALERTS = """
+    MATCH (a:AlertEvent)
+    WHERE a.device_id = $dev_id AND a.valid_at >= datetime($since)
+    RETURN "⚠️ ALERT — " + a.alert_type + " [" + a.severity + "]: " + a.message AS content,
+           a.valid_at AS ts
+    ORDER BY a.valid_at DESC
+    LIMIT $lim
+"""
+
+
+def _native(ts) -> datetime:
+    """Neo4j DateTime → aware Python datetime (naive values are taken as UTC)."""
+    if hasattr(ts, "to_native"):
+        ts = ts.to_native()
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    if ts.tzinfo is None:
+        from datetime import timezone
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts
+
+
+def _parse_episode_text(content: str) -> dict:
+    """
+    Recover EPISODE_PROPS from a store_sensor_snapshot episode text.
+    Used for nodes written before the typed columns existed (and by the backfill).
+    Only fields that are present in the text are returned.
+    """
+    props = {}
+    for key, pattern in _EPISODE_PATTERNS.items():
+        m = pattern.search(content or "")
+        if not m:
+            continue
+        val = m.group(1).strip()
+        if key in ("hr", "spo2", "steps"):
+            props[key] = int(val)
+        elif key == "condition":
+            if val in _SEVERITY_CONDITION:
+                props[key] = _SEVERITY_CONDITION[val]
+        else:
+            props[key] = val
+    if props.get("posture_label") in _POSTURE_CODE:
+        props["posture"] = _POSTURE_CODE[props["posture_label"]]
+    return props
+
+
+def _episode_fields(rec) -> dict:
+    """Typed columns of a summary/history record; legacy nodes fall back to the text."""
+    if rec.get("posture_label") is not None:
+        return {k: rec.get(k) for k in ("posture_label", "area_label", "hr", "spo2", "steps")}
+    return _parse_episode_text(rec.get("content") or "")
+
+
+def _duration_stats(episodes: list, start_dt: datetime, prev_posture: str = "Unknown",
+                    prev_area: str = "Unknown") -> dict:
+    """
+    Minutes per posture / area from time-ordered snapshots [{ts, posture, area, steps}]:
+    each interval is credited to the earlier snapshot (gaps > 10 h ignored), and
+    the lead-in from start_dt to the first snapshot to the state before the window.
+    {} when there are no snapshots.
+    """
+    if not episodes:
+        return {}
+
+    # ── Compute duration per posture ──
+    posture_durations: dict[str, float] = {}  
+    area_durations:    dict[str, float] = {}
+    step_records = []
+
+    # Tambahkan interpolasi dari START BOUNDS ke Elemen Pertama
+    if episodes[0]["ts"]:
+        gap_start_min = (episodes[0]["ts"] - start_dt).total_seconds() / 60
+        if 0 < gap_start_min <= 600:
+            posture_durations[prev_posture] = gap_start_min
+            area_durations[prev_area] = gap_start_min
+
+    # ── Compute duration per posture (group consecutive same-posture) ──
+    step_records = []
+
+    for i in range(len(episodes) - 1):
+        ep   = episodes[i]
+        nxt  = episodes[i + 1]
+        if ep["ts"] and nxt["ts"]:
+            delta_min = (nxt["ts"] - ep["ts"]).total_seconds() / 60
+            # Only count reasonable intervals (1s to 10h) to avoid gaps overlaying
+            if 0 < delta_min <= 600:
+                p = ep["posture"]
+                a = ep["area"]
+                posture_durations[p] = posture_durations.get(p, 0) + delta_min
+                area_durations[a]    = area_durations.get(a, 0) + delta_min
+
+        if ep["steps"] > 0:
+            step_records.append(ep["steps"])
+
+    first_ts = next((e["ts"] for e in episodes if e["ts"]), None)
+    last_ts  = next((e["ts"] for e in reversed(episodes) if e["ts"]), None)
+    return {
+        "snapshots":        len(episodes),
+        "first_ts":         first_ts,
+        "last_ts":          last_ts,
+        "posture_minutes":  posture_durations,
+        "area_minutes":     area_durations,
+        "steps_avg":        sum(step_records) / len(step_records) if step_records else None,
+        "steps_max":        max(step_records) if step_records else None,
+    }
+
+
 # ---------------------------------------------------------------------------
 # ASYNC BRIDGE (run Graphiti coroutines from synchronous Flask/SocketIO)
 # ---------------------------------------------------------------------------
 import threading
+import time
 
 _async_loop = None
 _loop_thread = None
-_llm_lock = None  # Prevents Ollama from getting flooded by concurrent requests
 
 def _start_background_loop(loop):
     """Run the event loop in a dedicated background thread."""
     asyncio.set_event_loop(loop)
     loop.run_forever()
 
-async def _locked_coro(coro):
-    """Wrapper to force LLM tasks to execute strictly one at a time."""
-    global _llm_lock
-    if _llm_lock is None:
-        _llm_lock = asyncio.Lock()
-    async with _llm_lock:
-        return await coro
+def _ensure_loop():
+    """
+    ONE loop for every lane — the neo4j async drivers and the Graphiti
+    singleton are bound to the loop that created them.
+    """
+    global _async_loop, _loop_thread
+    if _async_loop is None:
+        _async_loop = asyncio.new_event_loop()
+        _loop_thread = threading.Thread(
+            target=_start_background_loop,
+            args=(_async_loop,),
+            daemon=True
+        )
+        _loop_thread.start()
+        LOOP_MONITOR.attach(_async_loop)
+    return _async_loop
 
-def _future_done_callback(fut):
+def _future_done_callback(fut, kind=""):
     try:
         fut.result()
     except Exception as e:
-        err_type = type(e).__name__
-        err_str = str(e)
-        if "Timeout" in err_type or "Timeout" in err_str:
+        outcome = LOOP_MONITOR.record_error(e, kind)
+        if outcome == "timeout":
             print("[Memory Background Error] Ollama Request Timed Out (Beban Terlalu Berat).")
-        elif "Target entity not found" in err_str or "duplicate" in err_str or "validation" in err_str.lower():
-            pass # Silent skip
-        else:
-            print(f"[Memory Background Error] ({err_type}): {err_str}")
+        elif outcome == "exception":
+            print(f"[Memory Background Error] ({type(e).__name__}): {e}")
+        # "skipped": duplicate / validation noise from Graphiti — silent
 
-def run_async(coro, wait_result=True):
+def run_async(coro, wait_result=True, timeout=60, lane="write", priority=None):
     """
     Run an async coroutine safely from a synchronous eventlet/gevent context.
     Uses a single, dedicated background thread running an asyncio event loop.
-    ALL calls go through the LLM lock to serialize Ollama traffic.
+
+    The coroutine runs in a named lane (memory/async_lanes.py):
+        write      — snapshots, alerts, add_episode (default)
+        search     — get_patient_context / graphiti.search (no chat completion)
+        interactive — local Ollama chat a user is waiting on (report narratives)
+        readonly   — plain Neo4j reads, see run_async_readonly()
+    The 'extraction' lane is entered by ingest_episode() itself around the
+    LLM call, so it is never held by a caller waiting on it.
+    Lanes have separate semaphores: searches never wait on extraction.
+    Writes of one patient are serialized by _per_patient.
     """
-    global _async_loop, _loop_thread
-    
-    if _async_loop is None:
-        _async_loop = asyncio.new_event_loop()
-        _loop_thread = threading.Thread(
-            target=_start_background_loop, 
-            args=(_async_loop,), 
-            daemon=True
-        )
-        _loop_thread.start()
-        
-    # Wraps the user's coro in our lock to serialize Ollama traffic
-    safe_coro = _locked_coro(coro)
-    
-    # Submit the coroutine to the background loop
-    future = asyncio.run_coroutine_threadsafe(safe_coro, _async_loop)
-    
+    loop = _ensure_loop()
+    submitted = time.monotonic()
+    kind = task_kind(coro)
+
+    # Submit the coroutine to the background loop, inside its lane
+    future = asyncio.run_coroutine_threadsafe(
+        in_lane(lane, coro, priority=priority, submitted=submitted,
+                timeout=timeout if wait_result else None),
+        loop,
+    )
+    LOOP_MONITOR.track(future, kind, lane)
+
     if not wait_result:
-        future.add_done_callback(_future_done_callback)
+        future.add_done_callback(lambda fut: _future_done_callback(fut, kind))
         return None
-        
+
     try:
-        # Provide longer timeout (60s) for slow local LLM extraction
-        return future.result(timeout=60)
+        # Provide longer timeout (60s default) for slow local LLM extraction
+        return future.result(timeout=timeout)
     except Exception as e:
-        err_type = type(e).__name__
-        err_str = str(e)
-        
-        if "Timeout" in err_type or "Timeout" in err_str:
-            print("[Memory Agent] LLM took too long to respond (Timeout). Skipped.")
-        elif "Target entity not found" in err_str or "duplicate" in err_str or "validation" in err_str.lower():
-            pass # Silent skip
-        else:
-            print(f"[Memory Agent] Minor skip ({err_type}): {err_str}")
+        outcome = LOOP_MONITOR.record_error(e, kind)
+        if outcome == "timeout":
+            print(f"[Memory Agent] {lane} lane took too long to respond (Timeout). Skipped.")
+        elif outcome == "exception":
+            print(f"[Memory Agent] Minor skip ({type(e).__name__}): {e}")
         return None
 
 
 def run_async_readonly(coro, timeout=15):
     """
-    Run a read-only async coroutine WITHOUT the LLM lock.
+    Run a read-only async coroutine in the unbounded 'readonly' lane.
     Use this for Neo4j queries that don't call Ollama — so they
-    are never blocked by background entity extraction tasks.
+    are never blocked by background entity extraction tasks. The
+    coroutine is cancelled on the loop once the timeout expires.
     """
-    global _async_loop, _loop_thread
-
-    if _async_loop is None:
-        _async_loop = asyncio.new_event_loop()
-        _loop_thread = threading.Thread(
-            target=_start_background_loop,
-            args=(_async_loop,),
-            daemon=True
-        )
-        _loop_thread.start()
-
-    # NO lock — submit directly
-    future = asyncio.run_coroutine_threadsafe(coro, _async_loop)
+    loop = _ensure_loop()
+    kind = task_kind(coro)
+    future = asyncio.run_coroutine_threadsafe(
+        in_lane("readonly", coro, submitted=time.monotonic(), timeout=timeout), loop
+    )
+    LOOP_MONITOR.track(future, kind, "readonly")
     try:
-        return future.result(timeout=timeout)
+        return future.result(timeout=timeout + 1)
     except Exception as e:
-        err_str = str(e)
-        if "Timeout" not in err_str:
-            print(f"[Memory ReadOnly] {type(e).__name__}: {err_str}")
+        if LOOP_MONITOR.record_error(e, kind) != "timeout":
+            print(f"[Memory ReadOnly] {type(e).__name__}: {e}")
         return None
 
 
+def _per_patient(fn):
+    """
+    Run a PatientMemory write under the patient's own asyncio lock. The write
+    lane admits LANE_WRITE_CONCURRENCY coroutines at once; two snapshots of
+    one patient must still not interleave (HR-zero debounce, Graphiti posture
+    throttle, encoding preamble, rollup observe order). Other patients run
+    in parallel.
+    """
+    @functools.wraps(fn)
+    async def wrapper(self, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        lock, lock_loop = getattr(self, "_write_lock", (None, None))
+        if lock_loop is not loop:
+            lock = asyncio.Lock()
+            self._write_lock = (lock, loop)
+        async with lock:
+            return await fn(self, *args, **kwargs)
+    return wrapper
+
+
 _patient_instances = {}
+register_flush_listener()   # committed direct-writer rows invalidate cached reads
 
 # ---------------------------------------------------------------------------
 # PATIENT MEMORY CLASS
@@ -153,6 +498,9 @@ _patient_instances = {}
 class PatientMemory:
     def __new__(cls, device_id: str):
         if device_id not in _patient_instances:
+            if cls is PatientMemory and MEMORY_BACKEND == "inprocess":
+                from memory.inprocess_backend import InProcessPatientMemory
+                cls = InProcessPatientMemory
             _patient_instances[device_id] = super(PatientMemory, cls).__new__(cls)
         return _patient_instances[device_id]
 
@@ -165,42 +513,136 @@ class PatientMemory:
         self._hr_zero_count = 0  # Debouncer untuk bacaan HR: 0 berturut-turut
         self._initialized = True
 
-    async def add_episode(self, content: str, episode_type: str = "observation", reference_time: Optional[datetime] = None) -> None:
+    async def add_episode(
+        self,
+        content: str,
+        episode_type: str = "observation",
+        reference_time: Optional[datetime] = None,
+        properties: Optional[dict] = None,
+    ) -> None:
         """
         Store an event as a natural-language episode in the memory graph.
 
+        With GRAPHITI_QUEUE on (default) the episode is persisted to the durable
+        ingestion queue (memory/ingest_queue.py) and this returns immediately;
+        the queue workers call ingest_episode().
+
         Args:
             content        : Descriptive text. Be specific — include vitals, location,
                              time context. Graphiti extracts entities from this text.
             episode_type   : Category tag (observation, alert, baseline, meal, sleep, etc.)
             reference_time : Optional timestamp. If not passed, defaults to datetime.now()
+            properties     : Optional typed columns (EPISODE_PROPS) set on the Episodic node
         """
-        graphiti = await get_graphiti()
-        
         ref_dt = reference_time if reference_time else datetime.now()
-        episode_name = f"{episode_type}_{ref_dt.strftime('%Y%m%d_%H%M%S')}"
+
+        from memory.ingest_queue import GRAPHITI_QUEUE, INGEST_QUEUE
+        if GRAPHITI_QUEUE:
+            await INGEST_QUEUE.start()
+            queued = await asyncio.get_running_loop().run_in_executor(
+                None, INGEST_QUEUE.enqueue, self.device_id, content, episode_type, ref_dt, properties
+            )
+            if queued:
+                print(f"[Memory] [QUEUE] Episode [{episode_type}] queued for {self.device_id}")
+            else:
+                print(f"[Memory] [QUEUE] Duplicate episode [{episode_type}] skipped for {self.device_id}")
+            return
+
+        try:
+            await self.ingest_episode(content, episode_type, ref_dt, properties)
+        except asyncio.TimeoutError:
+            print(f"[Memory] [WARN] Episode TIMEOUT [{episode_type}] — skipping, lanjut episode berikutnya")
+
+    async def ingest_episode(
+        self,
+        content: str,
+        episode_type: str,
+        reference_time: datetime,
+        properties: Optional[dict] = None,
+        episode_key: Optional[str] = None,
+        check_existing: bool = False,
+    ) -> None:
+        """
+        Send one episode through Graphiti (LLM entity extraction). Raises on
+        timeout/failure so the ingestion queue can retry it.
+
+        episode_key    : stable suffix of the episode name (the queue row id)
+        check_existing : skip Graphiti if an episode with that name already
+                         exists — a retry after a timeout that fired once
+                         add_episode had already saved the episode
+        """
+        graphiti = await get_graphiti()
+        episode_name = f"{episode_type}_{reference_time.strftime('%Y%m%d_%H%M%S')}"
+        if episode_key:
+            episode_name += f"_{episode_key}"
+        if check_existing:
+            existing = await self._existing_episode(episode_name, reference_time)
+            if existing:
+                print(f"[Memory] [SKIP] Episode {episode_name} already stored — not re-extracted")
+                props = {**_time_of_day_props(reference_time, self.device_id), **(properties or {})}
+                await self._set_episode_properties(existing, props)
+                READ_CACHE.bump(self.device_id)
+                return
 
         import time as _time
-        import asyncio as _asyncio
         _t0 = _time.time()
         print(f"[Memory] [WAIT] Sending episode [{episode_type}] to local model... {content[:50]}")
 
+        from memory.ingest_queue import DEFAULT_PRIORITY, PRIORITY
         try:
-            await _asyncio.wait_for(
-                graphiti.add_episode(
-                    name=episode_name,
-                    episode_body=content,
-                    source_description=f"UTLMediCore sensor stream — Device {self.device_id}",
-                    group_id=self.group_id,
-                    reference_time=ref_dt,
+            # extraction lane: caps concurrent LLM extractions, falls/critical first
+            result = await in_lane(
+                "extraction",
+                asyncio.wait_for(
+                    graphiti.add_episode(
+                        name=episode_name,
+                        episode_body=content,
+                        source_description=f"UTLMediCore sensor stream — Device {self.device_id}",
+                        group_id=self.group_id,
+                        reference_time=reference_time,
+                    ),
+                    timeout=90.0   # 90 detik max — jika llama8B stuck, skip episode ini
                 ),
-                timeout=90.0   # 90 detik max — jika llama8B stuck, skip episode ini
+                priority=PRIORITY.get(episode_type, DEFAULT_PRIORITY),
             )
-            _elapsed = _time.time() - _t0
-            print(f"[Memory] [OK] Episode stored in {_elapsed:.1f}s [{episode_type}] for {self.device_id}")
-        except _asyncio.TimeoutError:
-            _elapsed = _time.time() - _t0
-            print(f"[Memory] [WARN] Episode TIMEOUT after {_elapsed:.0f}s [{episode_type}] — skipping, lanjut episode berikutnya")
+        except asyncio.TimeoutError:
+            print(f"[Memory] [WARN] Episode TIMEOUT after {_time.time() - _t0:.0f}s [{episode_type}]")
+            raise
+        _elapsed = _time.time() - _t0
+        print(f"[Memory] [OK] Episode stored in {_elapsed:.1f}s [{episode_type}] for {self.device_id}")
+        if getattr(result, "episode", None) is not None:
+            # minute_of_day / local_date on every episode (time-of-day index)
+            props = {**_time_of_day_props(reference_time, self.device_id), **(properties or {})}
+            await self._set_episode_properties(result.episode.uuid, props)
+        READ_CACHE.bump(self.device_id)
+
+    async def _existing_episode(self, name: str, reference_time: datetime) -> Optional[str]:
+        """uuid of this patient's Episodic node called `name` (created after reference_time), or None."""
+        async with async_session() as s:
+            r = await s.run(
+                """
+                MATCH (e:Episodic)
+                WHERE e.group_id = $gid AND e.created_at >= datetime($since) AND e.name = $name
+                RETURN e.uuid AS uuid
+                LIMIT 1
+                """,
+                gid=self.group_id, name=name,
+                since=(reference_time - timedelta(days=1)).astimezone().isoformat(),
+            )
+            rec = await r.single()
+        return rec["uuid"] if rec else None
+
+    async def _set_episode_properties(self, episode_uuid: str, properties: dict) -> None:
+        """SET typed columns on an Episodic node (Graphiti only stores name/content)."""
+        props = {k: v for k, v in properties.items() if k in EPISODE_PROPS and v is not None}
+        try:
+            async with async_session() as s:
+                await s.run(
+                    "MATCH (e:Episodic {uuid: $uuid}) SET e += $props",
+                    uuid=episode_uuid, props=props,
+                )
+        except Exception as e:
+            print(f"[Memory] [WARN] Episode properties not set ({episode_uuid}): {e}")
 
     async def get_patient_context(self, query: str, limit: int = 10) -> str:
         """
@@ -218,6 +660,20 @@ class PatientMemory:
             limit : Max results per tier
         """
         # ── Tier 1: Graphiti semantic search (EntityEdge facts) ──────────────
+        context = await self._search_facts(query, limit)
+        if context:
+            return context
+
+        # ── Tier 2: Direct Neo4j backup (Reads Episodic + VitalReading to reveal Direct Writes) ──
+        context = await self._tier2_context(limit)
+        if context:
+            return context
+
+        # ── Both tiers empty / failed ─────────────────────────────────────────
+        return "No patient history available yet. This appears to be the first session."
+
+    async def _search_facts(self, query: str, limit: int) -> str:
+        """Tier 1 — graphiti.search() over extracted EntityEdge facts. Empty string on miss."""
         try:
             graphiti = await get_graphiti()
             results = await graphiti.search(
@@ -235,123 +691,191 @@ class PatientMemory:
                 return context
         except Exception as e:
             print(f"[Memory Tier-1] graphiti.search() failed: {e}")
+        return ""
 
-        # ── Tier 2: Direct Neo4j backup (Reads Episodic + VitalReading to reveal Direct Writes) ──
-        try:
-            import os
-            from neo4j import AsyncGraphDatabase
-
-            uri  = os.getenv("NEO4J_URI",      "bolt://localhost:7687")
-            user = os.getenv("NEO4J_USER",     "neo4j")
-            pw   = os.getenv("NEO4J_PASSWORD", "password")
-
-            driver = AsyncGraphDatabase.driver(uri, auth=(user, pw))
-            episodes = []
-            async with driver.session() as s:
-                # ── UNION ALl: Fetch LLM Episodic nodes + Direct Write nodes ────────
-                result = await s.run(
-                    """
-                    // 1. Traditional Graphiti LLM episodes
-                    MATCH (e:Episodic)
-                    WHERE e.group_id = $gid
-                    RETURN e.content AS content, datetime(e.created_at) AS ts
-                    
-                    UNION ALL
-                    
-                    // 2. New Direct Real-time Vital Readings
-                    MATCH (p:Patient {device_id: $dev_id})-[:HAD_READING]->(v:VitalReading)
-                    RETURN "Real-time reading — HR: " + toString(v.hr) + " | SpO2: " + toString(v.spo2) + 
-                           "% | Posture: " + v.posture_label + " (" + v.condition + ")" AS content, 
-                           datetime(v.timestamp_utc) AS ts
-                    
-                    UNION ALL
-                    
-                    // 3. New Direct Alert Events
-                    MATCH (p:Patient {device_id: $dev_id})-[:HAD_ALERT]->(a:AlertEvent)
-                    RETURN "⚠️ ALERT — " + a.alert_type + " [" + a.severity + "]: " + a.message AS content, 
-                           datetime(a.timestamp_utc) AS ts
+    @cached_read("tier2_context")
+    async def _tier2_context(self, limit: int, session=None) -> str:
+        """
+        Tier 2 — latest Episodic + VitalReading + AlertEvent records straight from Neo4j.
 
-                    ORDER BY ts DESC
-                    LIMIT $lim
-                    """,
-                    gid    = self.group_id,
-                    dev_id = self.device_id,
-                    lim    = limit,
-                )
-                async for rec in result:
-                    content = (rec["content"] or "").strip()
-                    ts = str(rec["ts"] or "")[:16]
-                    if content:
-                        episodes.append(f"[{ts}] {content}")
+        Three independent index-ordered top-k reads (one per source, each bounded
+        by a lookback window) merged newest-first in Python. The lookback starts
+        at TIER2_LOOKBACK_H and grows x4 up to TIER2_MAX_LOOKBACK_H only while
+        fewer than `limit` records were found — no scan over the whole history.
+        Pass an open AsyncSession to reuse it; otherwise one is taken from the shared pool.
+        """
+        try:
+            import heapq
+            from datetime import timezone
 
-            await driver.close()
+            now = datetime.now(timezone.utc)
+            lookback = TIER2_LOOKBACK_H
+            async with (async_session() if session is None else nullcontext(session)) as s:
+                while True:
+                    since = (now - timedelta(hours=lookback)).isoformat()
+                    sources = []
+                    for cypher, params in (
+                        (_TIER2_EPISODIC, {"gid": self.group_id}),
+                        (_TIER2_VITALS,   {"dev_id": self.device_id}),
+                        (_TIER2_ALERTS,   {"dev_id": self.device_id}),
+                    ):
+                        r = await s.run(cypher, since=since, lim=limit, **params)
+                        sources.append([
+                            (_native(rec["ts"]), (rec["content"] or "").strip())
+                            async for rec in r if rec["ts"] is not None
+                        ])
+                    found = sum(len(src) for src in sources)
+                    if found >= limit or lookback >= TIER2_MAX_LOOKBACK_H:
+                        break
+                    lookback = min(lookback * 4, TIER2_MAX_LOOKBACK_H)
+
+            merged = heapq.merge(*sources, key=lambda x: x[0], reverse=True)
+            episodes = [f"[{str(ts)[:16]}] {content}" for ts, content in merged if content][:limit]
 
             if episodes:
                 context = (
                     f"Patient Episode & Real-time History — {len(episodes)} recent records:\n"
                     + "\n\n".join(episodes)
                 )
-                print(f"[Memory Tier-2] {len(episodes)} records read for {self.device_id} (Hybrid Model)")
+                print(f"[Memory Tier-2] {len(episodes)} records read for {self.device_id} "
+                      f"(Hybrid Model, lookback {lookback}h)")
                 return context
 
         except Exception as e:
             print(f"[Memory Tier-2] Neo4j direct query failed: {e}")
+        return ""
 
-        # ── Both tiers empty / failed ─────────────────────────────────────────
-        return "No patient history available yet. This appears to be the first session."
+    async def get_insight_contexts(
+        self,
+        queries: dict,
+        limit: int = 8,
+        hours: int = 24,
+        direct_limit: int = 15,
+        budget_s: float = 20.0,
+    ) -> dict:
+        """
+        Retrieve context for several insight topics at once.
+
+        All Tier-1 searches run concurrently under one shared time budget.
+        Topics that miss share a SINGLE Tier-2 read (one Neo4j session) instead
+        of re-reading the same episode window once per topic.
+
+        Args:
+            queries      : {topic_key: question}
+            limit        : Tier-1 facts per topic
+            hours        : episode window for the direct Tier-2 fallback
+            direct_limit : max episodes for the direct Tier-2 fallback
+            budget_s     : total wall-clock budget for the whole retrieval
+
+        Returns:
+            {topic_key: context string ('' when nothing was found)}
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + budget_s
+
+        def _remaining() -> float:
+            return max(deadline - loop.time(), 0.1)
+
+        async def _one(key, query):
+            try:
+                return key, await asyncio.wait_for(self._search_facts(query, limit), _remaining())
+            except asyncio.TimeoutError:
+                print(f"[Memory Tier-1] '{key}' search exceeded the {budget_s:.0f}s budget")
+                return key, ""
 
-    async def get_patient_episodes_direct(self, limit: int = 10, hours: int = 24) -> str:
+        t0 = loop.time()
+        results = dict(await asyncio.gather(*(_one(k, q) for k, q in queries.items())))
+        misses = [k for k, v in results.items() if not v]
+
+        if misses:
+            shared = ""
+            try:
+                shared = await asyncio.wait_for(self._shared_tier2(limit, hours, direct_limit), _remaining())
+            except asyncio.TimeoutError:
+                print(f"[Memory Tier-2] shared fallback exceeded the {budget_s:.0f}s budget")
+            for k in misses:
+                results[k] = shared
+
+        print(f"[Memory Insights] {len(queries) - len(misses)}/{len(queries)} Tier-1 hits, "
+              f"{'1 shared' if misses else 'no'} Tier-2 read in {loop.time() - t0:.1f}s for {self.device_id}")
+        return results
+
+    async def _shared_tier2(self, limit: int, hours: int, direct_limit: int) -> str:
+        """One session: hybrid Tier-2 first, windowed episode sample if that is empty."""
+        async with async_session() as s:
+            ctx = await self._tier2_context(limit, session=s)
+            if not ctx:
+                ctx = await self.get_patient_episodes_direct(limit=direct_limit, hours=hours, session=s)
+            return ctx
+
+    @cached_read("episodes_direct")
+    async def get_patient_episodes_direct(self, limit: int = 10, hours: int = 24, session=None) -> str:
         """
         Tier-2 fallback: Read raw Episodic nodes directly from Neo4j.
         Does NOT call Ollama — always fast, no lock contention.
-        Sample episodes randomly within the requested timeframe so we don't just get the last 10 minutes.
+        Deterministic stratified sample: the window is split into `limit` time
+        buckets and the most representative episode of each is kept (critical
+        first, then a posture change, then the latest) so we don't just get the
+        last 10 minutes. The window end is aligned to SAMPLE_ALIGN_SEC, so
+        repeated calls return the same set and can be cached.
         Returns episode texts as context string, or empty string if none found.
+        Pass an open AsyncSession to reuse it instead of taking a new one from the pool.
         """
         try:
-            import os
-            from neo4j import AsyncGraphDatabase
-
-            uri  = os.getenv("NEO4J_URI",      "bolt://localhost:7687")
-            user = os.getenv("NEO4J_USER",     "neo4j")
-            pw   = os.getenv("NEO4J_PASSWORD", "password")
+            from datetime import timezone
 
-            driver = AsyncGraphDatabase.driver(uri, auth=(user, pw))
-            episodes = []
-            dur_start = f'PT{hours}H'
-            
             # If hours>24 but not 168 (e.g. 48 for Yesterday), focus explicitly on the window [24h ago to 48h ago]
-            if hours == 48:
-                dur_end = 'PT24H'
-            else:
-                dur_end = 'PT0H'
+            end_offset_h = 24 if hours == 48 else 0
 
-            async with driver.session() as s:
+            now = datetime.now(timezone.utc)
+            aligned = datetime.fromtimestamp(
+                now.timestamp() // SAMPLE_ALIGN_SEC * SAMPLE_ALIGN_SEC, tz=timezone.utc
+            )
+            w_end = aligned - timedelta(hours=end_offset_h)
+            w_start = aligned - timedelta(hours=hours)
+            buckets = _time_buckets(w_start, w_end, max(limit, 1))
+
+            picked = []
+            async with (async_session() if session is None else nullcontext(session)) as s:
+                # One index-ordered seek per bucket on (group_id, created_at),
+                # reading at most _BUCKET_SCAN nodes each — cost ~ limit, not window size
                 r = await s.run(
                     """
-                    MATCH (e:Episodic)
-                    WHERE e.group_id = $gid
-                      AND e.created_at >= datetime() - duration($dur_start)
-                      AND e.created_at <= datetime() - duration($dur_end)
-                    WITH e, rand() AS r
-                    ORDER BY r
-                    LIMIT $lim
-                    WITH e
-                    ORDER BY e.created_at ASC
-                    RETURN e.name    AS name,
-                           e.content AS content,
-                           e.valid_at AS ts
+                    UNWIND $buckets AS b
+                    CALL {
+                        WITH b
+                        MATCH (e:Episodic)
+                        WHERE e.group_id = $gid
+                          AND e.created_at >= datetime(b.start)
+                          AND e.created_at <  datetime(b.end)
+                        RETURN e
+                        ORDER BY e.created_at DESC
+                        LIMIT $scan
+                    }
+                    RETURN b.i           AS bucket,
+                           e.name        AS name,
+                           e.content     AS content,
+                           e.condition   AS condition,
+                           e.posture_label AS posture_label,
+                           e.valid_at    AS ts
                     """,
                     gid=self.group_id,
-                    lim=limit,
-                    dur_start=dur_start,
-                    dur_end=dur_end,
+                    buckets=buckets,
+                    scan=_BUCKET_SCAN,
                 )
+                per_bucket: dict = {}
                 async for rec in r:
-                    content = (rec["content"] or "").strip()
-                    ts = str(rec["ts"] or "")[:16]
-                    if content:
-                        episodes.append(f"[{ts}] {content}")
-            await driver.close()
+                    per_bucket.setdefault(rec["bucket"], []).append(dict(rec))
+                for i in sorted(per_bucket):
+                    best = _pick_representative(per_bucket[i])
+                    if best:
+                        picked.append(best)
+
+            episodes = []
+            for rec in picked:
+                content = (rec["content"] or "").strip()
+                ts = str(rec["ts"] or "")[:16]
+                episodes.append(f"[{ts}] {content}")
 
             if episodes:
                 print(f"[Memory Tier-2] {len(episodes)} episodes direct for {self.device_id}")
@@ -368,14 +892,9 @@ class PatientMemory:
         Write manual context DIRECTLY to Neo4j as a ManualContext node.
         SYNCHRONOUS — no async, no LLM lock, instant and reliable.
         """
-        import os, uuid as _uuid
-        from neo4j import GraphDatabase
+        import uuid as _uuid
         from datetime import datetime as _dt
 
-        uri  = os.getenv("NEO4J_URI",      "bolt://localhost:7687")
-        user = os.getenv("NEO4J_USER",     "neo4j")
-        pw   = os.getenv("NEO4J_PASSWORD", "password")
-
         ref_dt = reference_time if reference_time else _dt.now()
         # Ensure ref_time is an ISO string for Neo4j datetime()
         if isinstance(ref_dt, str):
@@ -384,8 +903,7 @@ class PatientMemory:
             ref_time_str = ref_dt.isoformat()
 
         try:
-            driver = GraphDatabase.driver(uri, auth=(user, pw))
-            with driver.session() as s:
+            with sync_session() as s:
                 s.run(
                     """
                     MERGE (p:Patient {device_id: $dev_id})
@@ -407,25 +925,18 @@ class PatientMemory:
                     content=content,
                     ref_time=ref_time_str
                 )
-            driver.close()
             print(f"[Memory] [OK] ManualContext saved: [{context_type}] for {self.device_id}")
             return True
         except Exception as e:
             print(f"[Memory] [ERR] ManualContext write failed: {e}")
             return False
+        finally:
+            READ_CACHE.bump(self.device_id)
 
     def delete_manual_context_sync(self, node_id: str) -> bool:
         """Delete a ManualContext node by uuid or elementId. SYNCHRONOUS."""
-        import os
-        from neo4j import GraphDatabase
-
-        uri  = os.getenv("NEO4J_URI",      "bolt://localhost:7687")
-        user = os.getenv("NEO4J_USER",     "neo4j")
-        pw   = os.getenv("NEO4J_PASSWORD", "password")
-
         try:
-            driver = GraphDatabase.driver(uri, auth=(user, pw))
-            with driver.session() as s:
+            with sync_session() as s:
                 # Try uuid first
                 result = s.run(
                     """
@@ -450,29 +961,22 @@ class PatientMemory:
                         eid=node_id,
                         dev_id=self.device_id
                     )
-            driver.close()
             print(f"[Memory] [OK] ManualContext deleted: {node_id}")
             return True
         except Exception as e:
             print(f"[Memory] [ERR] Delete ManualContext failed: {e}")
             return False
+        finally:
+            READ_CACHE.bump(self.device_id)
 
+    @cached_read("manual_episodes")
     def get_manual_episodes_sync(self, limit: int = 50, hours_back: int = None) -> list:
         """Fetch manual context entries from Neo4j. SYNCHRONOUS — no lock contention.
         Returns deduplicated entries with proper UTC timestamps.
         If hours_back is provided, only fetches entries from the last N hours."""
-        import os
-        from neo4j import GraphDatabase
-        
-        uri  = os.getenv("NEO4J_URI",      "bolt://localhost:7687")
-        user = os.getenv("NEO4J_USER",     "neo4j")
-        pw   = os.getenv("NEO4J_PASSWORD", "password")
-
         episodes = []
         seen_content = set()  # For deduplication
         try:
-            driver = GraphDatabase.driver(uri, auth=(user, pw))
-            
             # Buat filter waktu jika ada
             time_filter = ""
             dur_str = ""
@@ -480,7 +984,7 @@ class PatientMemory:
                 time_filter = "AND coalesce(m.reference_time, m.created_at) >= datetime() - duration($dur_hr)"
                 dur_str = f"PT{hours_back}H"
 
-            with driver.session() as s:
+            with sync_session() as s:
                 # ManualContext nodes (direct writes) — PRIMARY source
                 query = f"""
                     MATCH (m:ManualContext {{device_id: $dev_id}})
@@ -554,13 +1058,98 @@ class PatientMemory:
                             "source": "graphiti"
                         })
 
-            driver.close()
             return episodes
         except Exception as e:
             print(f"[Memory] get_manual_episodes failed: {e}")
             return []
 
-    async def get_activity_summary(self, hours_back: int = 24) -> str:
+    @_per_patient
+    async def store_segments(self, rows: list) -> None:
+        """Persist posture/area Segment rows from the Sessionizer (memory/sessionizer.py)."""
+        try:
+            from memory.direct_neo4j_writer import awrite_segment
+            for row in rows:
+                await awrite_segment(row)
+        except Exception as e:
+            print(f"[Sessionizer] segment write error: {e}")
+        READ_CACHE.bump(self.device_id)
+
+    async def _segment_rows(self, start: datetime, end: datetime) -> list:
+        """Persisted Segment rows overlapping [start, end) (naive local times)."""
+        async with async_session() as s:
+            r = await s.run(
+                """
+                MATCH (s:Segment)
+                WHERE s.device_id = $dev_id
+                  AND s.end_at >= datetime($start)
+                  AND s.valid_at < datetime($end)
+                RETURN s.uuid AS uuid, s.kind AS kind, s.label AS label,
+                       s.start_utc AS start_utc, s.end_utc AS end_utc
+                """,
+                dev_id=self.device_id,
+                start=start.astimezone().isoformat(),
+                end=end.astimezone().isoformat(),
+            )
+            return [dict(rec) async for rec in r]
+
+    async def get_segment_durations(self, hours_back: int = 24) -> dict:
+        """
+        Minutes per posture / area as an interval-overlap sum over the Segment
+        rows of the window plus the live open segments. {} when there are none.
+        "segments_from" is the earliest segment start inside the window.
+        """
+        from memory.sessionizer import SESSIONIZERS, overlap_minutes, _local
+        end = datetime.now()
+        start = end - timedelta(hours=hours_back)
+        try:
+            rows = await self._segment_rows(start, end)
+        except Exception as e:
+            print(f"[Sessionizer] segment read failed: {e}")
+            rows = []
+        live = SESSIONIZERS.get(self.device_id)
+        if live is not None:
+            rows += live.open_rows()
+        if not rows:
+            return {}
+        totals = overlap_minutes(rows, start, end)
+        return {
+            "posture_minutes": totals["posture"],
+            "area_minutes":    totals["area"],
+            "duration_source": "segments",
+            "segments":        len({r["uuid"] for r in rows}),
+            "segments_from":   max(min(_local(r["start_utc"]) for r in rows), start),
+        }
+
+    @cached_read("activity_stats")
+    async def get_activity_stats(self, hours_back: int = 24) -> dict:
+        """
+        Activity statistics of the last `hours_back` hours (see _activity_stats).
+        With SESSIONIZER on, the posture / area minutes come from the persisted
+        Segment intervals instead of pairing consecutive snapshots — but only
+        when the segments cover the window. Right after SESSIONIZER is enabled
+        the older part of the window has episodes and no segments, so the
+        snapshot minutes are kept (duration_source "episodes").
+        """
+        stats = await self._activity_stats(hours_back)
+        from memory.sessionizer import SESSIONIZER, SEGMENT_GAP_SEC, _local
+        if not SESSIONIZER:
+            return stats
+        durations = await self.get_segment_durations(hours_back)
+        if not durations:
+            return stats
+        window_start = datetime.now() - timedelta(hours=hours_back)
+        covered_from = durations["segments_from"] - timedelta(seconds=SEGMENT_GAP_SEC)
+        if covered_from > window_start and stats.get("first_ts") and _local(stats["first_ts"]) < covered_from:
+            print(f"[Sessionizer] {self.device_id}: segments start at "
+                  f"{durations['segments_from']:%Y-%m-%d %H:%M}, using episode durations")
+            return {**stats, "duration_source": "episodes",
+                    "segments_from": durations["segments_from"]}
+        if not stats:
+            stats = {"snapshots": 0, "first_ts": None, "last_ts": None,
+                     "steps_avg": None, "steps_max": None}
+        return {**stats, **durations}
+
+    async def _activity_stats(self, hours_back: int = 24) -> dict:
         """
         Compute DURATION-BASED activity statistics from Neo4j episode timestamps.
         Groups consecutive same-posture/location snapshots and calculates:
@@ -569,18 +1158,22 @@ class PatientMemory:
         - First and last recorded times
         - Step count trends
 
-        This enables the chatbot to answer 'how long' questions accurately.
+        Returns a dict (minutes per posture/area) — {} when nothing is stored.
+        Windows of ROLLUP_MIN_HOURS or more are served from hourly ActivityRollup
+        rows (memory/activity_rollup.py) instead of scanning every episode.
         """
+        from memory.activity_rollup import ACTIVITY_ROLLUP, ROLLUP_MIN_HOURS, ROLLUPS
+        if ACTIVITY_ROLLUP and hours_back >= ROLLUP_MIN_HOURS:
+            try:
+                stats = await ROLLUPS.summarize(self.device_id, hours_back)
+                if stats:
+                    return stats
+            except Exception as e:
+                print(f"[Memory Summary] Rollup read failed, scanning episodes: {e}")
+
         try:
-            import os
-            from neo4j import AsyncGraphDatabase
             from datetime import timedelta
 
-            uri  = os.getenv("NEO4J_URI",      "bolt://localhost:7687")
-            user = os.getenv("NEO4J_USER",     "neo4j")
-            pw   = os.getenv("NEO4J_PASSWORD", "password")
-
-            driver = AsyncGraphDatabase.driver(uri, auth=(user, pw))
             episodes = []
             dur_start = f'PT{hours_back}H'
             
@@ -593,14 +1186,16 @@ class PatientMemory:
             # Get start date anchor
             start_dt = datetime.now() - timedelta(hours=hours_back)
 
-            async with driver.session() as s:
+            async with async_session() as s:
                 # 1. Cari kondisi terakhir SEBELUM range waktu start
                 prev_r = await s.run(
                     """
                     MATCH (e:Episodic)
                     WHERE e.group_id = $gid
                       AND e.created_at < datetime() - duration($dur_start)
-                    RETURN e.content AS content
+                    RETURN e.posture_label AS posture_label,
+                           e.area_label    AS area_label,
+                           CASE WHEN e.posture_label IS NULL THEN e.content END AS content
                     ORDER BY e.created_at DESC
                     LIMIT 1
                     """,
@@ -608,11 +1203,9 @@ class PatientMemory:
                     dur_start=dur_start
                 )
                 async for p_rec in prev_r:
-                     p_content = (p_rec["content"] or "").strip()
-                     for line in p_content.split("."):
-                         l = line.strip()
-                         if "Activity/Posture:" in l: prev_posture = l.split("Activity/Posture:")[-1].strip()
-                         elif "Location:" in l: prev_area = l.split("Location:")[-1].strip()
+                     f = _episode_fields(p_rec)
+                     prev_posture = f.get("posture_label") or prev_posture
+                     prev_area = f.get("area_label") or prev_area
 
                 # 2. Main query
                 r = await s.run(
@@ -621,8 +1214,11 @@ class PatientMemory:
                     WHERE e.group_id = $gid
                       AND e.created_at >= datetime() - duration($dur_start)
                       AND e.created_at <= datetime() - duration($dur_end)
-                    RETURN e.content  AS content,
-                           e.valid_at AS ts
+                    RETURN e.posture_label AS posture_label,
+                           e.area_label    AS area_label,
+                           e.steps         AS steps,
+                           CASE WHEN e.posture_label IS NULL THEN e.content END AS content,
+                           e.valid_at      AS ts
                     ORDER BY e.created_at ASC
                     """,
                     gid=self.group_id,
@@ -630,126 +1226,90 @@ class PatientMemory:
                     dur_end=dur_end,
                 )
                 async for rec in r:
-                    content = (rec["content"] or "").strip()
                     ts_raw  = str(rec["ts"] or "")
-                    if content and ts_raw:
+                    if ts_raw and (rec["posture_label"] is not None or rec["content"]):
                         # Parse timestamp
                         try:
                             ts_str = ts_raw.split("+")[0].split("000")[0].rstrip(".")
                             ts = datetime.fromisoformat(ts_str)
                         except Exception:
                             ts = None
-                        # Extract posture and area from episode text
-                        posture = "Unknown"
-                        area    = "Unknown"
-                        steps_n = 0
-                        for line in content.split("."):
-                            l = line.strip()
-                            if "Activity/Posture:" in l:
-                                posture = l.split("Activity/Posture:")[-1].strip()
-                            elif "Location:" in l:
-                                area = l.split("Location:")[-1].strip()
-                            elif "Step count:" in l:
-                                try:
-                                    steps_n = int(l.split("Step count:")[-1].strip().split()[0])
-                                except Exception:
-                                    pass
-                        episodes.append({"ts": ts, "posture": posture, "area": area, "steps": steps_n, "content": content[:120]})
-
-            await driver.close()
-
-            if not episodes:
-                return ""
+                        f = _episode_fields(rec)
+                        episodes.append({
+                            "ts":      ts,
+                            "posture": f.get("posture_label") or "Unknown",
+                            "area":    f.get("area_label") or "Unknown",
+                            "steps":   f.get("steps") or 0,
+                        })
 
-            # ── Compute duration per posture ──
-            posture_durations: dict[str, float] = {}  
-            area_durations:    dict[str, float] = {}
-            step_records = []
-
-            # Tambahkan interpolasi dari START BOUNDS ke Elemen Pertama
-            if episodes[0]["ts"]:
-                gap_start_min = (episodes[0]["ts"] - start_dt).total_seconds() / 60
-                if 0 < gap_start_min <= 600:
-                    posture_durations[prev_posture] = gap_start_min
-                    area_durations[prev_area] = gap_start_min
-
-            # ── Compute duration per posture (group consecutive same-posture) ──
-            step_records = []
-
-            for i in range(len(episodes) - 1):
-                ep   = episodes[i]
-                nxt  = episodes[i + 1]
-                if ep["ts"] and nxt["ts"]:
-                    delta_min = (nxt["ts"] - ep["ts"]).total_seconds() / 60
-                    # Only count reasonable intervals (1s to 10h) to avoid gaps overlaying
-                    if 0 < delta_min <= 600:
-                        p = ep["posture"]
-                        a = ep["area"]
-                        posture_durations[p] = posture_durations.get(p, 0) + delta_min
-                        area_durations[a]    = area_durations.get(a, 0) + delta_min
-
-                if ep["steps"] > 0:
-                    step_records.append(ep["steps"])
-
-            # ── Format output for LLM ──
-            lines = [f"ACTIVITY DURATION SUMMARY for Patient {self.device_id}:"]
-            lines.append(f"Based on {len(episodes)} recorded snapshots.\n")
-
-            first_ts = next((e["ts"] for e in episodes if e["ts"]), None)
-            last_ts  = next((e["ts"] for e in reversed(episodes) if e["ts"]), None)
-            if first_ts and last_ts:
-                span_h = (last_ts - first_ts).total_seconds() / 3600
-                lines.append(f"Monitoring period: {first_ts.strftime('%Y-%m-%d %H:%M')} to {last_ts.strftime('%Y-%m-%d %H:%M')} ({span_h:.1f} hours total)\n")
-
-            if posture_durations:
-                lines.append("Time spent in each posture:")
-                for posture, mins in sorted(posture_durations.items(), key=lambda x: -x[1]):
-                    h, m = divmod(int(mins), 60)
-                    label = f"  {posture}: {h}h {m}min" if h else f"  {posture}: {int(mins)} min"
-                    lines.append(label)
-
-            if area_durations:
-                lines.append("\nTime spent in each location:")
-                for area, mins in sorted(area_durations.items(), key=lambda x: -x[1]):
-                    h, m = divmod(int(mins), 60)
-                    label = f"  {area}: {h}h {m}min" if h else f"  {area}: {int(mins)} min"
-                    lines.append(label)
-
-            if step_records:
-                avg_steps = sum(step_records) / len(step_records)
-                max_steps = max(step_records)
-                lines.append(f"\nStep count — avg: {int(avg_steps):,}, max recorded: {int(max_steps):,}")
-
-            print(f"[Memory Summary] Generated activity summary for {self.device_id}")
-            return "\n".join(lines)
+            return _duration_stats(episodes, start_dt, prev_posture, prev_area)
 
         except Exception as e:
             print(f"[Memory Summary] Failed: {e}")
+            return {}
+
+    async def get_activity_summary(self, hours_back: int = 24) -> str:
+        """
+        Activity statistics formatted for the LLM (see get_activity_stats).
+        This enables the chatbot to answer 'how long' questions accurately.
+        """
+        stats = await self.get_activity_stats(hours_back)
+        if not stats:
             return ""
 
+        lines = [f"ACTIVITY DURATION SUMMARY for Patient {self.device_id}:"]
+        if stats.get("duration_source") == "segments":
+            lines.append(f"Based on {stats['snapshots']} recorded snapshots; durations from "
+                         f"{stats['segments']} posture/location segments.\n")
+        else:
+            lines.append(f"Based on {stats['snapshots']} recorded snapshots.\n")
+
+        first_ts, last_ts = stats["first_ts"], stats["last_ts"]
+        if first_ts and last_ts:
+            span_h = (last_ts - first_ts).total_seconds() / 3600
+            lines.append(f"Monitoring period: {first_ts.strftime('%Y-%m-%d %H:%M')} to {last_ts.strftime('%Y-%m-%d %H:%M')} ({span_h:.1f} hours total)\n")
+
+        if stats["posture_minutes"]:
+            lines.append("Time spent in each posture:")
+            for posture, mins in sorted(stats["posture_minutes"].items(), key=lambda x: -x[1]):
+                h, m = divmod(int(mins), 60)
+                label = f"  {posture}: {h}h {m}min" if h else f"  {posture}: {int(mins)} min"
+                lines.append(label)
+
+        if stats["area_minutes"]:
+            lines.append("\nTime spent in each location:")
+            for area, mins in sorted(stats["area_minutes"].items(), key=lambda x: -x[1]):
+                h, m = divmod(int(mins), 60)
+                label = f"  {area}: {h}h {m}min" if h else f"  {area}: {int(mins)} min"
+                lines.append(label)
+
+        if stats["steps_avg"] is not None:
+            lines.append(f"\nStep count — avg: {int(stats['steps_avg']):,}, max recorded: {int(stats['steps_max']):,}")
+
+        print(f"[Memory Summary] Generated activity summary for {self.device_id}")
+        return "\n".join(lines)
+
+    @cached_read("raw_history")
     async def get_raw_history(self, hours_back: int) -> list:
         try:
-            import os
-            from neo4j import AsyncGraphDatabase
-
-            uri  = os.getenv("NEO4J_URI",      "bolt://localhost:7687")
-            user = os.getenv("NEO4J_USER",     "neo4j")
-            pw   = os.getenv("NEO4J_PASSWORD", "password")
-
-            driver = AsyncGraphDatabase.driver(uri, auth=(user, pw))
             episodes = []
             dur_start = f'PT{hours_back}H'
             dur_end = 'PT0H'
 
-            async with driver.session() as s:
+            async with async_session() as s:
                 r = await s.run(
                     """
                     MATCH (e:Episodic)
                     WHERE e.group_id = $gid
                       AND e.created_at >= datetime() - duration($dur_start)
                       AND e.created_at <= datetime() - duration($dur_end)
-                    RETURN e.content  AS content,
-                           e.valid_at AS ts
+                    RETURN e.posture_label AS posture_label,
+                           e.area_label    AS area_label,
+                           e.hr            AS hr,
+                           e.spo2          AS spo2,
+                           e.steps         AS steps,
+                           CASE WHEN e.posture_label IS NULL THEN e.content END AS content,
+                           e.valid_at      AS ts
                     ORDER BY e.created_at ASC
                     """,
                     gid=self.group_id,
@@ -757,49 +1317,25 @@ class PatientMemory:
                     dur_end=dur_end,
                 )
                 async for rec in r:
-                    content = (rec["content"] or "").strip()
                     ts_raw  = str(rec["ts"] or "")
-                    if content and ts_raw:
+                    if ts_raw and (rec["posture_label"] is not None or rec["content"]):
                         # Parse timestamp
                         try:
                             ts_str = ts_raw.split("+")[0].split("000")[0].rstrip(".")
                             ts = datetime.fromisoformat(ts_str)
                         except Exception:
                             ts = datetime.now()
-                            
-                        # Extract metrics
-                        posture = "Unknown"
-                        area = "Unknown"
-                        steps_n = 0
-                        hr = 0
-                        spo2 = 0
-                        
-                        for line in content.split("."):
-                            l = line.strip()
-                            if "Activity/Posture:" in l:
-                                posture = l.split("Activity/Posture:")[-1].strip()
-                            elif "Location:" in l:
-                                area = l.split("Location:")[-1].strip()
-                            elif "Step count:" in l:
-                                try: steps_n = int(l.split("Step count:")[-1].strip().split()[0])
-                                except: pass
-                            elif "Heart Rate:" in l:
-                                try: hr = int(l.split("Heart Rate:")[-1].strip().split()[0])
-                                except: pass
-                            elif "Blood O2:" in l:
-                                try: spo2 = int(l.split("Blood O2:")[-1].strip().replace('%', '').split()[0])
-                                except: pass
-                                
+
+                        f = _episode_fields(rec)
                         episodes.append({
                             'timestamp': ts.isoformat(),
-                            'HR': hr,
-                            'Blood_oxygen': spo2,
-                            'Posture_state': posture,
-                            'Area': area,
-                            'Step': steps_n
+                            'HR': f.get("hr") or 0,
+                            'Blood_oxygen': f.get("spo2") or 0,
+                            'Posture_state': f.get("posture_label") or "Unknown",
+                            'Area': f.get("area_label") or "Unknown",
+                            'Step': f.get("steps") or 0
                         })
 
-            await driver.close()
             return episodes
         except Exception as e:
             print(f"[Memory Raw History] Neo4j fetch failed: {e}")
@@ -817,7 +1353,8 @@ class PatientMemory:
     ) -> str:
         """
         Query Neo4j for episodes near a specific time of day.
-        Uses Neo4j DateTime .hour / .minute / .day attributes (not string compare).
+        Uses the indexed minute_of_day / local_date properties (see
+        backfill_episode_properties.py for episodes written before they existed).
 
         Args:
             center_hour    : Hour to look up (0-23), e.g. 8 for 8AM
@@ -827,58 +1364,41 @@ class PatientMemory:
             limit          : Max records to return
         """
         try:
-            import os
-            from neo4j import AsyncGraphDatabase
             from datetime import timedelta
 
-            uri  = os.getenv("NEO4J_URI",      "bolt://localhost:7687")
-            user = os.getenv("NEO4J_USER",     "neo4j")
-            pw   = os.getenv("NEO4J_PASSWORD", "password")
-
-            # Compute start/end as (hour, minute) pairs, handling midnight wrap
-            center_total = center_hour * 60 + center_minute
-            start_total  = center_total - window_minutes
-            end_total    = center_total + window_minutes
-
-            start_h, start_m = divmod(max(start_total, 0), 60)
-            end_h,   end_m   = divmod(min(end_total, 23 * 60 + 59), 60)
-
-            # Optionally scope to a specific date
-            date_filter = ""
-            date_params: dict = {}
-            if date_str:
-                try:
-                    from datetime import date as _date
-                    d = datetime.strptime(date_str, "%Y-%m-%d").date()
-                    date_filter = "AND e.valid_at.year = $yr AND e.valid_at.month = $mo AND e.valid_at.day = $dy"
-                    date_params = {"yr": d.year, "mo": d.month, "dy": d.day}
-                except Exception:
-                    pass
-
-            # Convert start/end minutes-of-day to comparable integer  
-            # (hour*60 + minute) for easy range filter in Cypher
+            # minute_of_day ranges (split at midnight), optionally scoped to a date
+            try:
+                if date_str:
+                    datetime.strptime(date_str, "%Y-%m-%d")
+            except ValueError:
+                date_str = None
+            ranges = _minute_ranges(center_hour * 60 + center_minute, window_minutes, date_str)
+
+            # One index seek per range on (group_id, [local_date,] minute_of_day)
+            params = {"gid": self.group_id, "lim": limit}
+            branches = []
+            for i, (day, lo, hi) in enumerate(ranges):
+                params[f"lo{i}"], params[f"hi{i}"] = lo, hi
+                day_filter = ""
+                if day:
+                    params[f"d{i}"] = day
+                    day_filter = f"AND e.local_date = $d{i}"
+                branches.append(
+                    f"MATCH (e:Episodic) WHERE e.group_id = $gid {day_filter} "
+                    f"AND e.minute_of_day >= $lo{i} AND e.minute_of_day <= $hi{i} RETURN e"
+                )
             cypher = f"""
-                MATCH (e:Episodic)
-                WHERE e.group_id = $gid
-                  AND (e.valid_at.hour * 60 + e.valid_at.minute) >= $start_mins
-                  AND (e.valid_at.hour * 60 + e.valid_at.minute) <= $end_mins
-                  {date_filter}
+                CALL {{
+                    {" UNION ".join(branches)}
+                }}
                 RETURN toString(e.valid_at) AS ts_str,
                        e.content            AS content
                 ORDER BY e.valid_at ASC
                 LIMIT $lim
             """
-            params = {
-                "gid":        self.group_id,
-                "start_mins": start_h * 60 + start_m,
-                "end_mins":   end_h   * 60 + end_m,
-                "lim":        limit,
-                **date_params,
-            }
-
-            driver = AsyncGraphDatabase.driver(uri, auth=(user, pw))
+
             episodes = []
-            async with driver.session() as s:
+            async with async_session() as s:
                 r = await s.run(cypher, **params)
                 async for rec in r:
                     content  = (rec["content"] or "").strip()
@@ -886,8 +1406,6 @@ class PatientMemory:
                     if content:
                         episodes.append(f"[{ts_label}] {content}")
 
-            await driver.close()
-
             if not episodes:
                 msg = f"[Memory TimeRange] No episodes found at {center_hour:02d}:{center_minute:02d} (±{window_minutes}min) for {self.device_id}"
                 print(msg)
@@ -908,6 +1426,7 @@ class PatientMemory:
 
 
 
+    @_per_patient
     async def store_alert(self, alert_data: dict) -> None:
 
         """
@@ -929,22 +1448,47 @@ class PatientMemory:
         )
         await self.add_episode(episode_text, episode_type="alert")
 
-    async def store_sensor_snapshot(
+    async def _ensure_encoding_preamble(self) -> None:
+        """Send the compact-encoding legend as a baseline episode, once per patient."""
+        if getattr(self, "_preamble_sent", False):
+            return
+        self._preamble_sent = True
+        try:
+            async with async_session() as s:
+                r = await s.run(
+                    "MATCH (e:Episodic) WHERE e.group_id = $gid AND e.encoding = $tag "
+                    "RETURN count(e) > 0 AS found",
+                    gid=self.group_id, tag=_PREAMBLE_TAG,
+                )
+                rec = await r.single()
+            if rec and rec["found"]:
+                return
+        except Exception as e:
+            print(f"[Memory] [WARN] preamble lookup failed ({e}) — sending it anyway")
+        # The ingestion queue dedups identical content, so a re-send after a
+        # restart (preamble still queued) does not duplicate it
+        await self.add_episode(
+            _encoding_preamble(self.device_id),
+            episode_type="baseline",
+            properties={"encoding": _PREAMBLE_TAG},
+        )
+        print(f"[Memory] [OK] Compact encoding preamble queued for {self.device_id}")
+
+    def _render_snapshot(
         self,
         data: dict,
         posture_map: Optional[dict] = None,
         area_map: Optional[dict] = None,
-    ) -> None:
+        encoding: Optional[str] = None,
+    ) -> dict:
         """
-        Convert a raw sensor reading dict into a human-readable episode.
+        Decode a raw sensor reading and render its episode text (EPISODE_ENCODING,
+        or `encoding` to force "verbose" / "compact"). No I/O — also used by
+        evaluation/episode_encoding_ab.py.
 
-        Called every N readings (not every single reading — too noisy).
-        Only stores if the reading is notable (abnormal vitals or notable posture).
-
-        Args:
-            data        : Raw sensor dict with HR, Blood_oxygen, Posture_state, Area keys
-            posture_map : Optional override for posture code→text mapping
-            area_map    : Optional override for area code→text mapping
+        Returns:
+            {hr, spo2, steps, burned, posture_val, posture_txt, area_txt, now,
+             timestamp_short, episode_type, severity_label, episode_text}
         """
         posture_map = posture_map or _POSTURE_MAP
         area_map = area_map or _AREA_MAP
@@ -1028,6 +1572,19 @@ class PatientMemory:
             episode_type = "routine_observation"
             severity_label = "Normal — all vitals within safe parameters"
 
+        snap = {
+            "hr": hr, "spo2": spo2, "steps": steps, "burned": burned,
+            "posture_val": posture_val, "posture_txt": posture_txt, "area_txt": area_txt,
+            "now": now, "timestamp_short": timestamp_short,
+            "episode_type": episode_type, "severity_label": severity_label,
+        }
+        if (encoding or EPISODE_ENCODING) == "compact":
+            snap["episode_text"] = _compact_episode_text(
+                self.device_id, severity_label, now, area_txt, posture_txt,
+                hr, spo2, steps, calories, burned,
+            )
+            return snap
+
         # HR clinical interpretation
         if hr > 110:
             hr_note = f"{hr} bpm (elevated, above normal range of 60-100 bpm)"
@@ -1136,39 +1693,121 @@ class PatientMemory:
                 f"with stable vitals. HR {hr} bpm and SpO2 {spo2}% within normal range."
             )
 
+        snap["episode_text"] = episode_text
+        return snap
 
-        # ══════════════════════════════════════════════════════════════════
-        # LAYER 1: DIRECT NEO4J WRITE — Instant (< 1 second), no LLM
-        # ══════════════════════════════════════════════════════════════════
+    async def _write_layer1(self, structured: dict, burned: int, now: datetime, episode_type: str,
+                            severity_label: str, incident: Optional[dict] = None) -> None:
+        """Layer-1 of store_sensor_snapshot: VitalReading / AlertEvent / Incident rows + hourly rollup."""
         try:
-            from memory.direct_neo4j_writer import write_vital_reading, write_alert_event
+            from memory.direct_neo4j_writer import awrite_vital_reading, awrite_alert_event
             from datetime import timezone
-            write_vital_reading(
+            await awrite_vital_reading(
                 device_id = self.device_id,
                 data = {
-                    "hr":           hr,
-                    "spo2":         spo2,
-                    "steps":        steps,
-                    "posture":      posture_val,
-                    "posture_label": posture_txt,
-                    "area_label":   area_txt,
+                    **structured,
                     "kcal":         burned,
-                    "condition":    episode_type,
-                    "timestamp_local": timestamp_short,
                     "timestamp_utc": now.astimezone(timezone.utc).isoformat(),
                 }
             )
-            # Also log alert events as dedicated graph nodes
-            if episode_type not in ("routine_observation",):
-                write_alert_event(
+            # Also log alert events as dedicated graph nodes — for an incident
+            # only when it opens or escalates, not on every reading of it
+            _alert_due = incident is None or incident["action"] in ("open", "escalate")
+            if episode_type not in ("routine_observation",) and _alert_due:
+                await awrite_alert_event(
                     device_id  = self.device_id,
                     alert_type = episode_type,
                     severity   = "critical" if "critical" in episode_type else "warning",
                     message    = severity_label,
+                    incident_id = incident["incident"]["uuid"] if incident else None,
                 )
+            if incident is not None:
+                await self._write_incident(incident["incident"])
         except Exception as _dw_err:
             print(f"[DirectNeo4j] Layer-1 write error: {_dw_err}")
 
+        # Hourly activity rollup (open hour in memory, closed hours → Neo4j)
+        try:
+            from memory.activity_rollup import ROLLUPS
+            await ROLLUPS.observe(self.device_id, now, structured)
+        except Exception as _ru_err:
+            print(f"[Rollup] observe error: {_ru_err}")
+
+    async def _write_incident(self, incident_row: dict) -> None:
+        try:
+            from memory.direct_neo4j_writer import awrite_incident
+            await awrite_incident(self.device_id, incident_row)
+        except Exception as e:
+            print(f"[DirectNeo4j] Incident write error: {e}")
+
+    @_per_patient
+    async def close_stale_incident(self, decision: dict) -> None:
+        """
+        Incident closed by IncidentTracker.sweep(): the device stopped sending,
+        so there is no closing reading — Incident row and Graphiti close
+        summary only, no VitalReading.
+        """
+        await self._write_incident(decision["incident"])
+        READ_CACHE.bump(self.device_id)
+        if decision["llm"]:
+            await self.add_episode(f"{decision['summary']} The device stopped sending readings.",
+                                   episode_type="incident_closed")
+
+    @_per_patient
+    async def store_sensor_snapshot(
+        self,
+        data: dict,
+        posture_map: Optional[dict] = None,
+        area_map: Optional[dict] = None,
+        incident: Optional[dict] = None,
+    ) -> None:
+        """
+        Convert a raw sensor reading dict into a human-readable episode.
+
+        Called every N readings (not every single reading — too noisy).
+        Only stores if the reading is notable (abnormal vitals or notable posture).
+
+        Args:
+            data        : Raw sensor dict with HR, Blood_oxygen, Posture_state, Area keys
+            posture_map : Optional override for posture code→text mapping
+            area_map    : Optional override for area code→text mapping
+            incident    : IncidentTracker decision (memory/incidents.py) when the
+                          reading belongs to a critical incident — the incident
+                          decides whether an AlertEvent / Graphiti episode is written
+        """
+        snap = self._render_snapshot(data, posture_map, area_map)
+        hr, spo2, steps, burned = snap["hr"], snap["spo2"], snap["steps"], snap["burned"]
+        posture_val, posture_txt, area_txt = snap["posture_val"], snap["posture_txt"], snap["area_txt"]
+        now, timestamp_short = snap["now"], snap["timestamp_short"]
+        episode_type, severity_label = snap["episode_type"], snap["severity_label"]
+        episode_text = snap["episode_text"]
+        if EPISODE_ENCODING == "compact":
+            await self._ensure_encoding_preamble()
+
+
+        # ══════════════════════════════════════════════════════════════════
+        # LAYER 1: DIRECT NEO4J WRITE — Instant (< 1 second), no LLM
+        #   Async API: never blocks the shared loop (buffered / executor)
+        # ══════════════════════════════════════════════════════════════════
+        # Typed columns shared by the VitalReading node and the Episodic node
+        structured = {
+            "encoding":     EPISODE_ENCODING,
+            "hr":           hr,
+            "spo2":         spo2,
+            "steps":        steps,
+            "posture":      posture_val,
+            "posture_label": posture_txt,
+            "area_label":   area_txt,
+            "condition":    episode_type,
+            "timestamp_local": timestamp_short,
+            **_time_of_day_props(now, self.device_id),
+        }
+        await self._write_layer1(structured, burned, now, episode_type, severity_label, incident)
+
+        # Layer-1 rows may still sit in the writer buffer — the flush listener
+        # bumps again once they are committed
+        READ_CACHE.bump(self.device_id)
+
         # ══════════════════════════════════════════════════════════════════
         # LAYER 2: GRAPHITI LLM EPISODE — Rich entity extraction (async)
         #   • Critical/alert events  → ALWAYS sent to Graphiti (important memory)
@@ -1190,12 +1829,23 @@ class PatientMemory:
             (_now_ts - _last_routine).total_seconds() >= 3600  # 1 jam
         )
 
-        if _should_send_graphiti:
+        if incident is not None:
+            # Incident readings: Graphiti only on open / escalate / close, within
+            # the per-incident LLM budget — never the routine throttle
+            if incident["llm"]:
+                setattr(self, _last_posture_attr, posture_txt)
+                _ep_type = "incident_closed" if incident["action"] == "close" else episode_type
+                await self.add_episode(f"{episode_text} {incident['summary']}",
+                                       episode_type=_ep_type, properties=structured)
+            else:
+                print(f"[Memory] ⏩ Incident {incident['action']} — no Graphiti episode "
+                      f"({incident['incident']['llm_calls']} LLM calls used)")
+        elif _should_send_graphiti:
             # Update posture landmark anchor
             setattr(self, _last_posture_attr, posture_txt)
             if not _is_critical and not _is_posture_changed:
                 setattr(self, _last_routine_attr, _now_ts)
-            await self.add_episode(episode_text, episode_type=episode_type)
+            await self.add_episode(episode_text, episode_type=episode_type, properties=structured)
         else:
             _mins_ago = int((_now_ts - _last_routine).total_seconds() // 60)
             print(f"[Memory] ⏩ Routine episode throttled — Graphiti updated {_mins_ago}m ago, next in {60 - _mins_ago}m")
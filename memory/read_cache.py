@@ -0,0 +1,173 @@
+"""
+Patient Memory Read Cache for UTLMediCore
+=========================================
+Read-through cache for the expensive PatientMemory reads that are repeated on
+every chat turn, report and panel refresh (activity stats, manual context,
+raw history, Tier-2 context).
+
+- versioned  : every patient has a version number, bumped whenever THIS
+               process writes for that patient (snapshot, alert, episode,
+               manual context add/delete, and every direct-writer flush).
+               An entry is only served while its version is current, and the
+               version is taken BEFORE loading — so a value can never be older
+               than the patient's last local write.
+- TTL        : READ_CACHE_TTL_SEC bounds staleness from other writers
+               (another process, scripts, Neo4j Browser)
+- LRU        : at most READ_CACHE_MAX entries across all patients
+- stats      : hits / misses / invalidated / expired / evictions per method
+
+Usage:
+    class PatientMemory:
+        @cached_read("activity_stats")
+        async def get_activity_stats(self, hours_back=24): ...
+
+    READ_CACHE.bump(device_id)      # after a write
+"""
+
+import copy
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+
+READ_CACHE     = None
+READ_CACHE_ON  = os.getenv("READ_CACHE", "true").lower() == "true"
+READ_CACHE_TTL = float(os.getenv("READ_CACHE_TTL_SEC", "30"))
+READ_CACHE_MAX = int(os.getenv("READ_CACHE_MAX", "512"))
+
+
+class PatientReadCache:
+    """Thread-safe LRU of (device_id, method, args) -> (version, stored_at, value)."""
+
+    def __init__(self, max_entries: int = READ_CACHE_MAX, ttl: float = READ_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._stats = {}
+
+    def _count(self, method: str, what: str) -> None:
+        m = self._stats.setdefault(method, {"hits": 0, "misses": 0, "invalidated": 0, "expired": 0})
+        m[what] += 1
+
+    def version(self, device_id: str) -> int:
+        with self._lock:
+            return self._versions.get(device_id, 0)
+
+    def bump(self, device_id: str) -> None:
+        """A local write for this patient happened — every cached read is now stale."""
+        with self._lock:
+            self._versions[device_id] = self._versions.get(device_id, 0) + 1
+
+    def lookup(self, key: tuple):
+        """(hit, value, version) — version is the one a fresh load must be stored under."""
+        device_id, method = key[0], key[1]
+        now = time.time()
+        with self._lock:
+            current = self._versions.get(device_id, 0)
+            entry = self._entries.get(key)
+            if entry is not None:
+                version, stored_at, value = entry
+                if version != current:
+                    del self._entries[key]
+                    self._count(method, "invalidated")
+                elif now - stored_at > self.ttl:
+                    del self._entries[key]
+                    self._count(method, "expired")
+                else:
+                    self._entries.move_to_end(key)
+                    self._count(method, "hits")
+                    return True, copy.deepcopy(value), current
+            self._count(method, "misses")
+            return False, None, current
+
+    def store(self, key: tuple, version: int, value) -> None:
+        with self._lock:
+            if self._versions.get(key[0], 0) != version:
+                return          # a write landed while loading — don't cache
+            self._entries[key] = (version, time.time(), copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats.setdefault("_lru", {"evictions": 0})["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            per_method = {k: dict(v) for k, v in self._stats.items() if k != "_lru"}
+            hits = sum(v["hits"] for v in per_method.values())
+            total = hits + sum(v["misses"] for v in per_method.values())
+            return {
+                "enabled":   READ_CACHE_ON,
+                "entries":   len(self._entries),
+                "max":       self.max_entries,
+                "ttl_sec":   self.ttl,
+                "hit_rate":  round(hits / total, 3) if total else None,
+                "evictions": self._stats.get("_lru", {}).get("evictions", 0),
+                "methods":   per_method,
+                "patients":  len(self._versions),
+            }
+
+
+READ_CACHE = PatientReadCache()
+
+
+def cached_read(name: str):
+    """
+    Decorate a PatientMemory read (sync or async). Keyed on device_id + name +
+    arguments (a `session` kwarg is ignored). Empty results ("" / [] / {}) are
+    not cached — they are also what the methods return on errors.
+    """
+    def decorator(fn):
+        def _key(self, args, kwargs):
+            kw = tuple(sorted((k, v) for k, v in kwargs.items() if k != "session"))
+            return (self.device_id, name, args, kw)
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(self, *args, **kwargs):
+                if not READ_CACHE_ON:
+                    return await fn(self, *args, **kwargs)
+                key = _key(self, args, kwargs)
+                hit, value, version = READ_CACHE.lookup(key)
+                if hit:
+                    return value
+                value = await fn(self, *args, **kwargs)
+                if value:
+                    READ_CACHE.store(key, version, value)
+                return value
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def sync_wrapper(self, *args, **kwargs):
+            if not READ_CACHE_ON:
+                return fn(self, *args, **kwargs)
+            key = _key(self, args, kwargs)
+            hit, value, version = READ_CACHE.lookup(key)
+            if hit:
+                return value
+            value = fn(self, *args, **kwargs)
+            if value:
+                READ_CACHE.store(key, version, value)
+            return value
+        return sync_wrapper
+
+    return decorator
+
+
+def _on_flush(touched: dict) -> None:
+    """Direct-writer flush committed rows — readers must see them now."""
+    for device_ids in touched.values():
+        for device_id in device_ids:
+            READ_CACHE.bump(device_id)
+
+
+def register_flush_listener() -> None:
+    from memory.direct_neo4j_writer import add_flush_listener
+    add_flush_listener(_on_flush)
@@ -0,0 +1,432 @@
+"""
+Retention & Downsampling for UTLMediCore
+========================================
+Every critical reading, transition and heartbeat writes a VitalReading node
+(and often an Episodic node). Nothing aged out, so the graph — and every
+query over it — grew without bound. This job collapses old data in tiers:
+
+    raw VitalReading      kept RETENTION_RAW_DAYS (7)
+        └─► (:VitalSummary {resolution: "15m"})   kept RETENTION_15M_DAYS (90)
+                └─► (:VitalSummary {resolution: "1d"})   kept forever
+
+    (:VitalSummary {device_id, resolution, bucket: "YYYY-MM-DDTHH:MM", local_date,
+                    n, first_ts, last_ts,
+                    hr_n, hr_sum, hr_min, hr_max, spo2_n, spo2_sum, spo2_min, spo2_max,
+                    steps_max, kcal_max,
+                    posture_json, area_json, condition_json})   # readings per label
+    (Patient)-[:HAD_SUMMARY]->(VitalSummary)
+
+Routine sensor Episodic nodes (condition 'routine_observation') older than
+RETENTION_EPISODIC_DAYS are deleted; alert/critical/transition episodes stay.
+AlertEvent, ManualContext, PostureChange and ActivityRollup nodes are never
+touched — every non-routine reading also has its own AlertEvent.
+
+- incremental : one transaction per patient per local day (summaries written
+                and the day's source nodes deleted together), at most
+                RETENTION_DAYS_PER_RUN days per tier per pass — re-running
+                resumes where the last pass stopped
+- additive    : summaries keep sums/counts, so readings that show up late
+                (e.g. a Mongo backfill) merge into an existing bucket
+- dry-run     : same reads and aggregation, no writes — prints what would be
+                compacted
+
+Days follow the server's local clock, like ActivityRollup hours.
+
+Raw readings are selected on (device_id, valid_at). Legacy VitalReading nodes
+written without them get both from neo4j_schema.migrate_layer1_keys — the app
+starts this job after that migration and the CLI runs it first.
+
+CLI:
+    python -m memory.retention --dry-run
+    python -m memory.retention --device DCA632971FC3 --max-days 30
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from memory.neo4j_pool import sync_session
+
+RETENTION               = os.getenv("RETENTION", "false").lower() == "true"   # background job
+RETENTION_RAW_DAYS      = int(os.getenv("RETENTION_RAW_DAYS", "7"))
+RETENTION_15M_DAYS      = int(os.getenv("RETENTION_15M_DAYS", "90"))
+RETENTION_EPISODIC_DAYS = int(os.getenv("RETENTION_EPISODIC_DAYS", "90"))     # 0 = keep routine episodes
+RETENTION_INTERVAL_SEC  = int(os.getenv("RETENTION_INTERVAL_SEC", "3600"))
+RETENTION_DAYS_PER_RUN  = int(os.getenv("RETENTION_DAYS_PER_RUN", "7"))
+
+BUCKET_MIN = 15
+EPISODE_BATCH = 500
+
+_FIELDS = ("n", "first_ts", "last_ts",
+           "hr_n", "hr_sum", "hr_min", "hr_max",
+           "spo2_n", "spo2_sum", "spo2_min", "spo2_max",
+           "steps_max", "kcal_max")
+_COUNTS = ("posture", "area", "condition")
+
+
+def _local(ts) -> datetime:
+    """Naive local datetime (Neo4j valid_at is UTC)."""
+    if hasattr(ts, "to_native"):
+        ts = ts.to_native()
+    if ts.tzinfo is not None:
+        ts = ts.astimezone().replace(tzinfo=None)
+    return ts
+
+
+def _iso(ts: datetime) -> str:
+    """Naive local → aware ISO, for datetime() comparisons in Cypher."""
+    return ts.astimezone().isoformat()
+
+
+def _bucket_key(ts: datetime) -> str:
+    return ts.replace(minute=ts.minute - ts.minute % BUCKET_MIN, second=0, microsecond=0).strftime("%Y-%m-%dT%H:%M")
+
+
+def _empty(bucket: str) -> dict:
+    b = {k: None if k.endswith(("_min", "_max", "_ts")) else 0 for k in _FIELDS}
+    b.update({"bucket": bucket, "steps_max": 0, "kcal_max": 0})
+    for c in _COUNTS:
+        b[c] = {}
+    return b
+
+
+def _lo(a, b):
+    return b if a is None else a if b is None else min(a, b)
+
+
+def _hi(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+
+def fold_reading(b: dict, rec: dict) -> None:
+    """Add one raw VitalReading (hr/spo2 of 0 mean 'no reading' and are skipped)."""
+    ts = _local(rec["ts"]).isoformat()
+    b["n"] += 1
+    b["first_ts"] = _lo(b["first_ts"], ts)
+    b["last_ts"] = _hi(b["last_ts"], ts)
+    for key in ("hr", "spo2"):
+        val = int(rec.get(key) or 0)
+        if val:
+            b[f"{key}_n"] += 1
+            b[f"{key}_sum"] += val
+            b[f"{key}_min"] = _lo(b[f"{key}_min"], val)
+            b[f"{key}_max"] = _hi(b[f"{key}_max"], val)
+    b["steps_max"] = max(b["steps_max"], int(rec.get("steps") or 0))
+    b["kcal_max"] = max(b["kcal_max"], int(rec.get("kcal") or 0))
+    for c, field in (("posture", "posture_label"), ("area", "area_label"), ("condition", "condition")):
+        label = rec.get(field) or "Unknown"
+        b[c][label] = b[c].get(label, 0) + 1
+
+
+def combine(b: dict, other: dict) -> None:
+    """Fold summary `other` into summary `b` (sums add, extremes widen)."""
+    for k in _FIELDS:
+        if k.endswith(("_min", "first_ts")):
+            b[k] = _lo(b[k], other.get(k))
+        elif k.endswith(("_max", "last_ts")):
+            b[k] = _hi(b[k], other.get(k))
+        else:
+            b[k] += other.get(k) or 0
+    for c in _COUNTS:
+        for label, n in other[c].items():
+            b[c][label] = b[c].get(label, 0) + n
+
+
+def _to_row(device_id: str, resolution: str, b: dict) -> dict:
+    row = {k: b[k] for k in _FIELDS}
+    row.update({
+        "device_id":  device_id,
+        "resolution": resolution,
+        "bucket":     b["bucket"],
+        "local_date": b["bucket"][:10],
+        "updated_at": datetime.now().isoformat(),
+    })
+    for c in _COUNTS:
+        row[f"{c}_json"] = json.dumps(b[c])
+    return row
+
+
+def _from_row(row: dict) -> dict:
+    b = _empty(row["bucket"])
+    b.update({k: row.get(k) for k in _FIELDS})
+    for c in _COUNTS:
+        b[c] = json.loads(row.get(f"{c}_json") or "{}")
+    return b
+
+
+_UPSERT = """
+MERGE (p:Patient {device_id: $dev_id})
+WITH p
+UNWIND $rows AS row
+MERGE (s:VitalSummary {device_id: row.device_id, resolution: row.resolution, bucket: row.bucket})
+SET s += row
+MERGE (p)-[:HAD_SUMMARY]->(s)
+"""
+
+_SUMMARIES = """
+MATCH (s:VitalSummary)
+WHERE s.device_id = $dev_id AND s.resolution = $res
+  AND s.bucket >= $start AND s.bucket < $end
+RETURN s {.*} AS s
+"""
+
+
+def _day_bounds(day: datetime) -> tuple:
+    return day, day + timedelta(days=1)
+
+
+def _downsample_raw(tx, device_id: str, day: datetime, dry_run: bool) -> tuple:
+    """One local day of raw readings → 15-minute summaries. Returns (sources, buckets)."""
+    start, end = _day_bounds(day)
+    buckets = {}
+    for rec in tx.run(
+        """
+        MATCH (v:VitalReading)
+        WHERE v.device_id = $dev_id AND v.valid_at >= datetime($since) AND v.valid_at < datetime($until)
+        RETURN v.valid_at AS ts, v.hr AS hr, v.spo2 AS spo2, v.steps AS steps, v.kcal AS kcal,
+               v.posture_label AS posture_label, v.area_label AS area_label, v.condition AS condition
+        """,
+        dev_id=device_id, since=_iso(start), until=_iso(end),
+    ):
+        rec = dict(rec)
+        key = _bucket_key(_local(rec["ts"]))
+        fold_reading(buckets.setdefault(key, _empty(key)), rec)
+
+    sources = sum(b["n"] for b in buckets.values())
+    if not buckets or dry_run:
+        return sources, len(buckets)
+
+    # Late readings for a day that was already compacted merge into its buckets
+    for rec in tx.run(_SUMMARIES, dev_id=device_id, res="15m",
+                      start=start.strftime("%Y-%m-%dT%H:%M"), end=end.strftime("%Y-%m-%dT%H:%M")):
+        existing = _from_row(rec["s"])
+        if existing["bucket"] in buckets:
+            combine(buckets[existing["bucket"]], existing)
+
+    tx.run(_UPSERT, dev_id=device_id,
+           rows=[_to_row(device_id, "15m", b) for b in buckets.values()]).consume()
+    tx.run(
+        """
+        MATCH (v:VitalReading)
+        WHERE v.device_id = $dev_id AND v.valid_at >= datetime($since) AND v.valid_at < datetime($until)
+        DETACH DELETE v
+        """,
+        dev_id=device_id, since=_iso(start), until=_iso(end),
+    ).consume()
+    return sources, len(buckets)
+
+
+def _downsample_15m(tx, device_id: str, day: datetime, dry_run: bool) -> tuple:
+    """One local day of 15-minute summaries → one daily summary. Returns (sources, 1|0)."""
+    start, end = _day_bounds(day)
+    key = start.strftime("%Y-%m-%dT00:00")
+    daily, sources = _empty(key), 0
+    for rec in tx.run(_SUMMARIES, dev_id=device_id, res="15m",
+                      start=key, end=end.strftime("%Y-%m-%dT00:00")):
+        combine(daily, _from_row(rec["s"]))
+        sources += 1
+    if not sources or dry_run:
+        return sources, 1 if sources else 0
+
+    for rec in tx.run(_SUMMARIES, dev_id=device_id, res="1d", start=key, end=key + "~"):
+        combine(daily, _from_row(rec["s"]))
+    tx.run(_UPSERT, dev_id=device_id, rows=[_to_row(device_id, "1d", daily)]).consume()
+    tx.run(
+        """
+        MATCH (s:VitalSummary)
+        WHERE s.device_id = $dev_id AND s.resolution = '15m' AND s.bucket >= $start AND s.bucket < $end
+        DETACH DELETE s
+        """,
+        dev_id=device_id, start=key, end=end.strftime("%Y-%m-%dT00:00"),
+    ).consume()
+    return sources, 1
+
+
+class RetentionEngine:
+    """Runs the tiers patient by patient, day by day, oldest first."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"runs": 0, "readings_collapsed": 0, "summaries_collapsed": 0,
+                       "episodes_deleted": 0, "last_run": None, "last_error": None}
+
+    @staticmethod
+    def _cutoff(days: int) -> datetime:
+        """Local midnight `days` days ago — only whole days are compacted."""
+        return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days)
+
+    @staticmethod
+    def _pending_days(session, first_cypher: str, device_id: str, cutoff: datetime, max_days: int) -> list:
+        rec = session.run(first_cypher, dev_id=device_id, cutoff=_iso(cutoff),
+                          cutoff_key=cutoff.strftime("%Y-%m-%dT%H:%M")).single()
+        first = rec["first"] if rec else None
+        if first is None:
+            return []
+        if isinstance(first, str):
+            first = datetime.strptime(first[:10], "%Y-%m-%d")
+        day = _local(first).replace(hour=0, minute=0, second=0, microsecond=0)
+        days = []
+        while day < cutoff and len(days) < max_days:
+            days.append(day)
+            day += timedelta(days=1)
+        return days
+
+    def _tier(self, session, device_id, first_cypher, work, cutoff, max_days, dry_run) -> dict:
+        out = {"days": 0, "sources": 0, "summaries": 0}
+        for day in self._pending_days(session, first_cypher, device_id, cutoff, max_days):
+            if dry_run:
+                sources, summaries = session.execute_read(work, device_id, day, True)
+            else:
+                sources, summaries = session.execute_write(work, device_id, day, False)
+            if sources:
+                out["days"] += 1
+                out["sources"] += sources
+                out["summaries"] += summaries
+        return out
+
+    def _prune_episodes(self, session, device_id: str, cutoff: datetime, limit: int, dry_run: bool) -> int:
+        match = """
+            MATCH (e:Episodic)
+            WHERE e.group_id = $gid AND e.created_at < datetime($cutoff)
+              AND e.condition = 'routine_observation'
+        """
+        params = {"gid": f"patient_{device_id}", "cutoff": _iso(cutoff)}
+        if dry_run:
+            return session.run(match + "RETURN count(e) AS n", **params).single()["n"]
+        deleted = 0
+        while deleted < limit:
+            n = session.run(
+                match + "WITH e LIMIT $batch DETACH DELETE e RETURN count(*) AS n",
+                batch=min(EPISODE_BATCH, limit - deleted), **params,
+            ).single()["n"]
+            deleted += n
+            if n == 0:
+                break
+        return deleted
+
+    def run(self, device_id: str = None, dry_run: bool = False,
+            max_days: int = RETENTION_DAYS_PER_RUN) -> dict:
+        """One pass over every patient (or `device_id`). Returns the per-patient report."""
+        report = {}
+        with sync_session() as s:
+            devices = [device_id] if device_id else [
+                r["d"] for r in s.run("MATCH (p:Patient) WHERE p.device_id IS NOT NULL RETURN p.device_id AS d")
+            ]
+            for dev in devices:
+                try:
+                    raw = self._tier(
+                        s, dev,
+                        """
+                        MATCH (v:VitalReading)
+                        WHERE v.device_id = $dev_id AND v.valid_at < datetime($cutoff)
+                        RETURN min(v.valid_at) AS first
+                        """,
+                        _downsample_raw, self._cutoff(RETENTION_RAW_DAYS), max_days, dry_run,
+                    )
+                    daily = self._tier(
+                        s, dev,
+                        """
+                        MATCH (s:VitalSummary)
+                        WHERE s.device_id = $dev_id AND s.resolution = '15m' AND s.bucket < $cutoff_key
+                        RETURN min(s.bucket) AS first
+                        """,
+                        _downsample_15m, self._cutoff(RETENTION_15M_DAYS), max_days, dry_run,
+                    )
+                    episodes = 0
+                    if RETENTION_EPISODIC_DAYS > 0:
+                        episodes = self._prune_episodes(
+                            s, dev, self._cutoff(RETENTION_EPISODIC_DAYS), max_days * 1440, dry_run
+                        )
+                except Exception as e:
+                    self._stats["last_error"] = f"{dev}: {e}"
+                    print(f"[Retention] ⚠️ {dev}: {e}")
+                    continue
+
+                report[dev] = {"raw_to_15m": raw, "15m_to_1d": daily, "routine_episodes": episodes}
+                if not dry_run and (raw["sources"] or daily["sources"] or episodes):
+                    from memory.read_cache import READ_CACHE
+                    READ_CACHE.bump(dev)
+                    with self._lock:
+                        self._stats["readings_collapsed"] += raw["sources"]
+                        self._stats["summaries_collapsed"] += daily["sources"]
+                        self._stats["episodes_deleted"] += episodes
+
+        if not dry_run:
+            with self._lock:
+                self._stats["runs"] += 1
+                self._stats["last_run"] = datetime.now().isoformat()
+        return report
+
+    def start(self, interval: int = RETENTION_INTERVAL_SEC):
+        """Background thread: one pass every `interval` s (RETENTION=true only)."""
+        if not RETENTION:
+            return None
+
+        def _loop():
+            while True:
+                try:
+                    report = self.run()
+                    moved = sum(r["raw_to_15m"]["sources"] for r in report.values())
+                    if moved:
+                        print(f"[Retention] ✅ {moved:,} raw readings collapsed into 15-min summaries")
+                except Exception as e:
+                    self._stats["last_error"] = str(e)
+                    print(f"[Retention] ⚠️ pass failed: {e}")
+                time.sleep(interval)
+
+        t = threading.Thread(target=_loop, daemon=True)
+        t.start()
+        return t
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": RETENTION,
+                "raw_days": RETENTION_RAW_DAYS,
+                "summary_15m_days": RETENTION_15M_DAYS,
+                "episodic_days": RETENTION_EPISODIC_DAYS,
+                **self._stats,
+            }
+
+
+RETENTION_ENGINE = RetentionEngine()
+
+
+def print_report(report: dict, dry_run: bool) -> None:
+    verb = "would collapse" if dry_run else "collapsed"
+    print(f"\n{'Device':16s} {'raw days':>8s} {'readings':>10s} {'→ 15m':>7s} "
+          f"{'15m days':>8s} {'15m rows':>9s} {'→ 1d':>5s} {'episodes':>9s}")
+    print("-" * 80)
+    for dev, r in report.items():
+        raw, daily = r["raw_to_15m"], r["15m_to_1d"]
+        print(f"{dev:16s} {raw['days']:8d} {raw['sources']:10,d} {raw['summaries']:7,d} "
+              f"{daily['days']:8d} {daily['sources']:9,d} {daily['summaries']:5d} {r['routine_episodes']:9,d}")
+    total = sum(r["raw_to_15m"]["sources"] for r in report.values())
+    print(f"\n{'🔍' if dry_run else '✅'} {verb} {total:,} raw readings "
+          f"(raw > {RETENTION_RAW_DAYS}d, 15m > {RETENTION_15M_DAYS}d, "
+          f"routine episodes > {RETENTION_EPISODIC_DAYS or '∞'}d)")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Downsample old VitalReading / summary nodes")
+    parser.add_argument("--device", default=None, help="Only this device_id (default: every patient)")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be compacted, write nothing")
+    parser.add_argument("--max-days", type=int, default=None,
+                        help=f"Days per tier per patient in this pass (default {RETENTION_DAYS_PER_RUN}, "
+                             f"unlimited with --dry-run)")
+    args = parser.parse_args()
+    max_days = args.max_days or (10 ** 6 if args.dry_run else RETENTION_DAYS_PER_RUN)
+
+    from memory.neo4j_pool import close_all
+    try:
+        from memory.neo4j_schema import migrate_layer1_keys
+        legacy = migrate_layer1_keys(device_id=args.device, dry_run=args.dry_run)
+        if legacy:
+            print(f"[Retention] {legacy:,} legacy readings/alerts "
+                  f"{'need' if args.dry_run else 'got'} device_id / valid_at")
+        print_report(RETENTION_ENGINE.run(args.device, args.dry_run, max_days), args.dry_run)
+    finally:
+        close_all()
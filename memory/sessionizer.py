@@ -0,0 +1,183 @@
+"""
+Posture / Area Sessionizer for UTLMediCore
+==========================================
+"Time spent in Laboratory" used to be reconstructed after the fact by pairing
+consecutive episodes (get_activity_stats): every interval credited to the
+earlier snapshot, gaps capped at 10 h, the lead-in interpolated from the
+episode before the window — and only as good as the heartbeats that fired.
+
+A Sessionizer (one per PatientState) run-length encodes the live stream
+instead, one track per dimension (posture, area):
+
+    same label             → extend the open segment
+    new label, held for    → close the open segment where the new label
+    `debounce` readings      started, open the new one (same debounce as the
+                             PatientState transition detector)
+    no reading for         → close the open segment at its last reading
+    SEGMENT_GAP_SEC          (device off / app down is not "in Bedroom")
+
+Closed segments are persisted through the direct writer; open ones are
+upserted every SEGMENT_CHECKPOINT_SEC so a restart loses at most that much:
+
+    (:Segment {uuid, device_id, kind: posture|area, label, status: open|closed,
+               start_utc, end_utc, duration_sec, readings, valid_at, end_at})
+    (Patient)-[:HAD_SEGMENT]->(Segment)
+
+Duration questions are then an interval-overlap sum over a handful of
+segments (overlap_minutes) — see PatientMemory.get_segment_durations.
+Set SESSIONIZER=false to keep the episode-pairing durations only.
+"""
+
+import os
+import uuid
+from datetime import datetime, timezone
+
+SESSIONIZER             = os.getenv("SESSIONIZER", "true").lower() == "true"
+SEGMENT_GAP_SEC         = int(os.getenv("SEGMENT_GAP_SEC", "300"))
+SEGMENT_CHECKPOINT_SEC  = int(os.getenv("SEGMENT_CHECKPOINT_SEC", "300"))
+
+KINDS = ("posture", "area")
+
+
+def _utc(ts: datetime) -> str:
+    return ts.astimezone(timezone.utc).isoformat()
+
+
+def _local(value) -> datetime:
+    """ISO string (as stored in start_utc / end_utc) or datetime → naive local."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+class Segment:
+    def __init__(self, device_id: str, kind: str, label: str, start: datetime):
+        self.uuid = str(uuid.uuid4())
+        self.device_id = device_id
+        self.kind = kind
+        self.label = label
+        self.start = self.end = start
+        self.readings = 0
+        self.closed = False
+        self.checkpointed = start
+
+    def row(self) -> dict:
+        return {
+            "uuid":         self.uuid,
+            "device_id":    self.device_id,
+            "kind":         self.kind,
+            "label":        self.label,
+            "status":       "closed" if self.closed else "open",
+            "start_utc":    _utc(self.start),
+            "end_utc":      _utc(self.end),
+            "duration_sec": int((self.end - self.start).total_seconds()),
+            "readings":     self.readings,
+        }
+
+
+class _Track:
+    """Run-length encoder of one dimension with debounce."""
+
+    def __init__(self, device_id: str, kind: str, debounce: int):
+        self.device_id = device_id
+        self.kind = kind
+        self.debounce = max(debounce, 1)
+        self.current = None
+        self._pending = None        # (label, first ts, count)
+
+    def _open(self, label: str, ts: datetime) -> None:
+        self.current = Segment(self.device_id, self.kind, label, ts)
+        self._pending = None
+
+    def _close(self, end: datetime) -> Segment:
+        seg = self.current
+        seg.end = max(end, seg.start)
+        seg.closed = True
+        self.current = None
+        return seg
+
+    def observe(self, label: str, ts: datetime) -> list:
+        """Feed one reading; returns the segments it closed."""
+        closed = []
+        if self.current and (ts - self.current.end).total_seconds() > SEGMENT_GAP_SEC:
+            closed.append(self._close(self.current.end))
+        if self.current is None:
+            self._open(label, ts)
+        elif label == self.current.label:
+            self._pending = None
+        else:
+            p_label, p_since, p_count = self._pending if self._pending and self._pending[0] == label \
+                else (label, ts, 0)
+            self._pending = (p_label, p_since, p_count + 1)
+            if p_count + 1 >= self.debounce:
+                # the change started at the first reading of the new label
+                self.current.readings -= p_count
+                closed.append(self._close(p_since))
+                self._open(label, p_since)
+                self.current.readings = p_count     # this reading is counted below
+        self.current.end = max(ts, self.current.end)
+        self.current.readings += 1
+        return closed
+
+
+class Sessionizer:
+    """
+    Posture + area segments of one patient.
+
+    observe() returns Segment rows to persist: every segment it closed, plus
+    the open ones whose checkpoint is due (same uuid — upserted in place).
+    """
+
+    def __init__(self, device_id: str, debounce: int = 5):
+        self.device_id = device_id
+        self.tracks = {kind: _Track(device_id, kind, debounce) for kind in KINDS}
+        self.closed = 0
+        SESSIONIZERS[device_id] = self
+
+    def observe(self, posture_label: str, area_label: str, ts: datetime = None) -> list:
+        ts = ts or datetime.now()
+        rows = []
+        for kind, label in zip(KINDS, (posture_label, area_label)):
+            track = self.tracks[kind]
+            for seg in track.observe(label, ts):
+                rows.append(seg.row())
+                self.closed += 1
+            seg = track.current
+            if (ts - seg.checkpointed).total_seconds() >= SEGMENT_CHECKPOINT_SEC:
+                seg.checkpointed = ts
+                rows.append(seg.row())
+        return rows
+
+    def open_rows(self) -> list:
+        """Rows of the open segments (not yet persisted in their current extent)."""
+        return [t.current.row() for t in self.tracks.values() if t.current is not None]
+
+    def status(self) -> dict:
+        return {
+            "open": {kind: {"label": t.current.label, "since": t.current.start.isoformat(timespec="seconds"),
+                            "readings": t.current.readings}
+                     for kind, t in self.tracks.items() if t.current is not None},
+            "closed": self.closed,
+        }
+
+
+# device_id → Sessionizer, so memory reads can include the open segments
+SESSIONIZERS = {}
+
+
+def overlap_minutes(rows: list, start: datetime, end: datetime) -> dict:
+    """
+    Interval-overlap sum: {"posture": {label: minutes}, "area": {...}} of the
+    Segment rows clipped to [start, end). Rows with the same uuid (a persisted
+    checkpoint and the live open segment) count once — the last one wins.
+    """
+    by_uuid = {r["uuid"]: r for r in rows}
+    totals = {kind: {} for kind in KINDS}
+    for r in by_uuid.values():
+        s, e = max(_local(r["start_utc"]), start), min(_local(r["end_utc"]), end)
+        if e > s and r["kind"] in totals:
+            mins = (e - s).total_seconds() / 60
+            totals[r["kind"]][r["label"]] = totals[r["kind"]].get(r["label"], 0) + mins
+    return totals
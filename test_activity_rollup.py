@@ -0,0 +1,94 @@
+"""Test: hourly rollups split durations across hours and sum back to the episode-style summary;
+a backfill reopens hours that were already compacted."""
+import sys, os
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from memory.activity_rollup import accumulate, merge_buckets, _to_row, _from_row
+
+t0 = datetime(2026, 3, 1, 9, 40)
+snapshots = [
+    (0,   "Sitting",    "Bedroom",  100, 70, 98),
+    (30,  "Walking",    "Corridor", 300, 90, 97),
+    (50,  "Sitting",    "Bedroom",  400, 75, 0),
+    (130, "Lying Down", "Bedroom",  400, 60, 96),
+]
+
+buckets, last = {}, None
+for mins, posture, area, steps, hr, spo2 in snapshots:
+    last = accumulate(buckets, last, t0 + timedelta(minutes=mins),
+                      {"posture_label": posture, "area_label": area,
+                       "steps": steps, "hr": hr, "spo2": spo2})
+
+for hour, b in sorted(buckets.items()):
+    print(f"  {hour}: {b['posture']} steps+{b['steps_delta']}")
+assert sorted(buckets) == ["2026-03-01T09:00", "2026-03-01T10:00", "2026-03-01T11:00"]
+assert buckets["2026-03-01T10:00"]["posture"] == {"Sitting": 40.0, "Walking": 20.0}
+
+# Round-trip through the Neo4j row format, then sum
+stats = merge_buckets([_from_row(_to_row("D", b, True)) for b in buckets.values()])
+print("Summary:", {k: stats[k] for k in ("snapshots", "posture_minutes", "steps_delta", "hr_mean")})
+assert stats["posture_minutes"] == {"Sitting": 110.0, "Walking": 20.0}
+assert stats["area_minutes"] == {"Bedroom": 110.0, "Corridor": 20.0}
+assert stats["snapshots"] == 4 and stats["steps_delta"] == 400 and stats["steps_max"] == 400
+assert stats["spo2_mean"] == 97.0            # SpO2 0 (no reading) is ignored
+assert merge_buckets([]) == {}
+
+# A span across an hour without snapshots still counts (that hour has n == 0)
+quiet, last = {}, None
+for mins, posture in ((0, "Lying Down"), (150, "Sitting")):
+    last = accumulate(quiet, last, t0 + timedelta(minutes=mins),
+                      {"posture_label": posture, "area_label": "Bedroom", "steps": 0})
+assert quiet["2026-03-01T10:00"]["n"] == 0
+assert merge_buckets(list(quiet.values()))["posture_minutes"] == {"Lying Down": 150.0}
+
+# Backfill into hours already compacted as empty final rows → reopened and rebuilt
+from memory.activity_rollup import ROLLUPS
+
+
+class _Result(list):
+    def single(self):
+        return self[0] if self else None
+
+    def consume(self):
+        pass
+
+
+class FakeSession:
+    """Just enough of the rollup / VitalReading Cypher for compact() and backfilled()."""
+
+    def __init__(self):
+        self.rollups, self.readings = {}, []
+
+    def run(self, query, **p):
+        if "SET r.final = false" in query:
+            for r in self.rollups.values():
+                if p["start"] <= r["hour"] <= p["end"]:
+                    r["final"] = False
+            return _Result()
+        if "RETURN r.hour AS hour" in query:
+            return _Result({"hour": h} for h, r in self.rollups.items() if h >= p["start"] and r["final"])
+        if "MERGE (r:ActivityRollup" in query:
+            for row in p["rows"]:
+                if row["final"] or not self.rollups.get(row["hour"], {}).get("final"):
+                    self.rollups[row["hour"]] = row
+            return _Result()
+        lo = datetime.fromisoformat(p["since"])
+        hi = datetime.fromisoformat(p.get("until") or p["before"])
+        recs = sorted((v for v in self.readings if lo <= v["ts"] < hi), key=lambda v: v["ts"])
+        return _Result(recs[::-1][:1] if "LIMIT 1" in query else recs)
+
+
+day = (datetime.now() - timedelta(days=3)).replace(hour=8, minute=0, second=0, microsecond=0)
+sess = FakeSession()
+ROLLUPS.compact("BACKFILL", session=sess, since=day, until=day + timedelta(hours=3))
+assert len(sess.rollups) == 4 and all(r["final"] and r["n"] == 0 for r in sess.rollups.values())
+
+sess.readings = [{"ts": (day + timedelta(minutes=m)).astimezone(), "posture_label": "Sitting",
+                  "area_label": "Bedroom", "steps": 0, "hr": 72, "spo2": 97} for m in (10, 40, 70)]
+assert ROLLUPS.compact("BACKFILL", session=sess, since=day, until=day + timedelta(hours=3)) == 0, "final hours are not re-read"
+n = ROLLUPS.backfilled("BACKFILL", day + timedelta(minutes=10), day + timedelta(minutes=70), session=sess)
+rebuilt = merge_buckets([_from_row(r) for r in sess.rollups.values()])
+print("Backfilled:", n, "hours |", rebuilt["posture_minutes"])
+assert n == 3 and rebuilt["snapshots"] == 3 and rebuilt["posture_minutes"] == {"Sitting": 60.0}
+assert all(r["final"] for r in sess.rollups.values())
+print("\n✅ activity rollup OK")
@@ -0,0 +1,89 @@
+"""Test: a search or report chat submitted behind a slow extraction runs at once; a saturated lane admits by priority;
+one patient's writes do not interleave."""
+import sys, os, asyncio, time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from memory.async_lanes import LANES, in_lane, lane_stats
+
+order = []
+
+async def job(name, seconds):
+    await asyncio.sleep(seconds)
+    order.append(name)
+    return name
+
+async def main():
+    # 1) extraction (concurrency 1) is busy for 0.3 s — search must not wait for it
+    t0 = time.monotonic()
+    ext = asyncio.ensure_future(in_lane("extraction", job("extract", 0.3)))
+    await asyncio.sleep(0)
+    assert await in_lane("search", job("search", 0.01)) == "search"
+    assert time.monotonic() - t0 < 0.2, "search queued behind extraction"
+    await ext
+
+    # 2) saturated extraction lane: waiters leave by priority, then FIFO
+    order.clear()
+    busy = asyncio.ensure_future(in_lane("extraction", job("busy", 0.05)))
+    await asyncio.sleep(0)
+    waiters = [asyncio.ensure_future(in_lane("extraction", job(n, 0), priority=p))
+               for n, p in (("routine", 9), ("fall", 1), ("alert", 2), ("routine2", 9))]
+    await asyncio.gather(busy, *waiters)
+    assert order == ["busy", "fall", "alert", "routine", "routine2"], order
+
+    # 3) readonly timeout cancels the coroutine on the loop
+    try:
+        await in_lane("readonly", job("slow_read", 1), timeout=0.05)
+        raise AssertionError("no timeout")
+    except asyncio.TimeoutError:
+        pass
+    await asyncio.sleep(0.05)
+    assert "slow_read" not in order
+
+    # 4) report chat (interactive) does not wait on extraction and is cancelled on timeout
+    t0 = time.monotonic()
+    ext = asyncio.ensure_future(in_lane("extraction", job("extract2", 0.3)))
+    await asyncio.sleep(0)
+    assert await in_lane("interactive", job("report", 0.01), timeout=1) == "report"
+    assert time.monotonic() - t0 < 0.2, "report chat queued behind extraction"
+    try:
+        await in_lane("interactive", job("slow_report", 1), timeout=0.05)
+        raise AssertionError("no timeout")
+    except asyncio.TimeoutError:
+        pass
+    await ext
+    await asyncio.sleep(0.05)
+    assert "slow_report" not in order and LANES["interactive"].running == 0
+
+asyncio.run(main())
+st = lane_stats()
+print("extraction:", {k: st["extraction"][k] for k in ("submitted", "completed", "queue_ms_p50", "queue_ms_p95")})
+assert st["extraction"]["completed"] == 7 and st["extraction"]["running"] == 0 and st["extraction"]["waiting"] == 0
+assert st["search"]["queue_ms_p95"] < 50
+assert st["readonly"]["timeouts"] == 1 and st["interactive"]["timeouts"] == 1
+assert sum(st["extraction"]["queue_ms_histogram"].values()) == 7 == st["extraction"]["queue_ms_count"]
+assert st["extraction"]["queue_ms_sum"] >= st["extraction"]["queue_ms_p95"]
+print("\n✅ async lanes OK")
+
+# 4) write lane runs patients in parallel, but one patient's writes one at a time
+from memory.patient_memory import _per_patient
+
+events = []
+
+class FakeMemory:
+    def __init__(self, device_id):
+        self.device_id = device_id
+
+    @_per_patient
+    async def write(self, tag):
+        events.append(f"{self.device_id}{tag}+")
+        await asyncio.sleep(0.02)
+        events.append(f"{self.device_id}{tag}-")
+
+async def writes():
+    a, b = FakeMemory("A"), FakeMemory("B")
+    await asyncio.gather(in_lane("write", a.write(1)), in_lane("write", a.write(2)), in_lane("write", b.write(1)))
+
+asyncio.run(writes())
+print("writes:", events)
+assert events.index("A1-") < events.index("A2+"), "same patient interleaved"
+assert events.index("B1+") < events.index("A1-"), "other patients must not wait"
+print("✅ per-patient write serialization OK")
@@ -0,0 +1,34 @@
+"""Test: a failed flush with a full write-behind buffer drops the oldest rows, not the newest."""
+import sys, os
+from contextlib import contextmanager
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import memory.direct_neo4j_writer as writer
+
+writer.MAX_BUFFER, writer.BATCH_SIZE, writer.WRITE_BEHIND = 10, 4, True
+writer._start_flusher = lambda: None          # flush by hand
+
+
+def row(seq):
+    return {"device_id": "OVERFLOW_TEST", "seq": seq}
+
+
+@contextmanager
+def neo4j_down():
+    # Readings keep arriving while the transaction is in flight, then it fails
+    for seq in range(10, 14):
+        writer._enqueue("vital", row(seq))
+    raise ConnectionError("Neo4j unavailable")
+    yield
+
+
+for seq in range(10):
+    writer._enqueue("vital", row(seq))
+writer.sync_session = neo4j_down
+assert writer.flush() is False
+
+kept = [r["seq"] for r in writer._buffer["vital"]]
+print("kept:", kept, "| dropped:", writer._stats["dropped"])
+assert len(kept) == writer.MAX_BUFFER
+assert kept == list(range(4, 14)), "the newest readings must survive a failed flush"
+assert writer._stats["dropped"] == 4
+print("\n✅ direct writer overflow OK")
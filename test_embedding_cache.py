@@ -0,0 +1,72 @@
+"""Test: embedding cache batches concurrent misses into one call and serves repeats from memory/disk."""
+import sys, os, asyncio, tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from memory.embedding_cache import CachingEmbedder, EmbeddingStore
+
+
+class FakeEmbedder:
+    """Stands in for OpenAIEmbedder: vector = [len(text), n-th call]."""
+    def __init__(self):
+        self.calls = []
+
+    async def create(self, input_data):
+        self.calls.append([input_data])
+        await asyncio.sleep(0.01)
+        return [float(len(input_data)), 0.5]
+
+    async def create_batch(self, input_data_list):
+        self.calls.append(list(input_data_list))
+        await asyncio.sleep(0.01)
+        return [[float(len(t)), 0.5] for t in input_data_list]
+
+
+path = os.path.join(tempfile.mkdtemp(), "emb.db")
+inner = FakeEmbedder()
+emb = CachingEmbedder(inner, model="nomic-embed-text", dim=2, store=EmbeddingStore(path))
+
+async def first_round():
+    # 5 concurrent callers, 3 distinct texts → ONE batched call with 3 texts
+    return await asyncio.gather(
+        emb.create("patient fell in bathroom"),
+        emb.create(["heart rate"]),
+        emb.create("patient fell in bathroom"),
+        emb.create_batch(["heart rate", "SpO2"]),
+        emb.create("SpO2"),
+    )
+
+res = asyncio.run(first_round())
+print("calls:", inner.calls)
+assert len(inner.calls) == 1 and sorted(inner.calls[0]) == ["SpO2", "heart rate", "patient fell in bathroom"]
+assert res[0] == res[2] == [24.0, 0.5] and res[3] == [[10.0, 0.5], [4.0, 0.5]]
+
+# Repeats: memory hits, no new calls
+asyncio.run(emb.create("heart rate"))
+assert len(inner.calls) == 1
+
+# New process (fresh embedder, same file): served from disk
+inner2 = FakeEmbedder()
+emb2 = CachingEmbedder(inner2, model="nomic-embed-text", dim=2, store=EmbeddingStore(path))
+assert asyncio.run(emb2.create("SpO2")) == [4.0, 0.5] and inner2.calls == []
+
+# Different model → different key
+emb3 = CachingEmbedder(FakeEmbedder(), model="other-model", dim=2, store=EmbeddingStore(path))
+asyncio.run(emb3.create("SpO2"))
+assert emb3.stats()["misses"] == 1
+
+# Cancelling one caller must not cancel the others waiting on the same text
+async def cancel_one():
+    a = asyncio.ensure_future(emb.create("shared text"))
+    b = asyncio.ensure_future(emb.create("shared text"))
+    while emb.stats()["joined"] < 4:        # b waits on a's in-flight future
+        await asyncio.sleep(0.001)
+    a.cancel()
+    return await asyncio.gather(a, b, return_exceptions=True)
+
+ra, rb = asyncio.run(cancel_one())
+assert isinstance(ra, asyncio.CancelledError) and rb == [11.0, 0.5], (ra, rb)
+assert asyncio.run(emb.create("shared text")) == [11.0, 0.5]     # cached, not a stale future
+
+st = emb.stats()
+print("Stats:", {k: st[k] for k in ("hit_rate", "batches", "avg_batch_size", "saved_ms", "disk_entries")})
+assert st["batches"] == 2 and st["embedded"] == 4 and st["mem_hits"] == 2 and st["joined"] == 4
+print("\n✅ embedding cache OK")
@@ -0,0 +1,47 @@
+"""Test: a run of critical readings becomes one incident with a bounded number of Graphiti episodes."""
+import sys, os
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from memory import incidents
+from memory.incidents import IncidentTracker
+
+incidents.INCIDENT_MAX_LLM = 3
+tracker = IncidentTracker("TEST_INC")
+t0 = datetime(2026, 3, 1, 2, 0)
+
+# 10 min of hypoxia at one reading / 2 s, getting worse, then a fall, then recovery
+readings = [(80, 88, 3)] * 60 + [(95, 84, 3)] * 60 + [(120, 83, 5)] * 60 + [(75, 96, 3)] * 6
+actions = []
+for i, (hr, spo2, posture) in enumerate(readings):
+    for d in tracker.observe(hr, spo2, posture, t0 + timedelta(seconds=2 * i)):
+        actions.append((d["action"], d["write"], d["llm"]))
+
+writes = [a for a in actions if a[1]]
+llm = [a[0] for a in actions if a[2]]
+print("writes:", len(writes), "| Graphiti episodes:", llm)
+assert actions[0] == ("open", True, True)
+assert [a[0] for a in actions if a[0] == "escalate"] == ["escalate", "escalate"]   # SpO2 < 85, then fall
+assert llm == ["open", "escalate", "close"], "budget keeps one call for the close summary"
+assert actions[-1][0] == "close" and tracker.current is None
+assert len(writes) < 30, "updates are throttled, not written per reading"
+
+row = [d for d in [tracker.status()]][0]
+assert row["open"] is None and row["closed"] == 1
+
+# A gap with no readings closes the stale incident before a new one opens
+t1 = t0 + timedelta(hours=1)
+tracker.observe(120, 95, 3, t1)
+later = tracker.observe(121, 95, 3, t1 + timedelta(minutes=10))
+assert [d["action"] for d in later] == ["close", "open"]
+closed = later[0]["incident"]
+assert closed["status"] == "closed" and closed["duration_sec"] == 0 and closed["hr_max"] == 120
+print("Closed summary:", later[0]["summary"])
+
+# Device goes offline mid-incident: the sweep closes it without a new reading
+t2 = t0 + timedelta(hours=2)
+tracker.observe(125, 95, 3, t2)
+assert tracker.sweep(t2 + timedelta(minutes=1)) == []
+swept = tracker.sweep(t2 + timedelta(minutes=10))
+assert [d["action"] for d in swept] == ["close"] and tracker.current is None
+assert swept[0]["incident"]["ended_utc"] == swept[0]["incident"]["last_seen_utc"]
+print("\n✅ incidents OK")
@@ -0,0 +1,42 @@
+"""Test: a cancelled ingestion is retried and does not kill the queue worker."""
+import sys, os, asyncio, tempfile
+os.environ["GRAPHITI_RETRY_BASE_SEC"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from memory.ingest_queue import GraphitiIngestQueue
+
+queue = GraphitiIngestQueue(os.path.join(tempfile.mkdtemp(), "q.db"), workers=1)
+calls = []
+
+async def flaky(row):
+    calls.append((row["id"], row["attempts"]))
+    if len(calls) == 1:
+        raise asyncio.CancelledError()      # e.g. a shared in-flight embedding was cancelled
+    if row["content"] == "slow":
+        await asyncio.sleep(30)
+
+queue._process = flaky
+
+def state(content):
+    return queue._conn().execute("SELECT state, attempts FROM episodes WHERE content=?", (content,)).fetchone()
+
+async def run():
+    await queue.start()
+    queue.enqueue("DEV", "first", "alert")
+    for _ in range(50):
+        await asyncio.sleep(0.05)
+        if state("first")["state"] == "done":
+            break
+    assert state("first")["state"] == "done" and calls == [(1, 1), (1, 2)], calls
+    assert not queue._workers[0].done(), "worker must survive a cancelled row"
+    assert queue.stats()["retried"] == 1
+
+    # Cancelling the worker itself mid-row puts the row back to pending
+    queue.enqueue("DEV", "slow", "alert")
+    await asyncio.sleep(0.2)
+    assert state("slow")["state"] == "inflight"
+    queue._workers[0].cancel()
+    await asyncio.gather(queue._workers[0], return_exceptions=True)
+    assert state("slow")["state"] == "pending", dict(state("slow"))
+
+asyncio.run(run())
+print("\n✅ ingest queue cancellation OK")
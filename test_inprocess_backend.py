@@ -0,0 +1,53 @@
+"""Test: MEMORY_BACKEND=inprocess serves the PatientMemory API without Neo4j / Graphiti."""
+import sys, os, asyncio
+from datetime import datetime, timedelta
+os.environ["MEMORY_BACKEND"] = "inprocess"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from memory.patient_memory import PatientMemory
+from memory.inprocess_backend import InProcessPatientMemory, STORE
+
+mem = PatientMemory("TEST_INPROC")
+assert isinstance(mem, InProcessPatientMemory) and PatientMemory("TEST_INPROC") is mem
+
+day = (datetime.now() - timedelta(days=1)).replace(hour=7, minute=50, second=0, microsecond=0)
+readings = [
+    (72, 97, 1, 4, day),                          # sitting, dining table
+    (75, 97, 8, 3, day + timedelta(minutes=10)),  # walking, corridor
+    (118, 88, 5, 6, day + timedelta(minutes=20)), # fall in bathroom
+    (80, 96, 3, 7, day + timedelta(minutes=40)),  # lying, bedroom
+]
+
+async def run():
+    for hr, spo2, posture, area, ts in readings:
+        await mem.store_sensor_snapshot({"HR": hr, "Blood_oxygen": spo2, "Posture_state": posture,
+                                         "Area": area, "Step": 100, "timestamp": ts})
+    await mem.store_alert({"severity": "CRITICAL", "message": "Fall detected", "anomalies": ["fall"]})
+
+    ctx = await mem.get_patient_context("Did the patient have a fall in the bathroom?", limit=3)
+    print(ctx)
+    assert ctx.startswith("Patient Memory Context") and "critical fall" in ctx
+
+    timeline = await mem.get_episodes_by_time_range(8, 0, 15, date_str=day.strftime("%Y-%m-%d"))
+    assert "3 records" in timeline and "Falling" in timeline, timeline
+    assert await mem.get_episodes_by_time_range(8, 0, 15, date_str="2001-01-01") == ""
+
+    stats = await mem.get_activity_stats(48)
+    assert stats["snapshots"] == 4 and round(stats["posture_minutes"]["Falling"]) == 20
+    assert "Lying Down" not in stats["posture_minutes"]   # last snapshot, no interval yet
+    history = await mem.get_raw_history(48)
+    assert [h["Posture_state"] for h in history] == ["Sitting", "Walking", "Falling", "Lying Down"]
+
+    tier2 = await mem._tier2_context(10)
+    assert "⚠️ ALERT — critical_fall [critical]" in tier2 and "Real-time reading — HR: 118" in tier2
+
+asyncio.run(run())
+
+assert mem.add_manual_context_sync("Ate rice and chicken", "meal")
+entries = mem.get_manual_episodes_sync()
+assert len(entries) == 1 and entries[0]["source"] == "manual" and entries[0]["timestamp"].endswith("Z")
+assert mem.delete_manual_context_sync(entries[0]["id"]) and mem.get_manual_episodes_sync() == []
+
+st = STORE.stats()["TEST_INPROC"]
+print("Store:", st)
+assert st["vitals"] == 4 and st["alerts"] == 1 and st["episodes"] >= 4
+print("\n✅ in-process backend OK")
@@ -0,0 +1,76 @@
+"""
+Test: Layer-1 direct writes must not block the shared event loop.
+
+Runs a lag probe on the loop (sleep 10 ms, measure the overshoot) while
+snapshots are written three ways:
+  1. blocking  — sync write_vital_reading with write-behind off (old path)
+  2. executor  — awrite_vital_reading with write-behind off
+  3. buffered  — awrite_vital_reading with write-behind on (default)
+
+Needs a running Neo4j (NEO4J_URI / NEO4J_USER / NEO4J_PASSWORD).
+"""
+import sys, os, asyncio, time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import memory.direct_neo4j_writer as writer
+
+DEVICE = "LOOP_LAG_TEST"
+N_WRITES = 30
+PROBE_MS = 10
+MAX_LAG_MS = 50     # async paths must keep the loop responsive
+
+
+def _snapshot(i):
+    return {"hr": 70 + i % 10, "spo2": 97, "steps": i, "posture": 1,
+            "posture_label": "Sitting", "area_label": "Laboratory",
+            "condition": "routine_observation"}
+
+
+async def _probe(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(PROBE_MS / 1000)
+        lags.append((time.perf_counter() - t0) * 1000 - PROBE_MS)
+
+
+async def _run(mode: str) -> float:
+    writer.WRITE_BEHIND = mode == "buffered"
+    stop, lags = asyncio.Event(), []
+    probe = asyncio.create_task(_probe(stop, lags))
+    await asyncio.sleep(0.05)
+
+    for i in range(N_WRITES):
+        if mode == "blocking":
+            writer.write_vital_reading(DEVICE, _snapshot(i))
+        else:
+            await writer.awrite_vital_reading(DEVICE, _snapshot(i))
+        await asyncio.sleep(0)
+
+    await asyncio.sleep(0.05)
+    stop.set()
+    await probe
+    if mode == "buffered":
+        await writer.aflush()
+    return max(lags) if lags else 0.0
+
+
+async def main():
+    results = {}
+    for mode in ("blocking", "executor", "buffered"):
+        results[mode] = await _run(mode)
+        print(f"  {mode:9s}: max loop lag {results[mode]:7.1f} ms over {N_WRITES} writes")
+
+    print(f"\nWriter stats: {writer.writer_stats()['written']}")
+    assert results["executor"] < MAX_LAG_MS, "executor path blocked the loop"
+    assert results["buffered"] < MAX_LAG_MS, "buffered path blocked the loop"
+    print(f"✅ async writes kept loop lag under {MAX_LAG_MS} ms "
+          f"(blocking path: {results['blocking']:.1f} ms)")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("  EVENT LOOP LAG — Layer-1 direct writes")
+    print("=" * 60)
+    try:
+        asyncio.run(main())
+    finally:
+        writer.close()
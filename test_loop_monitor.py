@@ -0,0 +1,55 @@
+"""Test: memory loop monitor sees lag, in-flight futures by kind and error outcomes."""
+import sys, os, asyncio, time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from memory.loop_monitor import LOOP_MONITOR
+from memory.patient_memory import run_async, run_async_readonly
+from memory.async_lanes import lane_stats
+
+LOOP_MONITOR.sample_sec = 0.05
+
+
+async def store_sensor_snapshot(seconds):
+    await asyncio.sleep(seconds)
+
+async def get_patient_context():
+    return "ctx"
+
+async def blocking_call():
+    time.sleep(0.3)          # sync call on the loop → lag
+
+async def fails():
+    raise ValueError("neo4j down")
+
+async def slow_read():
+    await asyncio.sleep(1)
+
+
+run_async(store_sensor_snapshot(0.5), wait_result=False)
+run_async(store_sensor_snapshot(0.5), wait_result=False)
+time.sleep(0.1)
+st = LOOP_MONITOR.status()
+print("in flight:", st["in_flight"])
+assert st["in_flight"]["by_kind"] == {"snapshot": 2} and st["in_flight"]["by_lane"] == {"write": 2}
+assert st["in_flight"]["oldest_age_sec"] >= 0.1
+
+assert run_async(get_patient_context(), lane="search") == "ctx"
+run_async(blocking_call(), wait_result=False)
+run_async(fails(), wait_result=False)
+assert run_async_readonly(slow_read(), timeout=0.1) is None
+time.sleep(0.7)
+
+st = LOOP_MONITOR.status()
+print("lag:", st["lag_ms"], "| counters:", st["counters"])
+assert st["lag_ms"]["max"] >= 200, "blocking call not seen as loop lag"
+assert st["in_flight"]["total"] == 0
+assert st["counters"]["submitted"] == 6 and st["counters"]["finished"] == 6
+assert st["counters"]["exception"] == 1 and st["counters"]["timeout"] == 1
+assert st["last_error"]["kind"] == "slow_read"
+assert st["loop_tasks"]["total"] >= 1   # the sampler itself
+
+text = LOOP_MONITOR.prometheus(lane_stats())
+assert 'medicore_memory_futures_total{outcome="exception"} 1' in text
+assert 'medicore_memory_lane_queue_ms_bucket{lane="search",le="+Inf"} 1' in text
+assert 'medicore_memory_lane_queue_ms_count{lane="search"} 1' in text
+assert 'medicore_memory_lane_queue_ms_sum{lane="search"} ' in text
+print("\n✅ loop monitor OK")
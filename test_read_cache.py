@@ -0,0 +1,62 @@
+"""Test: read cache serves hits, drops entries on local writes / TTL, and evicts LRU."""
+import sys, os, asyncio, time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from memory.read_cache import READ_CACHE, PatientReadCache, cached_read
+
+
+class FakeMemory:
+    def __init__(self, device_id):
+        self.device_id = device_id
+        self.loads = 0
+        self.rows = ["a"]
+
+    @cached_read("rows")
+    def rows_sync(self, limit=10):
+        self.loads += 1
+        return list(self.rows[:limit])
+
+    @cached_read("rows_async")
+    async def rows_async(self, limit=10, session=None):
+        self.loads += 1
+        await asyncio.sleep(0)
+        return list(self.rows[:limit])
+
+
+mem = FakeMemory("TEST_CACHE")
+assert mem.rows_sync(limit=5) == ["a"] and mem.rows_sync(limit=5) == ["a"]
+assert mem.loads == 1, "second read must be a hit"
+
+# Callers may mutate what they get back
+mem.rows_sync(limit=5).append("junk")
+assert mem.rows_sync(limit=5) == ["a"]
+
+# Local write → next read reloads and sees it
+mem.rows.append("b")
+READ_CACHE.bump(mem.device_id)
+assert mem.rows_sync(limit=5) == ["a", "b"] and mem.loads == 2
+
+# A write landing WHILE a load is running must not be cached
+async def racing_write():
+    async def write_during_load():
+        mem.rows.append("c")
+        READ_CACHE.bump(mem.device_id)
+    return await asyncio.gather(mem.rows_async(limit=5), write_during_load())
+
+asyncio.run(racing_write())
+before = mem.loads
+assert mem.rows_async.__name__ == "rows_async"
+assert asyncio.run(mem.rows_async(limit=5)) == ["a", "b", "c"] and mem.loads == before + 1
+assert asyncio.run(mem.rows_async(limit=5, session=object())) == ["a", "b", "c"]
+assert mem.loads == before + 1, "session kwarg is not part of the key"
+
+# TTL and LRU on a small private cache
+small = PatientReadCache(max_entries=2, ttl=0.05)
+for k in ("x", "y", "z"):
+    hit, _, v = small.lookup(("D", "m", k))
+    small.store(("D", "m", k), v, k)
+assert small.stats()["entries"] == 2 and small.stats()["evictions"] == 1
+assert small.lookup(("D", "m", "z"))[0]
+time.sleep(0.06)
+assert not small.lookup(("D", "m", "z"))[0]
+print("Stats:", READ_CACHE.stats()["methods"])
+print("\n✅ read cache OK")
@@ -0,0 +1,46 @@
+"""Test: retention buckets readings per 15 min and rolls summaries up to a day without losing counts."""
+import sys, os
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from memory.retention import _bucket_key, _empty, fold_reading, combine, _to_row, _from_row
+
+t0 = datetime(2026, 3, 1, 9, 50)
+readings = [
+    (0,  72, 98, 100, "Sitting", "routine_observation"),
+    (4,  0,  97, 120, "Sitting", "routine_observation"),      # HR 0 = no reading
+    (12, 95, 93, 180, "Walking", "low_oxygen_warning"),
+    (40, 60, 0,  180, "Lying Down", "routine_observation"),
+]
+
+buckets = {}
+for mins, hr, spo2, steps, posture, cond in readings:
+    ts = t0 + timedelta(minutes=mins)
+    key = _bucket_key(ts)
+    fold_reading(buckets.setdefault(key, _empty(key)), {
+        "ts": ts, "hr": hr, "spo2": spo2, "steps": steps,
+        "posture_label": posture, "area_label": "Bedroom", "condition": cond,
+    })
+
+print("15m buckets:", {k: b["n"] for k, b in sorted(buckets.items())})
+assert sorted(buckets) == ["2026-03-01T09:45", "2026-03-01T10:00", "2026-03-01T10:30"]
+b = buckets["2026-03-01T09:45"]
+assert b["n"] == 2 and b["hr_n"] == 1 and b["spo2_n"] == 2 and b["steps_max"] == 120
+
+# Round-trip through the Neo4j row format, then collapse to one day
+daily = _empty("2026-03-01T00:00")
+for b in buckets.values():
+    combine(daily, _from_row(_to_row("D", "15m", b)))
+print("Daily:", {k: daily[k] for k in ("n", "hr_min", "hr_max", "spo2_min", "condition")})
+assert daily["n"] == 4 and daily["hr_n"] == 3 and daily["hr_sum"] == 72 + 95 + 60
+assert daily["hr_min"] == 60 and daily["hr_max"] == 95 and daily["spo2_min"] == 93
+assert daily["posture"] == {"Sitting": 2, "Walking": 1, "Lying Down": 1}
+assert daily["condition"]["low_oxygen_warning"] == 1
+assert daily["first_ts"] == t0.isoformat() and daily["steps_max"] == 180
+
+# A late reading merges into an existing summary instead of replacing it
+late = _empty("2026-03-01T10:00")
+fold_reading(late, {"ts": t0 + timedelta(minutes=14), "hr": 80, "spo2": 96, "steps": 190,
+                    "posture_label": "Standing", "area_label": "Kitchen", "condition": "routine_observation"})
+combine(late, _from_row(_to_row("D", "15m", buckets["2026-03-01T10:00"])))
+assert late["n"] == 2 and late["area"] == {"Kitchen": 1, "Bedroom": 1}
+print("\n✅ retention OK")
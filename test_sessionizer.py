@@ -0,0 +1,67 @@
+"""Test: Sessionizer run-length encodes posture/area and durations come from Segment overlap."""
+import sys, os, asyncio
+from datetime import datetime, timedelta
+os.environ["MEMORY_BACKEND"] = "inprocess"
+os.environ["SEGMENT_GAP_SEC"] = "300"
+os.environ["SEGMENT_CHECKPOINT_SEC"] = "600"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from memory.sessionizer import Sessionizer, overlap_minutes
+from memory.patient_memory import PatientMemory
+
+t0 = datetime.now().replace(microsecond=0) - timedelta(hours=2)
+sess = Sessionizer("TEST_SESS", debounce=3)
+rows = []
+
+def feed(posture, area, start_sec, n, every=60):
+    for i in range(n):
+        rows.extend(sess.observe(posture, area, t0 + timedelta(seconds=start_sec + i * every)))
+
+feed("Sitting", "Bedroom", 0, 20)              # 0 .. 19 min
+feed("Walking", "Bedroom", 20 * 60, 2)         # glitch: shorter than the debounce
+feed("Sitting", "Bedroom", 22 * 60, 8)         # 22 .. 29 min
+assert not [r for r in rows if r["status"] == "closed"], "a 2-reading glitch must not split a segment"
+
+feed("Walking", "Corridor", 30 * 60, 10)       # 30 .. 39 min, confirmed at the 3rd reading
+closed = [r for r in rows if r["status"] == "closed"]
+assert {(r["kind"], r["label"]) for r in closed} == {("posture", "Sitting"), ("area", "Bedroom")}
+sitting = next(r for r in closed if r["kind"] == "posture")
+assert sitting["duration_sec"] == 30 * 60, "boundary is back-dated to the first Walking reading"
+assert sitting["readings"] == 30
+assert sess.status()["open"]["posture"]["since"] == (t0 + timedelta(minutes=30)).isoformat(timespec="seconds")
+
+checkpoints = [r for r in rows if r["status"] == "open"]
+assert checkpoints and all(r["kind"] in ("posture", "area") for r in checkpoints)
+
+# 20 min without readings (device off) → the segment ends at its last reading
+feed("Walking", "Corridor", 60 * 60, 1)
+gap = [r for r in rows if r["status"] == "closed" and r["label"] == "Walking"]
+assert len(gap) == 1 and gap[0]["duration_sec"] == 9 * 60, gap
+
+# Overlap: clipped to the window, persisted checkpoint + live row of one uuid count once
+all_rows = rows + sess.open_rows()
+mins = overlap_minutes(all_rows, t0 + timedelta(minutes=10), t0 + timedelta(minutes=35))
+assert round(mins["posture"]["Sitting"]) == 20 and round(mins["posture"]["Walking"]) == 5, mins
+assert round(mins["area"]["Bedroom"]) == 20 and round(mins["area"]["Corridor"]) == 5, mins
+assert overlap_minutes(all_rows + all_rows, t0, t0 + timedelta(hours=2)) == overlap_minutes(all_rows, t0, t0 + timedelta(hours=2))
+
+# PatientMemory: durations from the stored segments, not from pairing snapshots
+async def run():
+    mem = PatientMemory("TEST_SESS")
+    await mem.store_segments(rows)
+    stats = await mem.get_activity_stats(3)
+    print(stats)
+    assert stats["duration_source"] == "segments" and stats["snapshots"] == 0
+    assert round(stats["posture_minutes"]["Sitting"]) == 30 and round(stats["posture_minutes"]["Walking"]) == 9
+    summary = await mem.get_activity_summary(3)
+    assert "posture/location segments" in summary and "Sitting: 30 min" in summary, summary
+
+    # Segments only since t0, older episodes in the window → keep the episode minutes
+    await mem._write_layer1({"posture_label": "Prone", "area_label": "Bedroom", "steps": 0}, 0,
+                            t0 - timedelta(minutes=30), "routine_observation", "")
+    partial = await mem.get_activity_stats(4)
+    print(partial)
+    assert partial["duration_source"] == "episodes" and partial["snapshots"] == 1, partial
+    assert "Sitting" not in partial["posture_minutes"]
+
+asyncio.run(run())
+print("\n✅ sessionizer OK")
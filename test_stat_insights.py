@@ -0,0 +1,42 @@
+"""Test: deterministic insight cards — normal patient gets no flags, a desaturating one does."""
+import sys, os
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from insights.stat_insights import build_stat_insights
+
+now = datetime.now()
+
+def reading(i, hr=78, spo2=97, posture=1, area=5):
+    return {'timestamp': now - timedelta(seconds=2 * (60 - i)), 'HR': hr,
+            'Blood_oxygen': spo2, 'Posture_state': posture, 'Area': area}
+
+activity = {'snapshots': 40, 'posture_minutes': {'Sitting': 300, 'Walking': 45},
+            'area_minutes': {'Living Room': 260, 'Bathroom': 20, 'Corridor': 65},
+            'steps_avg': 1200, 'steps_max': 3400}
+
+# 1. Normal patient — LLM not needed
+normal = build_stat_insights([reading(i, hr=75 + i % 5) for i in range(60)], activity=activity)
+print("Normal flags:", normal['flags'])
+for c in normal['insights']:
+    print(f"  [{c['severity']:8s}] {c['title']}: {c['reasoning'][:90]}")
+assert normal['flags'] == []
+assert len(normal['insights']) == 4
+assert all(c['severity'] == 'normal' for c in normal['insights'])
+
+# 2. Desaturation + critical alert — flagged for the LLM
+hist = [reading(i) for i in range(50)] + [reading(50 + i, hr=120, spo2=86) for i in range(10)]
+alerts = [{'timestamp': (now - timedelta(minutes=5)).isoformat(), 'severity': 'CRITICAL',
+           'message': 'HYPOXIA (SpO2=86%)'}]
+manual = [{'timestamp': now.isoformat(), 'name': 'medical_record', 'content': 'History of COPD'}]
+flagged = build_stat_insights(hist, activity=activity, alerts=alerts, manual=manual)
+print("\nFlagged:", flagged['flags'])
+for c in flagged['insights']:
+    print(f"  [{c['severity']:8s}] {c['title']}: {c['reasoning'][:90]}")
+assert 'hypoxia' in flagged['flags'] and 'critical_alerts' in flagged['flags']
+assert flagged['insights'][1]['severity'] == 'critical'
+assert 'COPD' in flagged['insights'][3]['reasoning']
+
+# 3. No data at all — still 4 cards
+empty = build_stat_insights([], activity={})
+assert len(empty['insights']) == 4 and empty['flags'] == []
+print("\n✅ stat insights OK")
@@ -0,0 +1,272 @@
+"""
+Token-Budget Context Builder for UTLMediCore LLM prompts
+=========================================================
+Replaces ad-hoc character trimming with real token budgets per target model.
+
+- count_tokens(text, model) : tokenizer per model family
+      1. HF tokenizer file  $TOKENIZER_DIR/<family>.json   (exact, if present)
+      2. tiktoken           (o200k for gpt-4o*, cl100k otherwise)
+      3. ~4 chars per token (last resort, no dependency)
+- compact_json(obj)         : no indentation, abbreviated keys, rounded numbers
+- ContextBuilder            : per-section budgets (water-filling by weight),
+                              line-aware truncation, cross-section dedup of
+                              episode lines
+
+Usage:
+    cb = ContextBuilder("ollama:lfm2.5-thinking:1.2b", max_tokens=2500)
+    cb.add("risk",   risk_ctx,   weight=2, dedupe=True)
+    cb.add("vitals", vitals_ctx, weight=1, dedupe=True)
+    parts = cb.build()          # {"risk": "...", "vitals": "..."}
+"""
+
+import json
+import math
+import os
+import re
+
+TOKENIZER_DIR = os.getenv("TOKENIZER_DIR", "")
+
+# Ollama truncates anything past num_ctx, so local prompts must fit inside it.
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "4096"))
+
+# Prompt-side token budget per provider (output tokens are reserved separately).
+# Cloud windows are much larger, but every token is billed and slows the call.
+PROVIDER_PROMPT_BUDGET = {
+    "ollama":      OLLAMA_NUM_CTX,
+    "ollamacloud": int(os.getenv("CLOUD_PROMPT_BUDGET", "12000")),
+    "openai":      int(os.getenv("OPENAI_PROMPT_BUDGET", "12000")),
+}
+DEFAULT_OUTPUT_RESERVE = 800
+
+# Short keys the LLM still reads unambiguously.
+KEY_ABBREVIATIONS = {
+    "timestamp":             "ts",
+    "device_id":             "dev",
+    "severity":              "sev",
+    "anomalies":             "anom",
+    "memory_context":        "mem",
+    "activity_distribution": "activity",
+    "vitals_trend":          "vitals",
+    "location_hotspots":     "locations",
+    "risk_assessment":       "risk",
+    "next_hour_risk":        "risk_1h",
+    "trend_direction":       "trend",
+    "recommendations":       "recs",
+    "Blood_oxygen":          "SpO2",
+    "Posture_state":         "posture",
+    "description":           "desc",
+}
+
+_TS_PREFIX = re.compile(r"^\s*\[[^\]]*\]\s*")
+
+_encoders: dict = {}
+
+
+def _family(model: str) -> str:
+    """'ollama:llama3.1:8b' -> 'llama3.1', 'openai:gpt-4o-mini' -> 'gpt-4o-mini'."""
+    name = (model or "").split(":", 1)[1] if ":" in (model or "") else (model or "")
+    return name.split(":")[0].lower()
+
+
+def _provider(model: str) -> str:
+    return (model or "").split(":", 1)[0] if ":" in (model or "") else "ollama"
+
+
+def _get_encoder(model: str):
+    fam = _family(model)
+    if fam in _encoders:
+        return _encoders[fam]
+
+    enc = None
+    if TOKENIZER_DIR:
+        path = os.path.join(TOKENIZER_DIR, f"{fam}.json")
+        if os.path.exists(path):
+            try:
+                from tokenizers import Tokenizer
+                tok = Tokenizer.from_file(path)
+                enc = lambda t, _tok=tok: len(_tok.encode(t).ids)
+            except Exception as e:
+                print(f"[Context] tokenizer {path} unusable: {e}")
+    if enc is None:
+        try:
+            import tiktoken
+            name = "o200k_base" if fam.startswith(("gpt-4o", "gpt-4.1", "o1", "o3")) else "cl100k_base"
+            encoding = tiktoken.get_encoding(name)
+            enc = lambda t, _e=encoding: len(_e.encode(t, disallowed_special=()))
+        except Exception:
+            enc = lambda t: math.ceil(len(t) / 4)
+
+    _encoders[fam] = enc
+    return enc
+
+
+def count_tokens(text: str, model: str = "") -> int:
+    """Token count of text for the target model."""
+    if not text:
+        return 0
+    return _get_encoder(model)(text)
+
+
+def prompt_budget(model: str, output_reserve: int = DEFAULT_OUTPUT_RESERVE) -> int:
+    """Max prompt tokens for this model after reserving room for the answer."""
+    total = PROVIDER_PROMPT_BUDGET.get(_provider(model), OLLAMA_NUM_CTX)
+    return max(total - output_reserve, 256)
+
+
+def _compact(obj, ndigits: int, abbreviate: bool):
+    if isinstance(obj, dict):
+        out = {}
+        for k, v in obj.items():
+            if k == "_id" or v is None or v == "" or v == [] or v == {}:
+                continue
+            key = KEY_ABBREVIATIONS.get(k, k) if abbreviate else k
+            out[key] = _compact(v, ndigits, abbreviate)
+        return out
+    if isinstance(obj, (list, tuple)):
+        return [_compact(v, ndigits, abbreviate) for v in obj]
+    if isinstance(obj, bool) or obj is None or isinstance(obj, (int, str)):
+        return obj
+    if hasattr(obj, "item") and not isinstance(obj, (bytes, bytearray)):   # numpy scalar
+        try:
+            return _compact(obj.item(), ndigits, abbreviate)
+        except Exception:
+            pass
+    if isinstance(obj, float):
+        r = round(obj, ndigits)
+        return int(r) if r == int(r) else r
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat(timespec="minutes") if hasattr(obj, "hour") else obj.isoformat()
+    return str(obj)
+
+
+def compact_json(obj, ndigits: int = 1, abbreviate: bool = True) -> str:
+    """json.dumps without whitespace, empty fields dropped, floats rounded, keys shortened."""
+    return json.dumps(_compact(obj, ndigits, abbreviate), separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def dedupe_lines(text: str, seen: set = None) -> str:
+    """
+    Drop repeated episode lines. Lines are compared without their leading
+    '[timestamp]' so the same episode quoted by two retrievals is kept once.
+    Pass a shared `seen` set to dedupe across several sections.
+    """
+    seen = set() if seen is None else seen
+    kept = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        key = _TS_PREFIX.sub("", stripped).lower()
+        # Headers ('... — 15 recent records:') are short and never deduped
+        if len(key) > 40:
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(stripped)
+    return "\n".join(kept)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "", keep: str = "head") -> str:
+    """Cut text to max_tokens on line boundaries. keep='tail' keeps the newest lines."""
+    if max_tokens <= 0 or not text:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+
+    lines = text.splitlines()
+    if keep == "tail":
+        lines = lines[::-1]
+    kept, used = [], 0
+    marker = count_tokens("...", model)
+    for line in lines:
+        n = count_tokens(line, model) + 1
+        if used + n + marker > max_tokens:
+            if not kept:
+                # One oversized line — fall back to a proportional character cut
+                ratio = max_tokens / max(count_tokens(line, model), 1)
+                kept.append(line[: max(int(len(line) * ratio) - 3, 0)])
+            break
+        kept.append(line)
+        used += n
+    if keep == "tail":
+        return "...\n" + "\n".join(reversed(kept))
+    return "\n".join(kept) + "\n..."
+
+
+class ContextBuilder:
+    """Allocate a prompt token budget across named sections."""
+
+    def __init__(self, model: str, max_tokens: int = None, fixed_text: str = ""):
+        """
+        Args:
+            model      : target model id, e.g. 'ollama:lfm2.5-thinking:1.2b'
+            max_tokens : total prompt budget; defaults to prompt_budget(model)
+            fixed_text : instructions/template text that is always sent —
+                         its tokens are subtracted from the budget
+        """
+        self.model = model
+        self.max_tokens = max_tokens if max_tokens is not None else prompt_budget(model)
+        self.fixed_tokens = count_tokens(fixed_text, model)
+        self._sections = []
+        self._seen = set()
+
+    def add(self, name: str, text: str, weight: float = 1.0, min_tokens: int = 0,
+            dedupe: bool = False, keep: str = "head") -> "ContextBuilder":
+        text = text or ""
+        if dedupe:
+            text = dedupe_lines(text, self._seen)
+        self._sections.append({
+            "name": name, "text": text, "weight": max(weight, 0.01),
+            "min": min_tokens, "keep": keep, "need": count_tokens(text, self.model),
+        })
+        return self
+
+    def _allocate(self) -> dict:
+        budget = max(self.max_tokens - self.fixed_tokens, 0)
+        alloc = {s["name"]: min(s["need"], s["min"]) for s in self._sections}
+        remaining = budget - sum(alloc.values())
+        # Water-filling: share what is left by weight; sections that need less
+        # than their share return the surplus to the others.
+        open_secs = [s for s in self._sections if alloc[s["name"]] < s["need"]]
+        while remaining > 0 and open_secs:
+            total_w = sum(s["weight"] for s in open_secs)
+            spent = 0
+            still_open = []
+            for s in open_secs:
+                share = int(remaining * s["weight"] / total_w)
+                gap = s["need"] - alloc[s["name"]]
+                give = min(share, gap)
+                alloc[s["name"]] += give
+                spent += give
+                if give < gap:
+                    still_open.append(s)
+            if spent == 0:
+                break
+            remaining -= spent
+            open_secs = still_open
+        return alloc
+
+    def build(self) -> dict:
+        """Return {section name: text fitted to its budget}."""
+        alloc = self._allocate()
+        return {
+            s["name"]: truncate_to_tokens(s["text"], alloc[s["name"]], self.model, s["keep"])
+            for s in self._sections
+        }
+
+    def usage(self) -> dict:
+        """Requested vs allocated tokens per section (for logging)."""
+        alloc = self._allocate()
+        return {s["name"]: {"need": s["need"], "alloc": alloc[s["name"]]} for s in self._sections}
+
+
+def fit_history(history: list, model: str, max_tokens: int, max_turns: int = 8) -> list:
+    """Keep the newest chat turns that fit max_tokens (oldest dropped first)."""
+    kept, used = [], 0
+    for turn in reversed(history[-max_turns:]):
+        n = count_tokens(str(turn.get("content", "")), model) + 4
+        if used + n > max_tokens:
+            break
+        kept.append({"role": turn["role"], "content": turn["content"]})
+        used += n
+    return list(reversed(kept))
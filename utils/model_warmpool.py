@@ -0,0 +1,325 @@
+"""
+Ollama Warm Pool for UTLMediCore
+================================
+Keeps the local agent, Graphiti extraction and embedding models resident in
+Ollama so the first call after a quiet period does not pay a model load.
+
+- preload at startup (empty generate / embed request loads the weights)
+- explicit keep_alive per model: models are pinned (keep_alive=-1) in
+  priority order while their size fits the RAM budget, the rest get a
+  finite keep_alive and are left to expire — the background loop only
+  re-pings pinned models (reloading them after an eviction)
+- cold starts and warm latencies come from the real agent / extraction
+  calls (record_latency, track_call); warm-up pings are kept apart
+
+Usage:
+    from utils.model_warmpool import start_warm_pool, warm_pool_stats, track_call
+    start_warm_pool([("ollama:lfm2.5-thinking:1.2b", "agent"),
+                     ("llama3.1:8b", "extraction"),
+                     ("nomic-embed-text", "embedding")])
+
+    with track_call("ollama:lfm2.5-thinking:1.2b"):
+        response = client.chat.completions.create(...)
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+import requests
+
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
+
+WARMPOOL_ENABLED      = os.getenv("MODEL_WARMPOOL_ENABLED", "true").lower() == "true"
+WARMPOOL_REFRESH_SEC  = int(os.getenv("MODEL_WARMPOOL_REFRESH_SEC", "240"))
+WARMPOOL_RAM_FRACTION = float(os.getenv("MODEL_WARMPOOL_RAM_FRACTION", "0.6"))
+WARMPOOL_KEEP_ALIVE   = os.getenv("MODEL_WARMPOOL_KEEP_ALIVE", "10m")   # for non-pinned models
+COLD_LOAD_SEC         = float(os.getenv("MODEL_WARMPOOL_COLD_LOAD_SEC", "0.5"))
+
+# Lower number = pinned first when RAM is tight
+_ROLE_PRIORITY = {"agent": 0, "embedding": 1, "extraction": 2, "chat": 3}
+
+_pool: dict = {}            # model -> {role, kind, keep_alive, pinned, size_bytes}
+_latency: dict = {}         # model -> {"cold": deque, "warm": deque, "pings": deque, "evictions": int}
+_resident: set = set()      # models loaded at the end of the previous refresh
+_lock = threading.Lock()
+_thread = None
+
+
+def ollama_model_name(model: str):
+    """'ollama:llama3.1:8b' -> 'llama3.1:8b'. Returns None for cloud/OpenAI models."""
+    if not model:
+        return None
+    if model.startswith("ollamacloud:") or model.startswith("openai:"):
+        return None
+    return model.split("ollama:", 1)[1] if model.startswith("ollama:") else model
+
+
+def _available_ram_bytes():
+    """Available system RAM — psutil if installed, /proc/meminfo otherwise."""
+    try:
+        import psutil
+        return int(psutil.virtual_memory().available)
+    except Exception:
+        pass
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except Exception:
+        pass
+    return None
+
+
+def _pulled_sizes() -> dict:
+    """Model name -> size in bytes for every pulled model (/api/tags)."""
+    try:
+        r = requests.get(f"{OLLAMA_HOST}/api/tags", timeout=3)
+        return {m["name"]: int(m.get("size", 0)) for m in r.json().get("models", [])}
+    except Exception:
+        return {}
+
+
+def _loaded_models() -> dict:
+    """Model name -> resident size in bytes for models currently in memory (/api/ps)."""
+    try:
+        r = requests.get(f"{OLLAMA_HOST}/api/ps", timeout=3)
+        return {m["name"]: int(m.get("size", 0)) for m in r.json().get("models", [])}
+    except Exception:
+        return {}
+
+
+def _lookup(sizes: dict, model: str):
+    # Ollama reports untagged models as 'name:latest'
+    return sizes.get(model, sizes.get(f"{model}:latest"))
+
+
+def plan_keep_alive(models: list, sizes: dict, loaded: dict, available_ram) -> dict:
+    """
+    Decide keep_alive per model.
+
+    Models already resident count toward the budget too — their bytes are not
+    part of MemAvailable any more. Unknown sizes are never pinned.
+    """
+    budget = None
+    if available_ram is not None:
+        budget = (available_ram + sum(loaded.values())) * WARMPOOL_RAM_FRACTION
+
+    plan = {}
+    used = 0
+    for model, role in sorted(models, key=lambda m: _ROLE_PRIORITY.get(m[1], 9)):
+        size = _lookup(sizes, model)
+        pinned = budget is not None and size is not None and used + size <= budget
+        if pinned:
+            used += size
+        plan[model] = {
+            "role":       role,
+            "kind":       "embed" if role == "embedding" else "generate",
+            "keep_alive": -1 if pinned else WARMPOOL_KEEP_ALIVE,
+            "pinned":     pinned,
+            "size_bytes": size,
+        }
+    return plan
+
+
+def _entry(model: str) -> dict:
+    return _latency.setdefault(model, {"cold": deque(maxlen=50), "warm": deque(maxlen=200),
+                                       "pings": deque(maxlen=50), "evictions": 0})
+
+
+def record_latency(model: str, seconds: float, load_seconds: float = 0.0,
+                   cold: bool = None, ping: bool = False) -> None:
+    """
+    Record one call latency. Calls whose load time exceeds COLD_LOAD_SEC (or
+    cold=True when the load time is not reported) count as cold starts;
+    warm-up pings go to their own series.
+    """
+    if cold is None:
+        cold = load_seconds >= COLD_LOAD_SEC
+    with _lock:
+        entry = _entry(model)
+        entry["pings" if ping else "cold" if cold else "warm"].append(round(seconds, 3))
+
+
+def _is_resident(model: str):
+    """True / False from /api/ps, None when Ollama cannot be asked."""
+    try:
+        r = requests.get(f"{OLLAMA_HOST}/api/ps", timeout=1)
+        names = {m["name"] for m in r.json().get("models", [])}
+    except Exception:
+        return None
+    return model in names or f"{model}:latest" in names
+
+
+def _tracked(model: str):
+    # Only models the pool manages; cloud / OpenAI models return None
+    name = ollama_model_name(model)
+    return name if name in _pool else None
+
+
+@contextmanager
+def track_call(model: str):
+    """
+    Time one real call to a pooled local model. The OpenAI-compatible API does
+    not report load_duration, so the call is cold when the model was not
+    resident right before it. Failed calls are not recorded.
+    """
+    name = _tracked(model)
+    resident = _is_resident(name) if name else None
+    t0 = time.time()
+    yield
+    if resident is not None:
+        record_latency(name, time.time() - t0, cold=not resident)
+
+
+@asynccontextmanager
+async def atrack_call(model: str):
+    """track_call for coroutines (Graphiti extraction)."""
+    import asyncio
+    name = _tracked(model)
+    resident = await asyncio.to_thread(_is_resident, name) if name else None
+    t0 = time.time()
+    yield
+    if resident is not None:
+        record_latency(name, time.time() - t0, cold=not resident)
+
+
+def _ping(model: str, cfg: dict) -> bool:
+    """Load (or keep loaded) one model and record how long it took. True if it is loaded."""
+    if cfg["kind"] == "embed":
+        url, body = f"{OLLAMA_HOST}/api/embed", {"model": model, "input": "warmup"}
+    else:
+        url, body = f"{OLLAMA_HOST}/api/generate", {"model": model, "prompt": ""}
+    body["keep_alive"] = cfg["keep_alive"]
+
+    t0 = time.time()
+    try:
+        r = requests.post(url, json=body, timeout=300)
+        r.raise_for_status()
+        load_s = r.json().get("load_duration", 0) / 1e9
+    except Exception as e:
+        print(f"[WarmPool] ❌ {model} warm-up failed: {e}")
+        return False
+    elapsed = time.time() - t0
+    record_latency(model, elapsed, load_s, ping=True)
+    if load_s >= COLD_LOAD_SEC:
+        print(f"[WarmPool] ❄️ {model} cold load {load_s:.1f}s (total {elapsed:.1f}s) keep_alive={cfg['keep_alive']}")
+    return True
+
+
+def _refresh(models: list, preload: bool = False) -> None:
+    """
+    Re-plan keep_alive and ping the models that must stay resident. Unpinned
+    models are only pinged on preload — refreshing them would restart their
+    keep_alive forever; a model that was pinned and no longer is gets one
+    ping (if loaded) so its keep_alive drops back to the finite value.
+    """
+    sizes  = _pulled_sizes()
+    loaded = _loaded_models()
+    plan   = plan_keep_alive(models, sizes, loaded, _available_ram_bytes())
+
+    with _lock:
+        was_pinned = {m for m, cfg in _pool.items() if cfg.get("pinned")}
+        for model in plan:
+            # Was resident on the previous round but got unloaded → count it
+            if model in _resident and _lookup(loaded, model) is None:
+                _entry(model)["evictions"] += 1
+        _pool.update(plan)
+
+    resident = set()
+    for model, cfg in plan.items():
+        if sizes and _lookup(sizes, model) is None:
+            print(f"[WarmPool] ⚠️ {model} not pulled — skipping")
+            continue
+        loaded_now = _lookup(loaded, model) is not None
+        unpinned = model in was_pinned and not cfg["pinned"] and loaded_now
+        if preload or cfg["pinned"] or unpinned:
+            if _ping(model, cfg):
+                resident.add(model)
+        elif loaded_now:
+            resident.add(model)
+    with _lock:
+        _resident.clear()
+        _resident.update(resident)
+
+
+def _warm_loop(models: list) -> None:
+    print(f"[WarmPool] Preloading {len(models)} models: {', '.join(m for m, _ in models)}")
+    preload = True
+    while True:
+        try:
+            _refresh(models, preload=preload)
+            preload = False
+        except Exception as e:
+            print(f"[WarmPool] refresh failed: {e}")
+        time.sleep(WARMPOOL_REFRESH_SEC)
+
+
+def start_warm_pool(models: list):
+    """
+    Start the background warm-pool thread.
+
+    Args:
+        models: list of (model, role) — role is one of agent, extraction,
+                embedding, chat. Provider prefixes are stripped and cloud
+                models are ignored; duplicates keep the highest-priority role.
+    """
+    global _thread
+    if not WARMPOOL_ENABLED or _thread is not None:
+        return _thread
+
+    unique = {}
+    for model, role in models:
+        name = ollama_model_name(model)
+        if not name:
+            continue
+        if name not in unique or _ROLE_PRIORITY.get(role, 9) < _ROLE_PRIORITY.get(unique[name], 9):
+            unique[name] = role
+    if not unique:
+        return None
+
+    _thread = threading.Thread(target=_warm_loop, args=(list(unique.items()),), daemon=True)
+    _thread.start()
+    return _thread
+
+
+def _summary(values) -> dict:
+    vals = sorted(values)
+    if not vals:
+        return {"count": 0}
+    return {
+        "count": len(vals),
+        "avg_s": round(sum(vals) / len(vals), 3),
+        "p50_s": vals[len(vals) // 2],
+        "max_s": vals[-1],
+    }
+
+
+def warm_pool_stats() -> dict:
+    """Per-model keep-alive policy plus cold vs warm latency summary."""
+    with _lock:
+        out = {}
+        for model in set(_pool) | set(_latency):
+            cfg = _pool.get(model, {})
+            lat = _latency.get(model, {"cold": [], "warm": [], "pings": [], "evictions": 0})
+            cold, warm = _summary(lat["cold"]), _summary(lat["warm"])
+            out[model] = {
+                **cfg,
+                "cold":      cold,
+                "warm":      warm,
+                "pings":     _summary(lat["pings"]),
+                "evictions": lat["evictions"],
+                # Models that keep getting evicted and reloaded should be pinned
+                "recommend_pin": not cfg.get("pinned") and (lat["evictions"] >= 2 or cold["count"] >= 3),
+            }
+        return {
+            "enabled":         WARMPOOL_ENABLED,
+            "ollama_host":     OLLAMA_HOST,
+            "refresh_sec":     WARMPOOL_REFRESH_SEC,
+            "ram_fraction":    WARMPOOL_RAM_FRACTION,
+            "available_ram":   _available_ram_bytes(),
+            "models":          out,
+        }